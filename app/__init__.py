@@ -15,41 +15,24 @@ csrf = CSRFProtect()
 migrate = Migrate()
 
 # Global function for checking organization expiry
-def check_organization_expiry():
-    """Check and update organization statuses that have been active for over a year"""
-    from datetime import datetime, timedelta
-    from app.models import Organization
-    from flask import current_app
-    from sqlalchemy import or_, and_
-    
-    with current_app.app_context():
-        one_year_ago = datetime.now() - timedelta(days=365)
-        
-        # Find organizations that should be expired:
-        # 1. Organizations that have never been renewed (last_renewal_date is NULL) 
-        #    and activation_date is more than 1 year ago
-        # 2. Organizations that have been renewed but last_renewal_date is more than 1 year ago
-        expired_orgs = Organization.query.filter(
-            Organization.status == 'Active',
-            or_(
-                # Case 1: Never renewed, check activation_date only
-                and_(
-                    Organization.last_renewal_date.is_(None),
-                    Organization.activation_date <= one_year_ago
-                ),
-                # Case 2: Has been renewed, check last_renewal_date
-                and_(
-                    Organization.last_renewal_date.isnot(None),
-                    Organization.last_renewal_date <= one_year_ago
-                )
-            )
-        ).all()
+def check_organization_expiry(app, trigger='scheduler'):
+    """
+    Set organizations that have been active for over a year to Inactive and record the run
+    
+    Args:
+        app (Flask): Flask application
+        trigger (str): 'scheduler' for the daily job, 'manual' for the admin route
         
-        for org in expired_orgs:
-            org.status = 'Inactive'
-            db.session.commit()
+    Returns:
+        dict: The recorded run with its status, duration and the ids of the expired organizations
+    """
+    from app.organization_service import expire_organizations
+    from app.scheduler_runs import run_job, ORGANIZATION_EXPIRY_JOB
+    
+    with app.app_context():
+        return run_job(ORGANIZATION_EXPIRY_JOB, trigger, expire_organizations)
 
-def create_app():
+def create_app(background_workers=None):
     app = Flask(__name__, template_folder='../templates', static_folder='../static')
     
     # Load configuration
@@ -62,28 +45,91 @@ def create_app():
     scheduler = BackgroundScheduler()
     
     # Schedule the job to run daily at midnight
-    scheduler.add_job(check_organization_expiry, 'cron', hour=0, minute=0)
-    scheduler.start()
+    scheduler.add_job(check_organization_expiry, 'cron', hour=0, minute=0, args=[app])
     
     # Database configuration
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv("DATABASE_URI", 'mysql+pymysql://root:@localhost/npsoms_db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.secret_key = os.getenv("SECRET_KEY", 'secret_key')
     
+    # Background workers and threads run in the server process only.
+    # `flask db`, `flask stats` and the other CLI commands never start them, set BACKGROUND_WORKERS=True to override.
+    app.config['BACKGROUND_WORKERS'] = os.getenv(
+        "BACKGROUND_WORKERS", 'False' if os.getenv("FLASK_RUN_FROM_CLI") == 'true' else 'True'
+    ).lower() == 'true'
+    if background_workers is not None:
+        app.config['BACKGROUND_WORKERS'] = background_workers
+    
     # Session configuration for better persistence
     app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HTTPS
     app.config['SESSION_COOKIE_HTTPONLY'] = True
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
     app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hour
     
+    # Signed in users cached by the Flask-Login user loader
+    app.config['USER_CACHE_SIZE'] = int(os.getenv("USER_CACHE_SIZE", 1000))
+    app.config['USER_CACHE_TTL'] = int(os.getenv("USER_CACHE_TTL", 300))  # Seconds, changes made by another process show up after this
+    
+    # Server-side sessions (the cookie only carries the session id)
+    app.config['SESSION_CACHE_SIZE'] = int(os.getenv("SESSION_CACHE_SIZE", 1000))  # Sessions kept in the in-process read cache
+    app.config['SESSION_CACHE_TTL'] = int(os.getenv("SESSION_CACHE_TTL", 60))  # Seconds a cached session is trusted, 0 when several processes serve requests
+    app.config['SESSION_SWEEP_INTERVAL'] = int(os.getenv("SESSION_SWEEP_INTERVAL", 600))  # Seconds between deletions of expired sessions
+    
     # Mail configuration
-    app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-    app.config['MAIL_PORT'] = 587
-    app.config['MAIL_USE_TLS'] = True
+    app.config['MAIL_SERVER'] = os.getenv("MAIL_SERVER", 'smtp.gmail.com')
+    app.config['MAIL_PORT'] = int(os.getenv("MAIL_PORT", 587))
+    app.config['MAIL_USE_TLS'] = os.getenv("MAIL_USE_TLS", 'True').lower() == 'true'
     app.config['MAIL_USERNAME'] = os.getenv("MAIL_USERNAME")
     app.config['MAIL_PASSWORD'] = os.getenv("MAIL_PASSWORD")
     app.config['MAIL_DEFAULT_SENDER'] = os.getenv("MAIL_USERNAME")
     
+    # Email outbox (emails are queued in the database and sent by a background thread)
+    app.config['MAIL_OUTBOX_BATCH_SIZE'] = int(os.getenv("MAIL_OUTBOX_BATCH_SIZE", 50))
+    app.config['MAIL_OUTBOX_MAX_ATTEMPTS'] = int(os.getenv("MAIL_OUTBOX_MAX_ATTEMPTS", 5))
+    app.config['MAIL_OUTBOX_RETRY_DELAY'] = int(os.getenv("MAIL_OUTBOX_RETRY_DELAY", 60))  # Seconds before the first retry
+    app.config['MAIL_OUTBOX_POLL_INTERVAL'] = int(os.getenv("MAIL_OUTBOX_POLL_INTERVAL", 10))  # Seconds between outbox checks
+    app.config['MAIL_DISPATCH_WORKERS'] = int(os.getenv("MAIL_DISPATCH_WORKERS", 4))  # Threads sending emails a user is waiting for
+    app.config['MAIL_OUTBOX_SENDING_LEASE'] = int(os.getenv("MAIL_OUTBOX_SENDING_LEASE", 900))  # Seconds before a Sending message of a lost process is queued again
+    app.config['MAIL_OUTBOX_BODY_RETENTION'] = int(os.getenv("MAIL_OUTBOX_BODY_RETENTION", 7))  # Days the bodies of sent and failed emails are kept
+    
+    # Blob storage configuration (uploaded application files and logos)
+    # Use 'local' for the filesystem or 's3' for any S3-compatible object storage
+    app.config['BLOB_STORAGE_BACKEND'] = os.getenv("BLOB_STORAGE_BACKEND", 'local')
+    app.config['BLOB_STORAGE_PATH'] = os.getenv("BLOB_STORAGE_PATH", os.path.join(os.path.dirname(app.root_path), 'storage', 'blobs'))
+    app.config['BLOB_STORAGE_S3_BUCKET'] = os.getenv("BLOB_STORAGE_S3_BUCKET")
+    app.config['BLOB_STORAGE_S3_ENDPOINT'] = os.getenv("BLOB_STORAGE_S3_ENDPOINT")
+    app.config['BLOB_STORAGE_S3_PREFIX'] = os.getenv("BLOB_STORAGE_S3_PREFIX", '')
+    
+    # Number of background threads importing Excel uploads
+    app.config['IMPORT_WORKERS'] = int(os.getenv("IMPORT_WORKERS", 2))
+    app.config['IMPORT_JOB_LEASE'] = int(os.getenv("IMPORT_JOB_LEASE", 3600))  # Seconds before a Running job of a lost process is queued again
+    
+    # Password hashing (bcrypt cost factor, existing hashes are upgraded at the next login)
+    app.config['BCRYPT_ROUNDS'] = int(os.getenv("BCRYPT_ROUNDS", 12))
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))  # Processes hashing passwords, 0 hashes in the request thread
+    
+    # Rate limits of the login and account endpoints ('memory' for one process, 'database' or 'redis' to share them between processes)
+    app.config['RATE_LIMIT_BACKEND'] = os.getenv("RATE_LIMIT_BACKEND", 'memory')
+    app.config['RATE_LIMIT_REDIS_URL'] = os.getenv("RATE_LIMIT_REDIS_URL", 'redis://localhost:6379/0')
+    app.config['RATE_LIMIT_REDIS_PREFIX'] = os.getenv("RATE_LIMIT_REDIS_PREFIX", 'npsoms-rate-limit:')
+    app.config['RATE_LIMIT_IP_FACTOR'] = int(os.getenv("RATE_LIMIT_IP_FACTOR", 10))  # Calls per IP allowed for each call per email
+    
+    # Seconds the unread notification counts of a user are cached
+    app.config['NOTIFICATION_COUNT_TTL'] = int(os.getenv("NOTIFICATION_COUNT_TTL", 300))
+    
+    # Server-Sent Events pushed to organization users ('local' for one process, 'redis' to share events between processes)
+    app.config['EVENT_BACKEND'] = os.getenv("EVENT_BACKEND", 'local')
+    app.config['EVENT_REDIS_URL'] = os.getenv("EVENT_REDIS_URL", 'redis://localhost:6379/0')
+    app.config['EVENT_REDIS_CHANNEL'] = os.getenv("EVENT_REDIS_CHANNEL", 'npsoms-events')
+    app.config['EVENT_STREAM_MAX_CONNECTIONS'] = int(os.getenv("EVENT_STREAM_MAX_CONNECTIONS", 32))  # Each open stream holds a server thread, run_prod.py adds one per stream
+    app.config['EVENT_STREAM_TIMEOUT'] = int(os.getenv("EVENT_STREAM_TIMEOUT", 300))  # Seconds before a stream is closed and reconnected
+    app.config['EVENT_STREAM_HEARTBEAT'] = int(os.getenv("EVENT_STREAM_HEARTBEAT", 15))  # Seconds between keep-alive comments
+    
+    # Fork the password hashing processes while this process has no other threads,
+    # everything that starts a thread (scheduler, outbox, import workers, event hub) comes after
+    from app.password_hashing import init_password_hashing
+    init_password_hashing(app)
+    
     # Initialize extensions with app
     db.init_app(app)
     login_manager.init_app(app)
@@ -113,9 +159,59 @@ def create_app():
     from app.blueprints.user.application_first_step import application_first_step_bp
     app.register_blueprint(application_first_step_bp)
     
+    # Delete stored content once the last row referencing it is gone
+    from app.blob_storage import init_blob_cleanup
+    init_blob_cleanup(app)
+    
+    # Keep the organization statistics summary up to date and register its CLI commands
+    from app.organization_stats import stats_cli
+    app.cli.add_command(stats_cli)
+    
+    # Register the checks of the hot and file listing queries
+    from app.query_plans import indexes_cli, listings_cli
+    app.cli.add_command(indexes_cli)
+    app.cli.add_command(listings_cli)
+    
+    # Compile the email templates once
+    from app.email_templates import init_email_templates
+    init_email_templates(app)
+    
+    # Register the email outbox CLI commands, the sender itself starts with the background workers
+    from app.mail_outbox import mail_cli
+    app.cli.add_command(mail_cli)
+    
+    # Cache the unread notification counts of the sidebar
+    from app.notification_counts import init_notification_counts
+    init_notification_counts(app)
+    
+    # Push application status changes and feedback to the open event streams
+    from app.event_hub import init_event_hub
+    init_event_hub(app)
+    
+    # Register the password hashing benchmark command, the pool itself started before the extensions
+    from app.password_hashing import passwords_cli
+    app.cli.add_command(passwords_cli)
+    
+    # Resolve current_user from a cache instead of loading the user on every request
+    from app.user_cache import init_user_cache
+    init_user_cache(app)
+    
+    # Keep the session data on the server
+    from app.session_store import init_session_store
+    init_session_store(app)
+    
+    # Keep the rate limit counters on the server
+    from app.rate_limiter import init_rate_limiter
+    init_rate_limiter(app)
+    
+    # Resolve the organization and application of the current user once per request
+    from app.request_context import init_request_context
+    init_request_context(app)
+    
     # Register context processors
-    from app.context_processors import inject_cache_version
+    from app.context_processors import inject_cache_version, inject_logo_url
     app.context_processor(inject_cache_version)
+    app.context_processor(inject_logo_url)
     
     # Create database tables
     with app.app_context():
@@ -132,4 +228,16 @@ def create_app():
             db.session.add_all(roles)
             db.session.commit()
     
+    if app.config['BACKGROUND_WORKERS']:
+        # Run the daily organization expiry check
+        scheduler.start()
+        
+        # Start the Excel import workers once the tables exist
+        from app.import_jobs import init_import_jobs
+        init_import_jobs(app)
+        
+        # Start the email outbox sender
+        from app.mail_outbox import init_mail_outbox
+        init_mail_outbox(app)
+    
     return app
\ No newline at end of file
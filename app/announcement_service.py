@@ -0,0 +1,354 @@
+import base64
+import json
+from datetime import datetime
+from app import db
+from app.models import User, Organization, Announcement, AnnouncementRecipient, AnnouncementOrganization, AnnouncementRead
+from sqlalchemy import insert, select, literal, union
+
+# Roles of the users that receive announcements (organization presidents and applicants)
+RECIPIENT_ROLE_IDS = [2, 3]
+
+# Audiences of an announcement
+AUDIENCE_ALL = 'all'
+AUDIENCE_ORGANIZATIONS = 'organizations'
+AUDIENCE_USERS = 'users'
+
+# Number of announcements per page of the sent history
+ANNOUNCEMENT_PAGE_SIZE = 20
+
+
+def parse_organization_ids(selected_organizations):
+    """
+    Convert the organization ids selected in the announcement form to integers
+
+    Args:
+        selected_organizations (list): Values of the organization_ids field
+
+    Returns:
+        list: Valid organization ids, invalid values are ignored
+    """
+    organization_ids = []
+    for org_id in selected_organizations:
+        try:
+            organization_ids.append(int(org_id))
+        except ValueError:
+            continue
+    return organization_ids
+
+
+def parse_user_ids(selected_users):
+    """
+    Convert the user ids selected for an announcement to integers
+
+    Args:
+        selected_users (list): Values of the user_ids field
+
+    Returns:
+        list: Valid user ids, invalid values are ignored
+    """
+    return parse_organization_ids(selected_users)
+
+
+def audience_user_ids(announcement_id, audience):
+    """
+    Build the query selecting the ids of the users an announcement is addressed to
+
+    Args:
+        announcement_id (int): ID of the announcement
+        audience (str): 'all', 'organizations' or 'users'
+
+    Returns:
+        Select: Query returning distinct user_id values
+    """
+    if audience == AUDIENCE_ALL:
+        # Users who registered after the announcement was sent are not part of its audience
+        date_sent = select(Announcement.date_sent).where(
+            Announcement.announcement_id == announcement_id
+        ).scalar_subquery()
+        return select(User.user_id).where(
+            User.role_id.in_(RECIPIENT_ROLE_IDS),
+            db.or_(User.created_at.is_(None), User.created_at <= date_sent)
+        )
+
+    if audience == AUDIENCE_ORGANIZATIONS:
+        # The relationship is Organization.user_id -> User.user_id
+        return select(User.user_id).join(
+            Organization, User.user_id == Organization.user_id
+        ).join(
+            AnnouncementOrganization, AnnouncementOrganization.organization_id == Organization.organization_id
+        ).where(
+            AnnouncementOrganization.announcement_id == announcement_id,
+            User.role_id.in_(RECIPIENT_ROLE_IDS)
+        ).distinct()
+
+    return select(AnnouncementRecipient.user_id).where(AnnouncementRecipient.announcement_id == announcement_id)
+
+
+def set_announcement_audience(announcement, selected_organizations, selected_users=None):
+    """
+    Set who receives an announcement
+
+    Broadcasts to all organizations store no rows at all, organization
+    announcements store one row per organization and only announcements
+    addressed to individual users store one row per user.
+
+    The number of recipients is stored on the announcement, so the sent history
+    keeps showing the audience size of the day it was sent.
+
+    Args:
+        announcement (Announcement): Announcement that was just added to the session
+        selected_organizations (list): 'all' or organization ids from the announcement form
+        selected_users (list, optional): User ids, used when no organization is selected
+
+    Returns:
+        int: Number of recipients
+    """
+    if 'all' in selected_organizations:
+        announcement.audience = AUDIENCE_ALL
+    elif selected_organizations:
+        announcement.audience = AUDIENCE_ORGANIZATIONS
+    else:
+        announcement.audience = AUDIENCE_USERS
+    db.session.flush()
+
+    if announcement.audience == AUDIENCE_ORGANIZATIONS:
+        db.session.execute(
+            insert(AnnouncementOrganization.__table__).from_select(
+                ['announcement_id', 'organization_id'],
+                select(literal(announcement.announcement_id), Organization.organization_id).where(
+                    Organization.organization_id.in_(parse_organization_ids(selected_organizations))
+                )
+            )
+        )
+    elif announcement.audience == AUDIENCE_USERS:
+        db.session.execute(
+            insert(AnnouncementRecipient.__table__).from_select(
+                ['announcement_id', 'user_id'],
+                select(literal(announcement.announcement_id), User.user_id).where(
+                    User.user_id.in_(parse_user_ids(selected_users or [])),
+                    User.role_id.in_(RECIPIENT_ROLE_IDS)
+                )
+            )
+        )
+
+    user_ids = audience_user_ids(announcement.announcement_id, announcement.audience).subquery()
+    announcement.recipient_count = db.session.scalar(select(db.func.count()).select_from(user_ids))
+    return announcement.recipient_count
+
+
+def get_announcement_recipient_contacts(announcement):
+    """
+    Get the name and email of every recipient of an announcement
+
+    Args:
+        announcement (Announcement): The announcement
+
+    Returns:
+        list: List of (email, first_name, last_name) tuples of recipients with an email address
+    """
+    user_ids = audience_user_ids(announcement.announcement_id, announcement.audience)
+
+    return db.session.query(
+        User.email, User.first_name, User.last_name
+    ).filter(
+        User.user_id.in_(user_ids),
+        User.email.isnot(None),
+        User.email != ''
+    ).all()
+
+
+def get_announcement_recipients(announcement):
+    """
+    Get the recipients of an announcement with their organization and read state
+
+    Args:
+        announcement (Announcement): The announcement
+
+    Returns:
+        list: List of (User, Organization or None, is_read) tuples ordered by name
+    """
+    user_ids = audience_user_ids(announcement.announcement_id, announcement.audience)
+    is_read = select(AnnouncementRead.user_id).where(
+        AnnouncementRead.announcement_id == announcement.announcement_id,
+        AnnouncementRead.user_id == User.user_id
+    ).exists()
+
+    return db.session.query(
+        User, Organization, is_read
+    ).outerjoin(
+        Organization, User.user_id == Organization.user_id
+    ).filter(
+        User.user_id.in_(user_ids)
+    ).order_by(User.first_name, User.last_name).all()
+
+
+def delete_announcement_audience(announcement_id):
+    """
+    Delete the target and read rows of an announcement
+
+    Args:
+        announcement_id (int): ID of the announcement
+    """
+    AnnouncementRead.query.filter_by(announcement_id=announcement_id).delete()
+    AnnouncementOrganization.query.filter_by(announcement_id=announcement_id).delete()
+    AnnouncementRecipient.query.filter_by(announcement_id=announcement_id).delete()
+
+
+def _read_count_column(announcement_id):
+    return select(db.func.count()).select_from(AnnouncementRead).where(
+        AnnouncementRead.announcement_id == announcement_id
+    ).scalar_subquery()
+
+
+def visible_announcement_ids(user_id):
+    """
+    Build the query selecting the ids of the announcements a user receives
+
+    Every branch is answered from an index: broadcasts from the audience
+    index of announcements, organization announcements from the organization
+    index of announcement_organizations and direct announcements from the
+    user index of announcement_recipients. Broadcasts sent before the user
+    registered are left out.
+
+    Args:
+        user_id (int): ID of the user
+
+    Returns:
+        CompoundSelect: Query returning distinct announcement_id values
+    """
+    user_organizations = select(Organization.organization_id).where(Organization.user_id == user_id)
+    user_created_at = select(User.created_at).where(User.user_id == user_id).scalar_subquery()
+
+    return union(
+        select(Announcement.announcement_id.label('announcement_id')).where(
+            Announcement.audience == AUDIENCE_ALL,
+            db.or_(user_created_at.is_(None), Announcement.date_sent >= user_created_at)
+        ),
+        select(AnnouncementOrganization.announcement_id.label('announcement_id')).where(
+            AnnouncementOrganization.organization_id.in_(user_organizations)
+        ),
+        select(AnnouncementRecipient.announcement_id.label('announcement_id')).where(
+            AnnouncementRecipient.user_id == user_id
+        )
+    )
+
+
+def _unread_announcement_ids(user_id):
+    visible = visible_announcement_ids(user_id).subquery()
+    return select(visible.c.announcement_id).where(
+        ~select(AnnouncementRead.announcement_id).where(
+            AnnouncementRead.announcement_id == visible.c.announcement_id,
+            AnnouncementRead.user_id == user_id
+        ).exists()
+    )
+
+
+def count_unread_announcements(user_id):
+    """
+    Count the announcements a user has not read yet
+
+    Args:
+        user_id (int): ID of the user
+
+    Returns:
+        int: Number of unread announcements
+    """
+    unread = _unread_announcement_ids(user_id).subquery()
+    return db.session.scalar(select(db.func.count()).select_from(unread))
+
+
+def _encode_cursor(date_sent, announcement_id):
+    raw = json.dumps([date_sent.isoformat(), announcement_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    try:
+        date_sent, announcement_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(date_sent), int(announcement_id)
+    except Exception:
+        # Ignore malformed cursors and start from the first page
+        return None
+
+
+def get_announcements_page(after=None, limit=ANNOUNCEMENT_PAGE_SIZE):
+    """
+    Get one page of sent announcements with their recipient and read counts
+
+    The page is selected with keyset pagination on date_sent and the read
+    counts of only those announcements are computed in the same query, so a
+    page costs one query however many announcements and recipients exist.
+    The recipient count is the audience size stored when the announcement
+    was sent.
+
+    Args:
+        after (str, optional): Cursor returned with the previous page
+        limit (int, optional): Number of announcements per page
+
+    Returns:
+        dict: Dictionary with the announcements and the cursor of the next page (None on the last page)
+    """
+    page = select(
+        Announcement.announcement_id, Announcement.subject, Announcement.date_sent, Announcement.recipient_count
+    )
+
+    cursor = _decode_cursor(after) if after else None
+    if cursor:
+        date_sent, announcement_id = cursor
+        page = page.where(db.or_(
+            Announcement.date_sent < date_sent,
+            db.and_(Announcement.date_sent == date_sent, Announcement.announcement_id < announcement_id)
+        ))
+
+    # Fetch one extra row to know whether there is a next page
+    page = page.order_by(
+        Announcement.date_sent.desc(), Announcement.announcement_id.desc()
+    ).limit(limit + 1).subquery()
+
+    rows = db.session.execute(
+        select(
+            page.c.announcement_id,
+            page.c.subject,
+            page.c.date_sent,
+            db.func.coalesce(page.c.recipient_count, 0).label('recipient_count'),
+            _read_count_column(page.c.announcement_id).label('read_count')
+        ).order_by(
+            page.c.date_sent.desc(), page.c.announcement_id.desc()
+        )
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].date_sent, rows[-1].announcement_id)
+
+    announcements = []
+    for row in rows:
+        # Users who were removed after reading keep their read row
+        read_count = min(row.read_count, row.recipient_count)
+        announcements.append({
+            'announcement_id': row.announcement_id,
+            'subject': row.subject,
+            'date_sent': row.date_sent.strftime('%b %d, %Y'),
+            'recipient_count': row.recipient_count,
+            'read_count': read_count,
+            'unread_count': row.recipient_count - read_count,
+            'read_ratio': round(read_count / row.recipient_count, 4) if row.recipient_count else 0.0
+        })
+
+    return {'announcements': announcements, 'next_cursor': next_cursor}
+
+
+def get_announcement_read_counts(announcement):
+    """
+    Get the recipient and read counts of one announcement with a single query
+
+    Args:
+        announcement (Announcement): The announcement
+
+    Returns:
+        tuple: (recipient count when it was sent, read count)
+    """
+    recipient_count = announcement.recipient_count or 0
+    read_count = db.session.scalar(select(_read_count_column(literal(announcement.announcement_id))))
+    return recipient_count, min(read_count, recipient_count)
@@ -1,15 +1,18 @@
-from flask import Blueprint, jsonify, render_template, request, redirect, url_for, session, flash
+from flask import Blueprint, current_app, jsonify, render_template, request, redirect, url_for, session, flash
 from flask_login import login_user, logout_user, login_required, current_user
 from app.models import User, EntryKey, Role
 from app.utils import validate_name, validate_email, validate_password, sanitize_input, validate_name_length
-from app import db, mail
-from flask_mail import Message
+from app import db
+from app.mail_outbox import dispatch_email, get_email_delivery, cancel_email
+from app.email_templates import render_email
+from app.rate_limiter import (EXTENSION_KEY as RATE_LIMITER_KEY, limit_keys, record_attempt, reset_attempts,
+                              check_blocked, record_failure)
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
 import random
 import time
 import functools
 import hmac
-import bcrypt
+import math
 from datetime import datetime, timedelta
 
 auth_bp = Blueprint('auth', __name__)
@@ -19,6 +22,9 @@ VERIFICATION_TIMEOUT = 900  # 15 minutes in seconds
 MAX_VERIFY_ATTEMPTS = 5
 VERIFICATION_COOLDOWN = 60  # 1 minute in seconds
 MAX_VERIFICATION_REQUESTS = 3
+MAX_LOGIN_FAILURES = 5  # Failed logins per email within LOGIN_FAILURE_WINDOW
+LOGIN_FAILURE_WINDOW = 900  # 15 minutes in seconds, also how long the email stays blocked
+MAX_RESET_REQUESTS = 3  # Password reset emails per email address within LOGIN_FAILURE_WINDOW
 
 # Helper functions
 def create_error_response(message, status_code=400):
@@ -36,6 +42,9 @@ def create_success_response(message, data=None):
 def rate_limited(max_calls, timeout_duration, count_successful=False):
     """Decorator for rate limiting endpoints
     
+    Calls are counted server-side per client IP and per email address of the
+    request, see app.rate_limiter.
+    
     Args:
         max_calls: Maximum number of calls allowed within timeout_duration
         timeout_duration: Time window in seconds for rate limiting
@@ -47,43 +56,31 @@ def rate_limited(max_calls, timeout_duration, count_successful=False):
             # For GET requests with count_successful=False, don't increment the counter
             if request.method == 'GET' and not count_successful:
                 return func(*args, **kwargs)
-                
-            session_key = f"{func.__name__}_limit"
-            current_time = time.time()
-            
-            # Initialize rate limiting data if not exists
-            if session_key not in session:
-                session[session_key] = {
-                    'count': 0,
-                    'reset_time': current_time + timeout_duration
-                }
             
-            # Reset counter if timeout has passed
-            if current_time > session[session_key]['reset_time']:
-                session[session_key] = {
-                    'count': 0,
-                    'reset_time': current_time + timeout_duration
-                }
+            limiter = current_app.extensions.get(RATE_LIMITER_KEY)
+            if not limiter:
+                return func(*args, **kwargs)
             
-            # Check if limit exceeded
-            if session[session_key]['count'] >= max_calls:
-                remaining = int(session[session_key]['reset_time'] - current_time)
-                return create_error_response(
+            # Take a token before processing the request
+            keys = limit_keys(func.__name__, max_calls, timeout_duration, request.form.get('email'))
+            retry_after = limiter.take(func.__name__, keys)
+            if retry_after is not None:
+                remaining = math.ceil(retry_after)
+                response, status_code = create_error_response(
                     f"Rate limit exceeded. Please try again in {remaining} seconds.", 429
                 )
-            
-            # Increment counter before processing the request
-            session[session_key]['count'] += 1
+                response.headers['Retry-After'] = str(remaining)
+                return response, status_code
             
             # Call the original function
             response = func(*args, **kwargs)
             
             # If configured to not count successful responses and this was successful,
-            # decrement the counter
+            # give the token back
             if not count_successful and hasattr(response, 'status_code') and response.status_code < 400:
-                session[session_key]['count'] -= 1
+                limiter.refund(func.__name__, keys)
             elif not count_successful and isinstance(response, tuple) and len(response) > 1 and response[1] < 400:
-                session[session_key]['count'] -= 1
+                limiter.refund(func.__name__, keys)
                 
             return response
         return wrapper
@@ -227,48 +224,18 @@ def register():
             session.pop('verify_blocked_until', None)
             session['last_code_sent_time'] = current_time
 
-            # Send Email
-            msg = Message("Email Verification Required - NPSOMS Registration", recipients=[user_data['email']])
-            msg.html = f'''
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="background-color: #f8f9fa; padding: 20px; border-radius: 8px; border-left: 4px solid #007bff;">
-                    <h2 style="color: #2c3e50; margin-bottom: 20px;">Email Verification Required</h2>
-                    
-                    <p>Dear {user_data['first_name']} {user_data['last_name']},</p>
-                    
-                    <p>Thank you for registering with the Non-Political Student Organization Management System (NPSOMS). To complete your registration and activate your account, please verify your email address.</p>
-                    
-                    <div style="background-color: #ffffff; padding: 20px; border-radius: 5px; margin: 20px 0; text-align: center; border: 2px dashed #007bff;">
-                        <h3 style="color: #007bff; margin-bottom: 10px;">Your Verification Code</h3>
-                        <div style="font-size: 32px; font-weight: bold; color: #2c3e50; letter-spacing: 3px; font-family: 'Courier New', monospace;">
-                            {verification_code}
-                        </div>
-                        <p style="font-size: 12px; color: #666; margin-top: 10px;">This code will expire in 15 minutes</p>
-                    </div>
-                    
-                    <p><strong>Instructions:</strong></p>
-                    <ol style="padding-left: 20px;">
-                        <li>Return to the registration page</li>
-                        <li>Enter the 6-digit verification code above</li>
-                        <li>Click "Verify Email" to complete your registration</li>
-                    </ol>
-                    
-                    <div style="background-color: #fff3cd; padding: 15px; border-radius: 5px; border-left: 4px solid #ffc107; margin: 20px 0;">
-                        <p style="margin: 0; font-size: 14px;"><strong>Security Notice:</strong> If you did not request this registration, please ignore this email. Your email address will not be registered without completing the verification process.</p>
-                    </div>
-                    
-                    <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
-                    
-                    <p style="font-size: 12px; color: #666;">
-                        <em>This is an automated message. Please do not reply to this email.</em><br>
-                        Generated on: {datetime.utcnow().strftime('%B %d, %Y at %I:%M %p')} UTC
-                    </p>
-                </div>
-            </body>
-            </html>
-            '''
-            mail.send(msg)
+            # Queue the email, it is sent in the background so the response does not wait for SMTP
+            text, html = render_email(
+                'verification_code',
+                first_name=user_data['first_name'],
+                last_name=user_data['last_name'],
+                verification_code=verification_code,
+                generated_at=datetime.utcnow().strftime('%B %d, %Y at %I:%M %p')
+            )
+            session['verification_message_id'] = dispatch_email(
+                user_data['email'], "Email Verification Required - NPSOMS Registration", html=html, body=text
+            )
+            db.session.commit()
 
             # Record the time when the verification code was sent
             session['verification_code_sent_at'] = current_time
@@ -294,6 +261,30 @@ def verify_email_page():
     user_email = session['pending_user']['email']
     return render_template('verify_email.html', user_email=user_email)
 
+def verification_delivery_status():
+    """Get the delivery status of the verification code sent in this session"""
+    delivery = get_email_delivery(session.get('verification_message_id'))
+    if not delivery:
+        return 'Pending'
+    # A failed attempt is only retried minutes later, let the user request a new code now
+    if delivery['status'] == 'Pending' and delivery['attempts'] > 0:
+        return 'Failed'
+    return delivery['status']
+
+# ✅ Verification Email Delivery Status Route
+@auth_bp.route('/verification_email_status')
+def verification_email_status():
+    # Only the delivery of the code sent in this session can be polled
+    if 'pending_user' not in session or 'verification_message_id' not in session:
+        return create_error_response("Session expired. Please register again.", 400)
+
+    delivery_status = verification_delivery_status()
+    if delivery_status == 'Sent':
+        return create_success_response('Verification code sent.', {'delivery_status': delivery_status})
+    elif delivery_status == 'Failed':
+        return create_success_response('The verification code could not be sent. Please request a new code.', {'delivery_status': delivery_status})
+    return create_success_response('Sending verification code...', {'delivery_status': delivery_status})
+
 # ✅ Resend Verification Code Route
 @auth_bp.route('/resend_verification', methods=['POST'])
 @rate_limited(max_calls=3, timeout_duration=300, count_successful=False)  # 5 minutes timeout
@@ -304,7 +295,8 @@ def resend_verification():
     
     # Rate limiting for resend requests
     current_time = time.time()
-    if 'last_resend_time' in session:
+    # No need to wait when the previous code could not be delivered
+    if 'last_resend_time' in session and verification_delivery_status() != 'Failed':
         time_since_last_resend = current_time - session['last_resend_time']
         if time_since_last_resend < VERIFICATION_COOLDOWN:
             remaining_time = int(VERIFICATION_COOLDOWN - time_since_last_resend)
@@ -322,48 +314,22 @@ def resend_verification():
     
     # Send new email
     try:
+        # The previous code is no longer valid, stop its retries
+        if 'verification_message_id' in session:
+            cancel_email(session['verification_message_id'], 'Replaced by a new verification code')
+        
         pending_user = session['pending_user']
-        msg = Message("New Verification Code - NPSOMS Registration", recipients=[pending_user['email']])
-        msg.html = f'''
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
-            <div style="background-color: #f8f9fa; padding: 20px; border-radius: 8px; border-left: 4px solid #28a745;">
-                <h2 style="color: #2c3e50; margin-bottom: 20px;">New Verification Code Requested</h2>
-                
-                <p>Dear {pending_user['first_name']} {pending_user['last_name']},</p>
-                
-                <p>You have requested a new verification code for your NPSOMS registration. Please use the code below to complete your email verification.</p>
-                
-                <div style="background-color: #ffffff; padding: 20px; border-radius: 5px; margin: 20px 0; text-align: center; border: 2px dashed #28a745;">
-                    <h3 style="color: #28a745; margin-bottom: 10px;">Your New Verification Code</h3>
-                    <div style="font-size: 32px; font-weight: bold; color: #2c3e50; letter-spacing: 3px; font-family: 'Courier New', monospace;">
-                        {verification_code}
-                    </div>
-                    <p style="font-size: 12px; color: #666; margin-top: 10px;">This code will expire in 15 minutes</p>
-                </div>
-                
-                <p><strong>Instructions:</strong></p>
-                <ol style="padding-left: 20px;">
-                    <li>Return to the verification page</li>
-                    <li>Enter the 6-digit verification code above</li>
-                    <li>Click "Verify Email" to complete your registration</li>
-                </ol>
-                
-                <div style="background-color: #d1ecf1; padding: 15px; border-radius: 5px; border-left: 4px solid #17a2b8; margin: 20px 0;">
-                    <p style="margin: 0; font-size: 14px;"><strong>Note:</strong> This is a new verification code. Any previous codes sent to this email address are now invalid.</p>
-                </div>
-                
-                <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
-                 
-                 <p style="font-size: 12px; color: #666;">
-                     <em>This is an automated message. Please do not reply to this email.</em><br>
-                     Generated on: {datetime.utcnow().strftime('%B %d, %Y at %I:%M %p')} UTC
-                 </p>
-            </div>
-        </body>
-        </html>
-        '''
-        mail.send(msg)
+        text, html = render_email(
+            'verification_code_resend',
+            first_name=pending_user['first_name'],
+            last_name=pending_user['last_name'],
+            verification_code=verification_code,
+            generated_at=datetime.utcnow().strftime('%B %d, %Y at %I:%M %p')
+        )
+        session['verification_message_id'] = dispatch_email(
+            pending_user['email'], "New Verification Code - NPSOMS Registration", html=html, body=text
+        )
+        db.session.commit()
         
         return create_success_response('New verification code sent.')
     except Exception as e:
@@ -377,6 +343,7 @@ def exit_verification():
     session.pop('verification_code', None)
     session.pop('pending_user', None)
     session.pop('verification_code_sent_at', None)
+    session.pop('verification_message_id', None)
     session.pop('last_resend_time', None)
     session.pop('verify_attempts', None)
     session.pop('verify_blocked_until', None)
@@ -419,7 +386,7 @@ def verify_email():
         pending_user = session.pop('pending_user')
         
         # Clear all verification-related session data
-        for key in ['verification_code', 'verification_code_sent_at', 'last_resend_time', 
+        for key in ['verification_code', 'verification_code_sent_at', 'verification_message_id', 'last_resend_time', 
                    'verify_attempts', 'verify_blocked_until', 'verification_attempts']:
             session.pop(key, None)
 
@@ -478,45 +445,21 @@ def login():
             if not entrykey:
                 return create_error_response("Password cannot be empty.", 400)
 
-            # Track login attempts for rate limiting
-            login_attempts_key = f"login_attempts_{email}"
-            if login_attempts_key not in session:
-                session[login_attempts_key] = {
-                    'count': 0,
-                    'first_attempt_time': time.time(),
-                    'blocked_until': None
-                }
-                
-            login_attempts = session[login_attempts_key]
-            current_time = time.time()
-            
-            # Check if user is blocked from login attempts
-            if login_attempts.get('blocked_until') and current_time < login_attempts['blocked_until']:
-                remaining_time = int(login_attempts['blocked_until'] - current_time)
+            # Check if this email is blocked after failed login attempts
+            remaining_time = check_blocked('login_failures', email, LOGIN_FAILURE_WINDOW)
+            if remaining_time:
                 return create_error_response(
                     f"Too many failed login attempts. Please wait {remaining_time} seconds before trying again.",
                     429
                 )
-                
-            # Reset attempts counter if timeout has passed
-            if current_time - login_attempts['first_attempt_time'] > 900:  # 15 minutes
-                login_attempts['count'] = 0
-                login_attempts['first_attempt_time'] = current_time
-                login_attempts['blocked_until'] = None
 
             # Find user by email
             user = User.query.filter_by(email=email).first()
             
             # Check user existence, active status, and password
             if not user or not user.is_active:
-                # Increment failed attempts
-                login_attempts['count'] += 1
-                
-                # Block after 5 failed attempts
-                if login_attempts['count'] >= 5:
-                    login_attempts['blocked_until'] = current_time + 900  # 15 minutes
-                    
-                session[login_attempts_key] = login_attempts
+                # Count the failed attempt
+                record_failure('login_failures', email, MAX_LOGIN_FAILURES, LOGIN_FAILURE_WINDOW)
                 
                 # Generic error message for security
                 return create_error_response("Invalid email or password.", 401)
@@ -524,19 +467,18 @@ def login():
             # Verify password
             entrykey_record = EntryKey.query.filter_by(user_id=user.user_id).first()
             if not entrykey_record or not entrykey_record.check_entrykey(entrykey):
-                # Increment failed attempts
-                login_attempts['count'] += 1
-                
-                # Block after 5 failed attempts
-                if login_attempts['count'] >= 5:
-                    login_attempts['blocked_until'] = current_time + 900  # 15 minutes
-                    
-                session[login_attempts_key] = login_attempts
+                # Count the failed attempt
+                record_failure('login_failures', email, MAX_LOGIN_FAILURES, LOGIN_FAILURE_WINDOW)
                 
                 return create_error_response("Invalid email or password.", 401)
 
+            # Hash the entry key again if the cost factor has changed since it was set
+            if entrykey_record.needs_rehash():
+                entrykey_record.set_entrykey(entrykey)
+                db.session.commit()
+            
             # Login successful - reset attempts counter
-            session.pop(login_attempts_key, None)
+            reset_attempts('login_failures', email)
             login_user(user, remember=remember)
             
             # Get dashboard URL based on user role
@@ -603,39 +545,12 @@ def forgot_password():
             print("DEBUG: Email validation passed")
             
             # Rate limiting for password reset requests
-            reset_attempts_key = f"reset_attempts_{email}"
-            if reset_attempts_key not in session:
-                session[reset_attempts_key] = {
-                    'count': 0,
-                    'first_attempt_time': time.time(),
-                    'blocked_until': None
-                }
-                
-            reset_attempts = session[reset_attempts_key]
-            current_time = time.time()
-            
-            # Check if user is blocked from reset attempts
-            if reset_attempts.get('blocked_until') and current_time < reset_attempts['blocked_until']:
-                remaining_time = int(reset_attempts['blocked_until'] - current_time)
+            remaining_time = record_attempt('reset_requests', email, MAX_RESET_REQUESTS, LOGIN_FAILURE_WINDOW)
+            if remaining_time:
                 return create_error_response(
                     f"Too many password reset requests. Please wait {remaining_time} seconds before trying again.",
                     429
                 )
-                
-            # Reset attempts counter if timeout has passed
-            if current_time - reset_attempts['first_attempt_time'] > 900:  # 15 minutes
-                reset_attempts['count'] = 0
-                reset_attempts['first_attempt_time'] = current_time
-                reset_attempts['blocked_until'] = None
-
-            # Increment attempts
-            reset_attempts['count'] += 1
-            
-            # Block after 3 attempts
-            if reset_attempts['count'] >= 3:
-                reset_attempts['blocked_until'] = current_time + 900  # 15 minutes
-                
-            session[reset_attempts_key] = reset_attempts
             print("DEBUG: Rate limiting checks completed")
             
             # Always show success message for security (don't reveal if email exists)
@@ -656,46 +571,17 @@ def forgot_password():
                 
                 # Send password reset email
                 print("DEBUG: Creating email message")
-                msg = Message("Password Reset Request - NPSOMS", recipients=[email])
-                msg.html = f'''
-                <html>
-                <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <div style="background-color: #f8f9fa; padding: 20px; border-radius: 8px; border-left: 4px solid #dc3545;">
-                        <h2 style="color: #2c3e50; margin-bottom: 20px;">Password Reset Request</h2>
-                        
-                        <p>Dear {user.first_name} {user.last_name},</p>
-                        
-                        <p>We received a request to reset your password for your NPSOMS account. If you made this request, please click the button below to reset your password.</p>
-                        
-                        <div style="text-align: center; margin: 30px 0;">
-                            <a href="{reset_url}" style="background-color: #dc3545; color: white; padding: 12px 30px; text-decoration: none; border-radius: 5px; font-weight: bold; display: inline-block;">Reset Password</a>
-                        </div>
-                        
-                        <p>Or copy and paste this link into your browser:</p>
-                        <p style="word-break: break-all; background-color: #f1f1f1; padding: 10px; border-radius: 3px; font-family: monospace;">{reset_url}</p>
-                        
-                        <div style="background-color: #fff3cd; padding: 15px; border-radius: 5px; border-left: 4px solid #ffc107; margin: 20px 0;">
-                            <p style="margin: 0; font-size: 14px;"><strong>Security Notice:</strong></p>
-                            <ul style="margin: 10px 0; padding-left: 20px; font-size: 14px;">
-                                <li>This link will expire in 1 hour for security reasons</li>
-                                <li>If you did not request this password reset, please ignore this email</li>
-                                <li>Your password will not be changed unless you click the link above</li>
-                            </ul>
-                        </div>
-                        
-                        <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
-                        
-                        <p style="font-size: 12px; color: #666;">
-                            <em>This is an automated message. Please do not reply to this email.</em><br>
-                            Generated on: {datetime.utcnow().strftime('%B %d, %Y at %I:%M %p')} UTC
-                        </p>
-                    </div>
-                </body>
-                </html>
-                '''
-                print("DEBUG: Attempting to send email")
-                mail.send(msg)
-                print("DEBUG: Email sent successfully")
+                text, html = render_email(
+                    'password_reset',
+                    first_name=user.first_name,
+                    last_name=user.last_name,
+                    reset_url=reset_url,
+                    generated_at=datetime.utcnow().strftime('%B %d, %Y at %I:%M %p')
+                )
+                print("DEBUG: Queuing email")
+                dispatch_email(email, "Password Reset Request - NPSOMS", html=html, body=text)
+                db.session.commit()
+                print("DEBUG: Email queued successfully")
             
             # Always return success message for security
             print("DEBUG: Returning success response")
@@ -754,12 +640,11 @@ def reset_password(token):
             entrykey_record = EntryKey.query.filter_by(user_id=user.user_id).first()
             if entrykey_record:
                 # Hash the new password
-                entrykey_record.entry_key = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+                entrykey_record.set_entrykey(new_password)
                 db.session.commit()
                 
                 # Clear any existing login attempts for this user
-                login_attempts_key = f"login_attempts_{email}"
-                session.pop(login_attempts_key, None)
+                reset_attempts('login_failures', email)
                 
                 return create_success_response('Your password has been successfully reset. You can now log in with your new password.')
             else:
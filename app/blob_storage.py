@@ -0,0 +1,425 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import object_session
+from app import db
+
+# Size of the chunks used when hashing and copying uploaded content
+CHUNK_SIZE = 64 * 1024
+
+# Uploads larger than this are spooled to disk instead of memory while hashing
+SPOOL_MAX_SIZE = 1024 * 1024
+
+# File signatures used to detect the type of stored content
+FILE_SIGNATURES = [
+    (b'%PDF', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'PK\x03\x04', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    (b'\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1', 'application/msword'),
+]
+
+# Key in Session.info used to collect the storage keys a transaction stopped referencing
+RELEASED_KEYS = 'blob_storage_released_keys'
+
+# Fallback mimetypes by file extension when the signature is not recognized
+EXTENSION_MIMETYPES = {
+    'pdf': 'application/pdf',
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'doc': 'application/msword',
+}
+
+
+class BlobStore:
+    """Base interface for content-addressed blob storage backends"""
+
+    def put(self, key, fileobj, mimetype=None):
+        """Store the content of a binary file object under the given key"""
+        raise NotImplementedError
+
+    def open(self, key):
+        """Return a readable binary file object for the given key"""
+        raise NotImplementedError
+
+    def open_range(self, key, start, length):
+        """Return a readable binary file object positioned at start, reading at most length bytes"""
+        blob = self.open(key)
+        # Backends without random access skip to the start of the range
+        remaining = start
+        while remaining > 0:
+            skipped = blob.read(min(CHUNK_SIZE, remaining))
+            if not skipped:
+                break
+            remaining -= len(skipped)
+        return blob
+
+    def exists(self, key):
+        """Check if content is stored under the given key"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove the content stored under the given key"""
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    """Blob store that keeps content as files under a local directory"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def put(self, key, fileobj, mimetype=None):
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temporary file first so readers never see a partial blob
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                shutil.copyfileobj(fileobj, temp_file, CHUNK_SIZE)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def open(self, key):
+        return open(self._path(key), 'rb')
+
+    def open_range(self, key, start, length):
+        blob = self.open(key)
+        blob.seek(start)
+        return blob
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def delete(self, key):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class S3BlobStore(BlobStore):
+    """
+    Blob store backed by an S3-compatible object storage service.
+
+    The client only needs the put_object, get_object, head_object and
+    delete_object calls, so boto3 as well as local stand-ins such as
+    MinIO or moto can be used.
+    """
+
+    def __init__(self, client, bucket, prefix=''):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+
+    def _key(self, key):
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put(self, key, fileobj, mimetype=None):
+        extra = {'ContentType': mimetype} if mimetype else {}
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=fileobj, **extra)
+
+    def open(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body']
+
+    def open_range(self, key, start, length):
+        byte_range = f"bytes={start}-{start + length - 1}"
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(key), Range=byte_range)['Body']
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except Exception:
+            return False
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+def create_blob_store(config):
+    """
+    Create a blob store from the application configuration
+
+    Args:
+        config (dict): Flask application configuration
+
+    Returns:
+        BlobStore: Configured blob store backend
+    """
+    backend = (config.get('BLOB_STORAGE_BACKEND') or 'local').lower()
+
+    if backend == 'local':
+        return LocalBlobStore(config['BLOB_STORAGE_PATH'])
+
+    if backend == 's3':
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("The 's3' blob storage backend requires the boto3 package")
+
+        client = boto3.client('s3', endpoint_url=config.get('BLOB_STORAGE_S3_ENDPOINT') or None)
+        return S3BlobStore(client, config['BLOB_STORAGE_S3_BUCKET'], config.get('BLOB_STORAGE_S3_PREFIX') or '')
+
+    raise ValueError(f"Unknown blob storage backend: {backend}")
+
+
+def get_blob_store():
+    """
+    Get the blob store for the current application, creating it on first use
+
+    Returns:
+        BlobStore: Blob store backend of the current application
+    """
+    store = current_app.extensions.get('blob_store')
+    if store is None:
+        store = create_blob_store(current_app.config)
+        current_app.extensions['blob_store'] = store
+    return store
+
+
+def make_storage_key(content_hash):
+    """Build the storage key of a blob from its SHA-256 hash"""
+    return f"{content_hash[:2]}/{content_hash[2:4]}/{content_hash}"
+
+
+def detect_mimetype(head, filename=None):
+    """
+    Detect the mimetype of content from its first bytes, falling back to the filename
+
+    Args:
+        head (bytes): First bytes of the content
+        filename (str, optional): Original filename of the content
+
+    Returns:
+        str: Detected mimetype or 'application/octet-stream'
+    """
+    for signature, mimetype in FILE_SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+
+    # WebP images start with a RIFF header followed by the WEBP tag
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+
+    if filename and '.' in filename:
+        extension = filename.rsplit('.', 1)[1].lower()
+        if extension in EXTENSION_MIMETYPES:
+            return EXTENSION_MIMETYPES[extension]
+
+    return 'application/octet-stream'
+
+
+def save_blob(source, filename=None):
+    """
+    Save content to the blob store, keyed by its SHA-256 hash
+
+    The content is hashed and copied in chunks, so uploads are never held
+    in memory as a whole. Identical content is only stored once.
+
+    Args:
+        source (bytes or file object): Content to store
+        filename (str, optional): Original filename, used for mimetype detection
+
+    Returns:
+        dict: Dictionary with content_hash, file_size, mimetype and storage_key
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    digest = hashlib.sha256()
+    file_size = 0
+    head = b''
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            if len(head) < 16:
+                head += chunk[:16 - len(head)]
+            digest.update(chunk)
+            file_size += len(chunk)
+            spool.write(chunk)
+
+        content_hash = digest.hexdigest()
+        storage_key = make_storage_key(content_hash)
+        mimetype = detect_mimetype(head, filename)
+
+        store = get_blob_store()
+        if not store.exists(storage_key):
+            spool.seek(0)
+            store.put(storage_key, spool, mimetype)
+
+    return {
+        'content_hash': content_hash,
+        'file_size': file_size,
+        'mimetype': mimetype,
+        'storage_key': storage_key
+    }
+
+
+def open_blob(storage_key):
+    """
+    Open stored content for streaming
+
+    Args:
+        storage_key (str): Storage key of the blob
+
+    Returns:
+        file object: Readable binary file object
+    """
+    return get_blob_store().open(storage_key)
+
+
+def _iter_blob(store, storage_key, start, length):
+    blob = store.open_range(storage_key, start, length)
+    try:
+        remaining = length
+        while remaining > 0:
+            chunk = blob.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        blob.close()
+
+
+def stream_blob(storage_key, start, length):
+    """
+    Stream a byte range of stored content in chunks
+
+    The blob is only opened once the response body is iterated, which
+    happens after the request context has been torn down, so the store is
+    resolved up front.
+
+    Args:
+        storage_key (str): Storage key of the blob
+        start (int): Offset of the first byte to stream
+        length (int): Number of bytes to stream
+
+    Returns:
+        generator: Chunks of at most CHUNK_SIZE bytes
+    """
+    return _iter_blob(get_blob_store(), storage_key, start, length)
+
+
+def read_blob(storage_key):
+    """
+    Read stored content into memory
+
+    Args:
+        storage_key (str): Storage key of the blob
+
+    Returns:
+        bytes: Stored content
+    """
+    blob = open_blob(storage_key)
+    try:
+        return blob.read()
+    finally:
+        blob.close()
+
+
+def _stored_blob_models():
+    from app.models import StoredBlobMixin
+    return [mapper.class_ for mapper in db.Model.registry.mappers if issubclass(mapper.class_, StoredBlobMixin)]
+
+
+def delete_unreferenced_blobs(storage_keys):
+    """
+    Delete blobs that no stored row references any more
+
+    Identical content is stored once, so a blob is only deleted when none of the
+    tables with stored content has a row with its storage key.
+
+    Args:
+        storage_keys (iterable): Storage keys that may no longer be referenced
+
+    Returns:
+        list: Storage keys of the deleted blobs
+    """
+    storage_keys = set(storage_keys)
+    if not storage_keys:
+        return []
+
+    # Read on a connection of its own, the session may be right after its commit
+    referenced = set()
+    with db.engine.connect() as connection:
+        for model in _stored_blob_models():
+            table = model.__table__
+            referenced.update(connection.execute(
+                select(table.c.storage_key).where(table.c.storage_key.in_(storage_keys))
+            ).scalars())
+
+    store = get_blob_store()
+    deleted = []
+    for storage_key in sorted(storage_keys - referenced):
+        try:
+            store.delete(storage_key)
+            deleted.append(storage_key)
+        except Exception as e:
+            print(f"Error deleting blob {storage_key}: {str(e)}")
+    return deleted
+
+
+def _release_key(target, storage_key):
+    session = object_session(target)
+    if session is not None and storage_key:
+        session.info.setdefault(RELEASED_KEYS, set()).add(storage_key)
+
+
+def _storage_key_replaced(target, value, oldvalue, initiator):
+    # The previous content of a logo, file or import job is released once the change commits
+    if isinstance(oldvalue, str) and oldvalue != value:
+        _release_key(target, oldvalue)
+
+
+def _stored_row_deleted(mapper, connection, target):
+    _release_key(target, target.storage_key)
+
+
+def _delete_after_commit(session):
+    storage_keys = session.info.pop(RELEASED_KEYS, None)
+    if storage_keys and has_app_context():
+        delete_unreferenced_blobs(storage_keys)
+
+
+def _discard_after_rollback(session):
+    session.info.pop(RELEASED_KEYS, None)
+
+
+def init_blob_cleanup(app):
+    """
+    Delete the blobs of replaced or deleted content once no row references them
+
+    Storage keys a row stops referencing are collected in the session and
+    checked after the transaction commits, a rolled back transaction keeps them.
+
+    Args:
+        app (Flask): Flask application
+    """
+    if event.contains(db.session, 'after_commit', _delete_after_commit):
+        return
+
+    for model in _stored_blob_models():
+        event.listen(model.storage_key, 'set', _storage_key_replaced, active_history=True)
+        event.listen(model, 'before_delete', _stored_row_deleted)
+
+    event.listen(db.session, 'after_commit', _delete_after_commit)
+    event.listen(db.session, 'after_rollback', _discard_after_rollback)
@@ -1,8 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
-from flask_mail import Message
-from app.models import db, Announcement, AnnouncementRecipient, User, Organization
-from app import mail
+from app.models import db, Announcement
 from datetime import datetime
 import html
 
@@ -23,14 +21,11 @@ def announcement_page():
     # Get all active organizations for the multi-select dropdown
     active_organizations = get_all_active_organizations()
     
-    # Get sent announcements for history
-    sent_announcements = Announcement.query.order_by(Announcement.date_sent.desc()).all()
-    
+    # The sent history is loaded page by page from get_announcements
     return render_template('admin/announcement.html', 
                           user=current_user, 
                           active_page='announcement',
-                          organizations=active_organizations,
-                          sent_announcements=sent_announcements)
+                          organizations=active_organizations)
 
 @announcement_bp.route('/send-announcement', methods=['POST'])
 @login_required
@@ -45,6 +40,7 @@ def send_announcement():
         subject = request.form.get('subject', '').strip()
         message = request.form.get('message', '').strip()
         selected_organizations = request.form.getlist('organization_ids')
+        selected_users = request.form.getlist('user_ids')
         
         # Validation
         if not subject:
@@ -53,9 +49,12 @@ def send_announcement():
         if not message:
             return jsonify({'success': False, 'message': 'Message is required'}), 400
         
-        if not selected_organizations:
+        if not selected_organizations and not selected_users:
             return jsonify({'success': False, 'message': 'Please select at least one organization'}), 400
         
+        if selected_organizations and selected_users:
+            return jsonify({'success': False, 'message': 'Send an announcement either to organizations or to users'}), 400
+        
         # Clean the message content (remove HTML tags for storage)
         clean_message = html.unescape(message)
         
@@ -69,119 +68,54 @@ def send_announcement():
         db.session.add(announcement)
         db.session.flush()  # Get the announcement_id
         
-        # Determine recipients based on selection
-        recipient_users = []
+        # Store the audience, broadcasts to all organizations store no recipient rows
+        from app.announcement_service import set_announcement_audience, get_announcement_recipient_contacts
+        recipient_count = set_announcement_audience(announcement, selected_organizations, selected_users)
         
-        if 'all' in selected_organizations:
-            # Send to all organization users (role_id 2 and 3)
-            recipient_users = User.query.filter(User.role_id.in_([2, 3])).all()
-        else:
-            # Send to specific organizations
-            for org_id in selected_organizations:
-                try:
-                    org_id = int(org_id)
-                    # Get users associated with this organization
-                    # The relationship is Organization.user_id -> User.user_id
-                    org_users = User.query.join(Organization, User.user_id == Organization.user_id).filter(
-                        Organization.organization_id == org_id,
-                        User.role_id.in_([2, 3])
-                    ).all()
-                    recipient_users.extend(org_users)
-                except ValueError:
-                    continue
-        
-        # Remove duplicates
-        recipient_users = list(set(recipient_users))
-        
-        # Create announcement recipients
-        for user in recipient_users:
-            recipient = AnnouncementRecipient(
-                announcement_id=announcement.announcement_id,
-                user_id=user.user_id,
-                is_read=False
-            )
-            db.session.add(recipient)
+        # Queue email notifications in the same transaction, the outbox sender delivers them
+        from app.mail_outbox import queue_emails, wake_outbox_sender
+        from app.email_templates import prepare_email
+        
+        # The announcement is rendered once, only the recipient name differs per email
+        email = prepare_email(
+            'announcement',
+            ['recipient_name'],
+            subject=subject,
+            message=clean_message,
+            date_sent=announcement.date_sent.strftime('%B %d, %Y at %I:%M %p'),
+            login_url=url_for('auth.login', _external=True)
+        )
+        sender = current_app.config.get('MAIL_DEFAULT_SENDER', 'noreply@yourdomain.com')
+        
+        emails = []
+        for recipient_email, first_name, last_name in get_announcement_recipient_contacts(announcement):
+            text_body, html_body = email.render(recipient_name=f"{first_name} {last_name}")
+            emails.append({
+                'recipient': recipient_email,
+                'subject': f"New Announcement: {subject}",
+                'html': html_body,
+                'body': text_body,
+                'sender': sender
+            })
+        queue_emails(emails)
         
         # Commit the transaction
         db.session.commit()
+        wake_outbox_sender()
         
-        # Send email notifications to all recipients
-        try:
-            for user in recipient_users:
-                if user.email:  # Only send if user has an email
-                    msg = Message(
-                        subject=f"New Announcement: {subject}",
-                        sender=current_app.config.get('MAIL_DEFAULT_SENDER', 'noreply@yourdomain.com'),
-                        recipients=[user.email]
-                    )
-                    
-                    # Create HTML email content
-                    msg.html = f'''
-                    <html>
-                    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
-                        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 30px; text-align: center; border-radius: 10px 10px 0 0;">
-                            <h1 style="color: white; margin: 0; font-size: 28px;">📢 New Announcement</h1>
-                            <p style="color: #f0f0f0; margin: 10px 0 0 0; font-size: 16px;">NPSOMS - Student Organization Management</p>
-                        </div>
-                        
-                        <div style="background: white; padding: 30px; border: 1px solid #e0e0e0; border-radius: 0 0 10px 10px;">
-                            <h2 style="color: #2c3e50; margin-top: 0; font-size: 24px; border-bottom: 2px solid #3498db; padding-bottom: 10px;">{subject}</h2>
-                            
-                            <div style="background: #f8f9fa; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #3498db;">
-                                <div style="white-space: pre-wrap; font-size: 16px; line-height: 1.6;">{clean_message}</div>
-                            </div>
-                            
-                            <div style="margin: 30px 0; padding: 20px; background: #e8f4fd; border-radius: 8px; border: 1px solid #bee5eb;">
-                                <p style="margin: 0; font-size: 14px; color: #0c5460;">
-                                    <strong>📅 Date:</strong> {announcement.date_sent.strftime('%B %d, %Y at %I:%M %p')}<br>
-                                    <strong>👤 From:</strong> OSOAD Administration<br>
-                                    <strong>📧 Recipient:</strong> {user.first_name} {user.last_name}
-                                </p>
-                            </div>
-                            
-                            <div style="text-align: center; margin: 30px 0;">
-                                <a href="http://127.0.0.1:5000/login" 
-                                   style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
-                                          color: white; 
-                                          text-decoration: none; 
-                                          padding: 12px 30px; 
-                                          border-radius: 25px; 
-                                          font-weight: bold; 
-                                          display: inline-block;
-                                          box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);">
-                                    🔗 Access NPSOMS Portal
-                                </a>
-                            </div>
-                            
-                            <hr style="border: none; border-top: 1px solid #e0e0e0; margin: 30px 0;">
-                            
-                            <p style="font-size: 12px; color: #6c757d; text-align: center; margin: 0;">
-                                This is an automated message from the Non-Political Student Organization Management System (NPSOMS).<br>
-                                Please do not reply to this email. For support, contact your OSOAD administrator.
-                            </p>
-                        </div>
-                    </body>
-                    </html>
-                    '''
-                    
-                    # Send the email
-                    mail.send(msg)
-                    
-        except Exception as email_error:
-            # Log email error but don't fail the announcement creation
-            print(f"Warning: Failed to send email notifications: {str(email_error)}")
-            # The announcement was still created successfully in the database
+        # The unread counts of the recipients changed
+        from app.notification_counts import invalidate_announcement_counts
+        invalidate_announcement_counts()
         
         # Prepare response data
-        recipient_count = len(recipient_users)
         organization_names = []
         
         if 'all' in selected_organizations:
             organization_names = ['All Organizations']
-        else:
+        elif selected_organizations:
             from app.organization_service import get_all_active_organizations
             all_orgs = get_all_active_organizations()
-            org_dict = {str(org.organization_id): org.organization_name for org in all_orgs}
+            org_dict = {str(org['organization_id']): org['organization_name'] for org in all_orgs}
             organization_names = [org_dict.get(org_id, f'Organization {org_id}') for org_id in selected_organizations if org_id in org_dict]
         
         return jsonify({
@@ -204,28 +138,27 @@ def send_announcement():
 @announcement_bp.route('/get-announcements')
 @login_required
 def get_announcements():
-    """Get all announcements for the history table"""
+    """Get one page of announcements for the history table"""
     # Ensure user is OSOAD
     if current_user.role_id != 1:
         return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
     
     try:
-        announcements = Announcement.query.order_by(Announcement.date_sent.desc()).all()
+        # Import the service module here to avoid circular imports
+        from app.announcement_service import get_announcements_page, ANNOUNCEMENT_PAGE_SIZE
         
-        announcement_list = []
-        for announcement in announcements:
-            announcement_list.append({
-                'announcement_id': announcement.announcement_id,
-                'subject': announcement.subject,
-                'date_sent': announcement.date_sent.strftime('%b %d, %Y'),
-                'recipient_count': AnnouncementRecipient.query.filter_by(
-                    announcement_id=announcement.announcement_id
-                ).count()
-            })
+        try:
+            limit = min(max(int(request.args.get('limit', ANNOUNCEMENT_PAGE_SIZE)), 1), 100)
+        except ValueError:
+            limit = ANNOUNCEMENT_PAGE_SIZE
+        
+        # Recipient and read counts come from one grouped query
+        page = get_announcements_page(after=request.args.get('after'), limit=limit)
         
         return jsonify({
             'success': True,
-            'announcements': announcement_list
+            'announcements': page['announcements'],
+            'next_cursor': page['next_cursor']
         })
         
     except Exception as e:
@@ -243,10 +176,9 @@ def get_announcement_details(announcement_id):
     try:
         announcement = Announcement.query.get_or_404(announcement_id)
         
-        # Get recipient count
-        recipient_count = AnnouncementRecipient.query.filter_by(
-            announcement_id=announcement_id
-        ).count()
+        # Get recipient and read counts
+        from app.announcement_service import get_announcement_read_counts
+        recipient_count, read_count = get_announcement_read_counts(announcement)
         
         return jsonify({
             'success': True,
@@ -255,7 +187,10 @@ def get_announcement_details(announcement_id):
                 'subject': announcement.subject,
                 'message': announcement.message,
                 'date_sent': announcement.date_sent.strftime('%B %d, %Y at %I:%M %p'),
-                'recipient_count': recipient_count
+                'audience': announcement.audience,
+                'recipient_count': recipient_count,
+                'read_count': read_count,
+                'unread_count': recipient_count - read_count
             }
         })
         
@@ -274,13 +209,17 @@ def delete_announcement(announcement_id):
     try:
         announcement = Announcement.query.get_or_404(announcement_id)
         
-        # Delete associated recipients first (due to foreign key constraints)
-        AnnouncementRecipient.query.filter_by(announcement_id=announcement_id).delete()
+        # Delete associated targets and read state first (due to foreign key constraints)
+        from app.announcement_service import delete_announcement_audience
+        delete_announcement_audience(announcement_id)
         
         # Delete the announcement
         db.session.delete(announcement)
         db.session.commit()
         
+        from app.notification_counts import invalidate_announcement_counts
+        invalidate_announcement_counts()
+        
         return jsonify({
             'success': True,
             'message': 'Announcement deleted successfully'
@@ -303,25 +242,17 @@ def get_announcement_recipients(announcement_id):
         # Get announcement to verify it exists
         announcement = Announcement.query.get_or_404(announcement_id)
         
-        # Get all recipients with their user and organization information
-        recipients_query = db.session.query(
-            AnnouncementRecipient, User, Organization
-        ).join(
-            User, AnnouncementRecipient.user_id == User.user_id
-        ).outerjoin(
-            Organization, User.user_id == Organization.user_id
-        ).filter(
-            AnnouncementRecipient.announcement_id == announcement_id
-        ).order_by(User.first_name, User.last_name)
+        # Get all recipients with their organization and read state, resolved from the audience
+        from app.announcement_service import get_announcement_recipients as get_recipients
         
         recipients_list = []
-        for recipient, user, organization in recipients_query:
+        for user, organization, is_read in get_recipients(announcement):
             org_name = organization.organization_name if organization else "No Organization"
             recipients_list.append({
                 'name': f"{user.first_name} {user.last_name}",
                 'email': user.email,
                 'organization': org_name,
-                'is_read': recipient.is_read
+                'is_read': bool(is_read)
             })
         
         return jsonify({
@@ -335,4 +266,4 @@ def get_announcement_recipients(announcement_id):
         
     except Exception as e:
         print(f"Error getting announcement recipients: {str(e)}")
-        return jsonify({'success': False, 'message': 'Error loading recipients'}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'message': 'Error loading recipients'}), 500
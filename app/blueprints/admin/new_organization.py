@@ -14,6 +14,8 @@ def check_and_update_application_status(application_id):
         if not application:
             return
         
+        previous_status = application.status
+        
         # Define the required files for a complete application
         required_files = [
             'Form 1A - APPLICATION FOR RECOGNITION',
@@ -25,8 +27,9 @@ def check_and_update_application_status(application_id):
             'LOGO WITH EXPLANATION'
         ]
         
-        # Get all files for this application
-        application_files = ApplicationFile.query.filter_by(application_id=application_id).all()
+        # Get the metadata of all files for this application
+        from app.organization_service import get_application_file_summaries
+        application_files = get_application_file_summaries(application_id)
         
         # Create a set of uploaded file names for easy checking
         uploaded_file_names = {file.file_name for file in application_files}
@@ -74,6 +77,14 @@ def check_and_update_application_status(application_id):
                     organization.description = ""
             
             db.session.commit()
+        
+        # Push the new status to the organization user
+        if application.status != previous_status:
+            from app.event_hub import publish_application_event
+            publish_application_event(application_id, 'application_status', {
+                'status': application.status,
+                'previous_status': previous_status
+            })
     except Exception as e:
         # Log the error but don't disrupt the file upload process
         print(f"Error checking application status: {str(e)}")
@@ -88,15 +99,23 @@ def neworganization():
         return redirect(url_for('main.dashboard'))
     
     # Import the service module here to avoid circular imports
-    from app.organization_service import get_pending_applications
+    from app.organization_service import get_pending_applications, PENDING_PAGE_SIZE
     
-    # Get all pending applications
-    pending_applications = get_pending_applications()
+    # Get sort, filter and page parameters
+    sort = request.args.get('sort', 'newest')
+    search = request.args.get('q', '').strip()
+    after = request.args.get('after')
+    
+    # Get one page of pending applications
+    page = get_pending_applications(sort=sort, search=search, after=after, limit=PENDING_PAGE_SIZE)
     
     return render_template('admin/neworganization.html', 
                            user=current_user, 
                            active_page='neworganization',
-                           pending_applications=pending_applications)
+                           pending_applications=page['applications'],
+                           next_cursor=page['next_cursor'],
+                           sort=sort,
+                           search=search)
 
 @admin_new_organization_bp.route('/neworganizationfiles')
 @login_required
@@ -114,7 +133,7 @@ def neworganizationfiles():
         return redirect(url_for('admin_new_organization.neworganization'))
     
     # Import the service module here to avoid circular imports
-    from app.organization_service import get_application_by_id, get_organization_by_id
+    from app.organization_service import get_application_by_id, get_organization_by_id, get_application_file_summaries
     
     # Get application and organization details
     application = get_application_by_id(application_id)
@@ -148,7 +167,7 @@ def neworganizationfiles():
             # If file is not in the predefined order, put it at the end
             return len(file_order)
     
-    application_files = ApplicationFile.query.filter_by(application_id=application_id).all()
+    application_files = get_application_file_summaries(application_id)
     application_files.sort(key=lambda x: get_file_order_index(x.file_name))
     
     # Get feedback data for this application
@@ -223,6 +242,22 @@ def update_file_status():
         
         db.session.commit()
         
+        # The new feedback changes the unread count of the organization user
+        if feedback:
+            from app.notification_counts import invalidate_application_counts
+            invalidate_application_counts(app_file.application_id)
+        
+        # Push the file status and the new feedback to the organization user
+        from app.event_hub import publish_application_event
+        publish_application_event(app_file.application_id, 'file_status', {
+            'file_id': app_file.app_file_id,
+            'status': new_status,
+            'feedback': {
+                'feedback_id': new_feedback.feedback_id,
+                'subject': new_feedback.subject
+            } if feedback else None
+        })
+        
         # Check and update application status
         check_and_update_application_status(app_file.application_id)
         
@@ -2,7 +2,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_required, current_user
 from app.models import Application, ApplicationFile, Organization, Feedback
 from app import db
-from app.organization_service import get_pending_renewal_applications, get_application_by_id, get_organization_by_id
+from app.organization_service import get_pending_renewal_applications, PENDING_PAGE_SIZE, get_application_by_id, get_organization_by_id, get_application_file_summaries
 from datetime import datetime
 
 # Create blueprint
@@ -16,6 +16,8 @@ def check_and_update_application_status(application_id):
         if not application:
             return
         
+        previous_status = application.status
+        
         # Define the required files for a complete renewal application
         required_files = [
             'Form 1B - APPLICATION FOR RENEWAL OF RECOGNITION',
@@ -29,8 +31,8 @@ def check_and_update_application_status(application_id):
             'LOGO WITH EXPLANATION'
         ]
         
-        # Get all files for this application
-        application_files = ApplicationFile.query.filter_by(application_id=application_id).all()
+        # Get the metadata of all files for this application
+        application_files = get_application_file_summaries(application_id)
         
         # Create a set of uploaded file names for easy checking
         uploaded_file_names = {file.file_name for file in application_files}
@@ -59,6 +61,14 @@ def check_and_update_application_status(application_id):
                 organization.last_renewal_date = now
             
             db.session.commit()
+        
+        # Push the new status to the organization user
+        if application.status != previous_status:
+            from app.event_hub import publish_application_event
+            publish_application_event(application_id, 'application_status', {
+                'status': application.status,
+                'previous_status': previous_status
+            })
     except Exception as e:
         # Log the error but don't disrupt the file upload process
         print(f"Error checking application status: {str(e)}")
@@ -72,11 +82,18 @@ def renewal():
         flash("You don't have permission to access this page", "error")
         return redirect(url_for('main.dashboard'))
     
-    # Get all pending renewal applications
-    pending_renewals = get_pending_renewal_applications()
+    # Get sort, filter and page parameters
+    sort = request.args.get('sort', 'newest')
+    search = request.args.get('q', '').strip()
+    after = request.args.get('after')
+    
+    # Get one page of pending renewal applications
+    page = get_pending_renewal_applications(sort=sort, search=search, after=after, limit=PENDING_PAGE_SIZE)
     
     # current_user is provided by Flask-Login
-    return render_template('admin/renewal.html', user=current_user, active_page='renewal', pending_renewals=pending_renewals)
+    return render_template('admin/renewal.html', user=current_user, active_page='renewal',
+                           pending_renewals=page['applications'], next_cursor=page['next_cursor'],
+                           sort=sort, search=search)
 
 @organization_renewal_bp.route('/organizationrenewals/<int:application_id>')
 @login_required
@@ -98,8 +115,14 @@ def organizationrenewals(application_id):
         flash("Organization not found", "error")
         return redirect(url_for('organization_renewal.renewal'))
     
-    # Get application files with related file information
-    application_files = db.session.query(ApplicationFile, db.func.count(db.case((ApplicationFile.status == 'Pending', 1))).label('feedback_count')) \
+    # Get application file metadata with related file information
+    application_files = db.session.query(
+        ApplicationFile.app_file_id,
+        ApplicationFile.file_name,
+        ApplicationFile.status,
+        ApplicationFile.submission_date,
+        db.func.count(db.case((ApplicationFile.status == 'Pending', 1))).label('feedback_count')
+    ) \
         .outerjoin(Feedback, ApplicationFile.app_file_id == Feedback.app_file_id) \
         .filter(ApplicationFile.application_id == application_id) \
         .group_by(ApplicationFile.app_file_id) \
@@ -120,14 +143,14 @@ def organizationrenewals(application_id):
     
     # Format application files for template
     files = []
-    for file, feedback_count in application_files:
+    for file in application_files:
         files.append({
             "app_file_id": file.app_file_id,
             "file_id": file.app_file_id,
             "filename": file.file_name,
             "upload_date": file.submission_date,
             "status": file.status,
-            "feedback_count": feedback_count
+            "feedback_count": file.feedback_count
         })
     
     # Sort files according to the predefined order
@@ -141,7 +164,7 @@ def organizationrenewals(application_id):
     files.sort(key=lambda x: get_file_order_index(x['filename']))
     
     # Get feedback data for this application
-    file_ids = [file.app_file_id for file in ApplicationFile.query.filter_by(application_id=application_id).all()]
+    file_ids = [file['app_file_id'] for file in files]
     sent_feedbacks = Feedback.query.filter(Feedback.app_file_id.in_(file_ids)).order_by(Feedback.date_sent.desc()).all() if file_ids else []
     
     # current_user is provided by Flask-Login
@@ -257,6 +280,22 @@ def update_renewal_file_status(file_id):
         
         db.session.commit()
         
+        # The new feedback changes the unread count of the organization user
+        if feedback_message:
+            from app.notification_counts import invalidate_application_counts
+            invalidate_application_counts(app_file.application_id)
+        
+        # Push the file status and the new feedback to the organization user
+        from app.event_hub import publish_application_event
+        publish_application_event(app_file.application_id, 'file_status', {
+            'file_id': app_file.app_file_id,
+            'status': new_status,
+            'feedback': {
+                'feedback_id': new_feedback.feedback_id,
+                'subject': new_feedback.subject
+            } if feedback_message else None
+        })
+        
         # Check and update application status
         check_and_update_application_status(app_file.application_id)
         
@@ -18,13 +18,19 @@ def admin_dashboard():
     # Import the service module here to avoid circular imports
     from app.organization_service import get_all_active_organizations
     
+    from app.scheduler_runs import get_last_run, ORGANIZATION_EXPIRY_JOB
+    
     # Get all active organizations
     active_organizations = get_all_active_organizations()
     
+    # Latest run of the organization expiry check
+    expiry_run = get_last_run(ORGANIZATION_EXPIRY_JOB)
+    
     return render_template('admin/organization.html', 
                           user=current_user, 
                           active_page='organization',
-                          organizations=active_organizations)
+                          organizations=active_organizations,
+                          expiry_run=expiry_run)
 
 @admin_routes_bp.route('/member')
 @login_required
@@ -112,14 +118,20 @@ def organization():
     # Import the service module here to avoid circular imports
     from app.organization_service import get_all_active_organizations
     
+    from app.scheduler_runs import get_last_run, ORGANIZATION_EXPIRY_JOB
+    
     # Get all active organizations
     active_organizations = get_all_active_organizations()
     
+    # Latest run of the organization expiry check
+    expiry_run = get_last_run(ORGANIZATION_EXPIRY_JOB)
+    
     # current_user is provided by Flask-Login
     return render_template('admin/organization.html', 
                           user=current_user, 
                           active_page='organization',
-                          organizations=active_organizations)
+                          organizations=active_organizations,
+                          expiry_run=expiry_run)
 
 @admin_routes_bp.route('/organizationdetails')
 @admin_routes_bp.route('/organizationdetails/<int:organization_id>')
@@ -240,50 +252,13 @@ def get_application_file():
     app_file = ApplicationFile.query.get_or_404(int(file_id))
     
     # Check if file data exists and has content
-    if not app_file.file or len(app_file.file) == 0:
+    if not app_file.has_content():
         return render_template('error.html', message="The file appears to be empty or corrupted."), 500
     
-    # Check file signatures to determine file type
-    # PDF signature check (%PDF)
-    if app_file.file[:4] == b'%PDF':
-        mimetype = 'application/pdf'
-        file_extension = 'pdf'
-    # DOCX files (PK zip signature)
-    elif len(app_file.file) > 4 and app_file.file[:4] == b'PK\x03\x04':
-        mimetype = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        file_extension = 'docx'
-    # DOC files (Compound File Binary Format signature)
-    elif len(app_file.file) > 8 and app_file.file[:8] == b'\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1':
-        mimetype = 'application/msword'
-        file_extension = 'doc'
-    else:
-        # If we can't determine the type from signature, try to infer from filename
-        if app_file.file_name.lower().endswith('.pdf'):
-            mimetype = 'application/pdf'
-            file_extension = 'pdf'
-        elif app_file.file_name.lower().endswith('.docx'):
-            mimetype = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            file_extension = 'docx'
-        elif app_file.file_name.lower().endswith('.doc'):
-            mimetype = 'application/msword'
-            file_extension = 'doc'
-        else:
-            # Default to PDF as a fallback
-            mimetype = 'application/pdf'
-            file_extension = 'pdf'
-    
-    # Create a filename with proper extension for the browser
-    if app_file.file_name.lower() in ['form 1a - application for recognition', 'form 2 - letter of acceptance', 
-                                     'form 3 - list of programs/projects/ activities', 'form 4 - list of members',
-                                     'board of officers', 'constitution and bylaws', 'logo with explanation']:
-        # These are form types, add the extension
-        download_name = f"{app_file.file_name}.{file_extension}"
-    else:
-        # For files that might already have an extension
-        if '.' in app_file.file_name:
-            download_name = app_file.file_name
-        else:
-            download_name = f"{app_file.file_name}.{file_extension}"
+    from app.download_service import get_document_type, send_stored_file
+    
+    # Determine the file type from the metadata recorded on upload
+    mimetype, download_name = get_document_type(app_file)
     
     # Check if download is requested
     download_requested = request.args.get('download', '').lower() == 'true'
@@ -295,22 +270,13 @@ def get_application_file():
     ]
     
     try:
-        # Create a BytesIO object from the file data
-        file_data = io.BytesIO(app_file.file)
-        
-        # Attempt to send the file
-        response = send_file(
-            file_data,
+        # Stream the file from the blob store, honouring Range and If-None-Match
+        return send_stored_file(
+            app_file,
             mimetype=mimetype,
-            as_attachment=force_download,  # True to download, False to preview in browser
-            download_name=download_name
+            download_name=download_name,
+            as_attachment=force_download  # True to download, False to preview in browser
         )
-        
-        # Add Content-Disposition header to ensure proper preview
-        if not force_download:
-            response.headers['Content-Disposition'] = f'inline; filename="{download_name}"'
-        
-        return response
     except Exception as e:
         # Log the error for debugging
         import traceback
@@ -351,10 +317,12 @@ def update_name():
         if not first_name or not last_name:
             return jsonify({'success': False, 'message': 'First name and last name are required'}), 400
         
-        # Update user information
-        current_user.first_name = first_name
-        current_user.middle_name = middle_name if middle_name else None
-        current_user.last_name = last_name
+        # Update user information (current_user is a cached copy, update the row itself)
+        from app.models import User
+        user = User.query.get(current_user.user_id)
+        user.first_name = first_name
+        user.middle_name = middle_name if middle_name else None
+        user.last_name = last_name
         
         db.session.commit()
         
@@ -362,9 +330,9 @@ def update_name():
             'success': True, 
             'message': 'Name updated successfully',
             'data': {
-                'first_name': current_user.first_name,
-                'middle_name': current_user.middle_name or '',
-                'last_name': current_user.last_name
+                'first_name': user.first_name,
+                'middle_name': user.middle_name or '',
+                'last_name': user.last_name
             }
         })
         
@@ -434,81 +402,49 @@ def update_email():
         print(f"Session ID: {session.get('_id', 'No session ID')}")
         
         # Step 4: Send verification link to new email
-        from flask_mail import Message
-        from app import mail
+        from app.mail_outbox import dispatch_email
+        from app.email_templates import render_email
         from flask import current_app, url_for
         
         verification_url = url_for('admin_routes.confirm_email_change', token=token, _external=True)
         
-        msg = Message(
+        text, html = render_email(
+            'email_change_request',
+            first_name=current_user.first_name,
+            account_label='admin email address',
+            old_email=current_user.email,
+            new_email=new_email,
+            verification_url=verification_url,
+            team_name='NPSOMS Admin Team'
+        )
+        
+        dispatch_email(
+            new_email,
             'Confirm Your Email Change - NPSOMS Admin',
-            sender=current_app.config.get('MAIL_DEFAULT_SENDER', 'noreply@yourdomain.com'),
-            recipients=[new_email]
+            html=html,
+            body=text,
+            sender=current_app.config.get('MAIL_DEFAULT_SENDER', 'noreply@yourdomain.com')
         )
-        msg.html = f'''
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #2c3e50;">Email Change Verification</h2>
-                <p>Hello {current_user.first_name},</p>
-                <p>You have requested to change your admin email address from <strong>{current_user.email}</strong> to <strong>{new_email}</strong>.</p>
-                <p>To confirm this change, please click the button below:</p>
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="{verification_url}" 
-                       style="background-color: #3498db; color: white; padding: 12px 30px; text-decoration: none; border-radius: 5px; display: inline-block;">
-                        Confirm Email Change
-                    </a>
-                </div>
-                <p><strong>Important:</strong></p>
-                <ul>
-                    <li>This link will expire in 15 minutes</li>
-                    <li>If you did not request this change, please ignore this email</li>
-                    <li>For security, you will be automatically logged out after the change and will need to log in again with your new email address</li>
-                </ul>
-                <p>If the button doesn't work, copy and paste this link into your browser:</p>
-                <p style="word-break: break-all; background: #f8f9fa; padding: 10px; border-radius: 3px;">{verification_url}</p>
-                <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
-                <p style="font-size: 12px; color: #666;">
-                    Best regards,<br>
-                    NPSOMS Admin Team
-                </p>
-            </div>
-        </body>
-        </html>
-        '''
-        
-        mail.send(msg)
         
         # Step 5: Send notification to old email
-        old_email_msg = Message(
+        old_email_text, old_email_html = render_email(
+            'email_change_notice',
+            first_name=current_user.first_name,
+            account_label='admin email address',
+            old_email=current_user.email,
+            new_email=new_email,
+            team_name='NPSOMS Admin Team',
+            generated_at=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        )
+        
+        dispatch_email(
+            current_user.email,
             'Email Change Request Notification - NPSOMS Admin',
-            sender=current_app.config.get('MAIL_DEFAULT_SENDER', 'noreply@yourdomain.com'),
-            recipients=[current_user.email]
+            html=old_email_html,
+            body=old_email_text,
+            sender=current_app.config.get('MAIL_DEFAULT_SENDER', 'noreply@yourdomain.com')
         )
-        old_email_msg.html = f'''
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #e74c3c;">Email Change Request</h2>
-                <p>Hello {current_user.first_name},</p>
-                <p>We received a request to change your admin email address from <strong>{current_user.email}</strong> to <strong>{new_email}</strong>.</p>
-                <div style="background: #fff3cd; border: 1px solid #ffeaa7; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                    <p style="margin: 0;"><strong>⚠️ Security Notice:</strong></p>
-                    <p style="margin: 5px 0 0 0;">If you did not request this change, please contact the system administrator immediately.</p>
-                </div>
-                <p>The change will only take effect if the verification link sent to the new email address is clicked within 15 minutes.</p>
-                <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
-                <p style="font-size: 12px; color: #666;">
-                    Best regards,<br>
-                    NPSOMS Admin Team<br>
-                    Time: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
-                </p>
-            </div>
-        </body>
-        </html>
-        '''
-        
-        mail.send(old_email_msg)
+        db.session.commit()
         
         return jsonify({
             'success': True, 
@@ -621,41 +557,30 @@ def confirm_email_change():
         
         # Send confirmation email to new address
         try:
-            from flask_mail import Message
-            from app import mail
+            from app.mail_outbox import dispatch_email
+            from app.email_templates import render_email
             from flask import current_app
             
-            confirmation_msg = Message(
-                'Email Change Confirmed - NPSOMS Admin',
-                sender=current_app.config.get('MAIL_DEFAULT_SENDER', 'noreply@yourdomain.com'),
-                recipients=[new_email]
+            confirmation_text, confirmation_html = render_email(
+                'email_change_confirmed',
+                first_name=user.first_name,
+                account_label='admin email address',
+                old_email=old_email,
+                new_email=new_email,
+                team_name='NPSOMS Admin Team',
+                generated_at=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
             )
-            confirmation_msg.html = f'''
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #27ae60;">✅ Email Change Confirmed</h2>
-                    <p>Hello {user.first_name},</p>
-                    <p>Your admin email address has been successfully changed to <strong>{new_email}</strong>.</p>
-                    <div style="background: #d4edda; border: 1px solid #c3e6cb; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                        <p style="margin: 0;"><strong>Change Summary:</strong></p>
-                        <p style="margin: 5px 0 0 0;">Previous email: {old_email}<br>New email: {new_email}</p>
-                    </div>
-                    <p>For security reasons, you may need to log in again with your new email address.</p>
-                    <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
-                    <p style="font-size: 12px; color: #666;">
-                        Best regards,<br>
-                        NPSOMS Admin Team<br>
-                        Time: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
-                    </p>
-                </div>
-            </body>
-            </html>
-            '''
             
-            mail.send(confirmation_msg)
+            dispatch_email(
+                new_email,
+                'Email Change Confirmed - NPSOMS Admin',
+                html=confirmation_html,
+                body=confirmation_text,
+                sender=current_app.config.get('MAIL_DEFAULT_SENDER', 'noreply@yourdomain.com')
+            )
+            db.session.commit()
         except Exception as mail_error:
-            # Email sending failed, but the change was successful
+            # Queuing the email failed, but the change was successful
             print(f"Failed to send confirmation email: {mail_error}")
         
         # Render success page
@@ -703,8 +628,7 @@ def update_password():
             return jsonify({'success': False, 'message': 'New password must be at least 8 characters long'})
         
         # Update password
-        import bcrypt
-        entrykey_record.entry_key = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        entrykey_record.set_entrykey(new_password)
         db.session.commit()
         
         return jsonify({'success': True, 'message': 'Password updated successfully'})
@@ -720,19 +644,77 @@ def manual_check_organization_expiry():
     if current_user.role_id != 1:
         return jsonify({'error': 'Unauthorized'}), 403
     
+    # Import the expiry check function
+    from app import check_organization_expiry
+    from flask import current_app
+    
+    # Run the same expiry check as the daily job
+    run = check_organization_expiry(current_app._get_current_object(), trigger='manual')
+    
+    if run['status'] != 'Success':
+        return jsonify({
+            'success': False,
+            'error': run['error'],
+            'run': run
+        }), 500
+    
+    return jsonify({
+        'success': True,
+        'message': f"Organization expiry check completed, {run['rows_affected']} organization(s) set to Inactive",
+        'run': run
+    })
+
+@admin_routes_bp.route('/mail-outbox')
+@login_required
+def mail_outbox_status():
+    """Get the delivery status of the email outbox and the sender metrics"""
+    # Ensure user is OSOAD
+    if current_user.role_id != 1:
+        return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
+    
     try:
-        # Import the expiry check function
-        from app import check_organization_expiry
+        from app.mail_outbox import get_outbox_status
+        return jsonify({'success': True, 'outbox': get_outbox_status()})
         
-        # Run the expiry check manually
-        check_organization_expiry()
+    except Exception as e:
+        print(f"Error getting outbox status: {str(e)}")
+        return jsonify({'success': False, 'message': 'Error loading outbox status'}), 500
+
+@admin_routes_bp.route('/request-context')
+@login_required
+def request_context_metrics():
+    """Get the number of organization and application lookups served from the request cache"""
+    # Ensure user is OSOAD
+    if current_user.role_id != 1:
+        return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
+    
+    from app.request_context import get_request_context_metrics
+    return jsonify({'success': True, 'metrics': get_request_context_metrics()})
+
+@admin_routes_bp.route('/rate-limits')
+@login_required
+def rate_limit_metrics():
+    """Get the number of requests allowed and limited per rate limited endpoint"""
+    # Ensure user is OSOAD
+    if current_user.role_id != 1:
+        return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
+    
+    from app.rate_limiter import get_rate_limit_metrics
+    return jsonify({'success': True, 'metrics': get_rate_limit_metrics()})
+
+@admin_routes_bp.route('/scheduler-runs')
+@login_required
+def scheduler_runs_summary():
+    """Get the totals and the latest runs of the organization expiry check"""
+    # Ensure user is OSOAD
+    if current_user.role_id != 1:
+        return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
+    
+    try:
+        from app.scheduler_runs import get_scheduler_summary, ORGANIZATION_EXPIRY_JOB
+        limit = min(request.args.get('limit', 20, type=int), 100)
+        return jsonify({'success': True, 'summary': get_scheduler_summary(ORGANIZATION_EXPIRY_JOB, limit)})
         
-        return jsonify({
-            'success': True,
-            'message': 'Organization expiry check completed successfully'
-        })
     except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
\ No newline at end of file
+        print(f"Error getting scheduler runs: {str(e)}")
+        return jsonify({'success': False, 'message': 'Error loading scheduler runs'}), 500
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, send_file, abort, session
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, send_file, abort, session, Response
 from flask_login import login_required, current_user
 from app.models import db, Logo, Application, ApplicationFile, Organization
 from datetime import datetime
@@ -234,17 +234,18 @@ def import_excel():
         return jsonify({'success': False, 'message': 'File type not allowed. Please upload an Excel file.'})
     
     try:
-        # Import necessary libraries for Excel processing
-        import pandas as pd
-        from app.models import db, Organization
+        from app.models import db, Organization, ImportJob
+        from app.excel_import import REQUIRED_COLUMNS
         
         # Get organization ID from form data
         organization_id = request.form.get('organization_id')
         if not organization_id:
             return jsonify({'success': False, 'message': 'Organization ID is required'})
         
-        # Get upload type (officers, members, or volunteers)
+        # Get upload type (officers, members, volunteers, or plans)
         upload_type = request.form.get('upload_type', 'officers')
+        if upload_type not in REQUIRED_COLUMNS:
+            return jsonify({'success': False, 'message': 'Invalid upload type'})
         
         # Get the organization from the database
         organization = Organization.query.get(organization_id)
@@ -255,251 +256,62 @@ def import_excel():
         if organization.user_id != current_user.user_id:
             return jsonify({'success': False, 'message': 'You are not authorized to modify this organization'})
         
-        # Read the Excel file
-        df = pd.read_excel(file)
-        
-        # Validate the Excel file structure based on upload type
-        if upload_type == 'officers':
-            required_columns = ['Position', 'Student Number', 'First Name', 'Middle Name', 'Last Name', 'Program']
-        elif upload_type == 'volunteers':
-            required_columns = ['Student Number', 'First Name', 'Middle Name', 'Last Name', 'Program']
-        elif upload_type == 'plans':
-            required_columns = ['Programs/Projects/Activities', 'Objectives', 'Proposed Date', 'People Involved', 'Source of Funds', 'Target Output']
-        else:  # members
-            required_columns = ['Student Number', 'First Name', 'Middle Name', 'Last Name', 'Program']
-            
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        
-        if missing_columns:
-            return jsonify({
-                'success': False, 
-                'message': f'Missing required columns: {", ".join(missing_columns)}'
-            })
-        
-        # Check if the Excel file is empty
-        if df.empty:
-            return jsonify({
-                'success': False,
-                'message': 'The Excel file is empty. Please add data to the file.'
-            })
-        
-        # Remove rows where all required fields are empty
-        df = df.dropna(subset=required_columns, how='all')
-        
-        # Check if there are any rows left after removing empty rows
-        if df.empty:
-            return jsonify({
-                'success': False,
-                'message': 'No valid data found in the Excel file. Please ensure all required fields are filled.'
-            })
-        
-        # Validate data based on upload type
-        if upload_type != 'plans':
-            # Validate student numbers (can contain numbers, letters, and hyphens)
-            invalid_student_numbers = []
-            for index, row in df.iterrows():
-                student_no = str(row['Student Number']).strip()
-                # Allow alphanumeric characters and hyphens
-                if not student_no or not all(c.isalnum() or c == '-' for c in student_no):
-                    invalid_student_numbers.append(f"Row {index+1}: '{student_no}'")
-            
-            if invalid_student_numbers:
-                error_msg = 'Invalid student numbers found. Please check your student ID numbers.'
-                if len(invalid_student_numbers) <= 5:
-                    error_msg += f" Issues: {', '.join(invalid_student_numbers)}"
-                else:
-                    error_msg += f" Issues: {', '.join(invalid_student_numbers[:5])} and {len(invalid_student_numbers) - 5} more."
+        if upload_type == 'plans':
+            # Plans need an application, check it now instead of failing in the background
+            from app.organization_service import get_application_by_organization_id
+            if not get_application_by_organization_id(organization.organization_id, 'New'):
                 return jsonify({
                     'success': False,
-                    'message': error_msg
-                })
-            
-            # Validate program codes against database
-            from app.models import Program
-            valid_program_codes = [p.program_code.upper() for p in Program.query.all()]
-            invalid_programs = []
-            
-            for index, row in df.iterrows():
-                program_code = str(row['Program']).strip().upper()
-                if program_code not in valid_program_codes:
-                    invalid_programs.append(f"Row {index+1}: '{row['Program']}'")
-            
-            if invalid_programs:
-                error_msg = 'Invalid program codes found. Please use valid program codes.'
-                if len(invalid_programs) <= 5:
-                    error_msg += f" Issues: {', '.join(invalid_programs)}"
-                else:
-                    error_msg += f" Issues: {', '.join(invalid_programs[:5])} and {len(invalid_programs) - 5} more."
-                return jsonify({
-                    'success': False,
-                    'message': error_msg
-                })
-        else:
-            # Validate date format for Plans
-            invalid_dates = []
-            for index, row in df.iterrows():
-                proposed_date = row['Proposed Date']
-                if not pd.isna(proposed_date):
-                    try:
-                        # Try to parse the date
-                        if isinstance(proposed_date, str):
-                            pd.to_datetime(proposed_date)
-                    except Exception:
-                        invalid_dates.append(f"Row {index+1}: '{proposed_date}'")
-            
-            if invalid_dates:
-                error_msg = 'Invalid date format found. Please use YYYY-MM-DD format.'
-                if len(invalid_dates) <= 5:
-                    error_msg += f" Issues: {', '.join(invalid_dates)}"
-                else:
-                    error_msg += f" Issues: {', '.join(invalid_dates[:5])} and {len(invalid_dates) - 5} more."
-                return jsonify({
-                    'success': False,
-                    'message': error_msg
+                    'message': 'No application found for this organization. Please create an application first.'
                 })
         
-        # Process the data and save to database
-        from app.models import Student, Program, Affiliation, Address, Plan, Application
-        from datetime import datetime
-        
-        # Get current academic year
-        current_year = datetime.now().year
-        academic_year = f"{current_year}-{current_year + 1}"
+        # Store the file and queue the import, the rows are validated and imported in the background
+        job = ImportJob(
+            organization_id=organization.organization_id,
+            user_id=current_user.user_id,
+            upload_type=upload_type,
+            filename=secure_filename(file.filename),
+            status='Queued'
+        )
+        job.store_content(file, file.filename)
+        db.session.add(job)
+        db.session.commit()
         
-        # Process each row in the Excel file
-        success_count = 0
-        error_messages = []
+        from app.import_jobs import submit_import_job
+        submit_import_job(job.job_id)
         
-        # Get the application for this organization
-        from app.organization_service import get_application_by_organization_id
-        application = get_application_by_organization_id(organization.organization_id, 'New')
-        if not application and upload_type == 'plans':
-            return jsonify({
-                'success': False,
-                'message': 'No application found for this organization. Please create an application first.'
-            })
-        
-        for index, row in df.iterrows():
-            try:
-                if upload_type != 'plans':
-                    # Get program by code (case-insensitive)
-                    from sqlalchemy import func
-                    program = Program.query.filter(func.upper(Program.program_code) == str(row['Program']).strip().upper()).first()
-                    if not program:
-                        error_messages.append(f"Row {index+1}: Program code '{row['Program']}' not found")
-                        continue
-                    
-                    # Check if student already exists
-                    student = Student.query.filter_by(student_number=row['Student Number']).first()
-                    
-                    if not student:
-                        # Create a default address (can be updated later)
-                        address = Address(city="Default City", province="Default Province")
-                        db.session.add(address)
-                        db.session.flush()  # Get the address ID
-                        
-                        # Handle nan values from pandas - convert to None for database
-                        middle_name = row['Middle Name']
-                        if pd.isna(middle_name):
-                            middle_name = None
-                        
-                        # Create new student
-                        student = Student(
-                            program_id=program.program_id,
-                            address_id=address.address_id,
-                            first_name=str(row['First Name']).strip(),
-                            middle_name=middle_name,
-                            last_name=str(row['Last Name']).strip(),
-                            student_number=str(row['Student Number']).strip()
-                        )
-                        db.session.add(student)
-                        db.session.flush()  # Get the student ID
-                    
-                    # Set position based on upload type
-                    if upload_type == 'officers':
-                        position = row.get('Position', 'Member')
-                        # Handle nan values for position
-                        if pd.isna(position):
-                            position = 'Member'
-                        else:
-                            position = str(position).strip()
-                    elif upload_type == 'volunteers':
-                        position = 'Volunteer'
-                    else:  # members
-                        position = 'Member'
-                    
-                    # Check if affiliation already exists
-                    existing_affiliation = Affiliation.query.filter_by(
-                        student_id=student.student_id,
-                        organization_id=organization.organization_id,
-                        position=position,
-                        academic_year=academic_year
-                    ).first()
-                    
-                    if not existing_affiliation:
-                        # Create new affiliation
-                        affiliation = Affiliation(
-                            student_id=student.student_id,
-                            organization_id=organization.organization_id,
-                            position=position,
-                            academic_year=academic_year
-                        )
-                        db.session.add(affiliation)
-                else:  # Plans upload type
-                    # Handle nan values from pandas - convert to None for database
-                    title = str(row['Programs/Projects/Activities']).strip()
-                    objectives = str(row['Objectives']).strip() if not pd.isna(row['Objectives']) else None
-                    proposed_date = None
-                    if not pd.isna(row['Proposed Date']):
-                        if isinstance(row['Proposed Date'], str):
-                            proposed_date = pd.to_datetime(row['Proposed Date']).date()
-                        else:  # Already a datetime
-                            proposed_date = row['Proposed Date'].date()
-                    people_involved = str(row['People Involved']).strip() if not pd.isna(row['People Involved']) else None
-                    funding_source = str(row['Source of Funds']).strip() if not pd.isna(row['Source of Funds']) else None
-                    target_output = str(row['Target Output']).strip() if not pd.isna(row['Target Output']) else None
-                    
-                    # Create new plan
-                    plan = Plan(
-                        application_id=application.application_id,
-                        title=title,
-                        objectives=objectives,
-                        proposed_date=proposed_date,
-                        people_involved=people_involved,
-                        funding_source=funding_source,
-                        target_output=target_output
-                    )
-                    db.session.add(plan)
-                
-                success_count += 1
-            except Exception as e:
-                # Rollback the current transaction for this row
-                db.session.rollback()
-                error_messages.append(f"Row {index+1}: {str(e)}")
-                # Continue processing other rows
-        
-        # Commit changes to database
-        try:
-            db.session.commit()
-            
-            # Prepare response message
-            message = f"Successfully imported {success_count} records."
-            if error_messages:
-                message += f" Encountered {len(error_messages)} errors: {'; '.join(error_messages[:5])}"
-                if len(error_messages) > 5:
-                    message += f" and {len(error_messages) - 5} more."
-            
-            return jsonify({'success': True, 'message': message})
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'success': False, 'message': f"Database error: {str(e)}"})
+        return jsonify({
+            'success': True,
+            'message': 'The file was uploaded and is being imported.',
+            'job_id': job.job_id,
+            'status_url': url_for('user_organization.get_import_job', job_id=job.job_id)
+        })
         
     except Exception as e:
+        db.session.rollback()
         # Log the error for debugging
-        print(f"Error importing Excel file: {str(e)}")
+        print(f"Error queuing Excel import: {str(e)}")
         return jsonify({'success': False, 'message': f'Error processing file: {str(e)}'})
 
 
+@user_organization_bp.route('/import-jobs/<int:job_id>')
+@login_required
+def get_import_job(job_id):
+    """Get the status and progress counts of an Excel import job"""
+    from app.models import ImportJob
+    from app.import_jobs import job_to_dict
+    
+    job = ImportJob.query.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Import job not found'}), 404
+    
+    # Only the uploader and the admin can follow an import
+    if current_user.role_id != 1 and job.user_id != current_user.user_id:
+        return jsonify({'success': False, 'message': "You don't have permission to access this resource"}), 403
+    
+    return jsonify({'success': True, 'job': job_to_dict(job)})
+
+
 def allowed_file(filename, allowed_extensions):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
@@ -609,15 +421,18 @@ def update_logo():
         })
     
     try:
+        from app.logo_thumbnails import store_logo_image
+        
         # Create a new logo or update existing one
         if organization.logo_id:
             # Update existing logo
             logo = Logo.query.get(organization.logo_id)
             if logo:
-                logo.logo = logo_file.read()
+                store_logo_image(logo, logo_file)
         else:
             # Create new logo
-            logo = Logo(logo=logo_file.read(), description="")
+            logo = Logo(description="")
+            store_logo_image(logo, logo_file)
             db.session.add(logo)
             db.session.flush()  # Get the logo ID
             organization.logo_id = logo.logo_id
@@ -702,16 +517,19 @@ def update_organization():
         
         # Check if the file is allowed
         if logo_file and allowed_file(logo_file.filename, ['png', 'jpg', 'jpeg', 'gif']):
+            from app.logo_thumbnails import store_logo_image
+            
             # Create a new logo or update existing one
             if organization.logo_id:
                 # Update existing logo
                 logo = Logo.query.get(organization.logo_id)
                 if logo:
-                    logo.logo = logo_file.read()
+                    store_logo_image(logo, logo_file)
                     changes_made = True
             else:
                 # Create new logo
-                logo = Logo(logo=logo_file.read(), description=logo_description)
+                logo = Logo(description=logo_description)
+                store_logo_image(logo, logo_file)
                 db.session.add(logo)
                 db.session.flush()  # Get the logo ID
                 organization.logo_id = logo.logo_id
@@ -1100,9 +918,6 @@ def upload_application_file():
         # Secure the filename
         filename = secure_filename(file.filename)
         
-        # Read the file data
-        file_data = file.read()
-        
         # Check if a file with this type already exists for this application
         existing_file = ApplicationFile.query.filter_by(
             application_id=application.application_id,
@@ -1111,7 +926,7 @@ def upload_application_file():
         
         if existing_file:
             # Update existing file
-            existing_file.file = file_data
+            existing_file.store_content(file, filename)
             existing_file.status = "Pending"
             existing_file.submission_date = datetime.utcnow()  # Reset submission date on update
             db.session.commit()
@@ -1132,9 +947,9 @@ def upload_application_file():
             new_file = ApplicationFile(
                 application_id=application.application_id,
                 file_name=file_type,
-                file=file_data,
                 status="Pending"
             )
+            new_file.store_content(file, filename)
             db.session.add(new_file)
             db.session.commit()
             
@@ -1170,6 +985,8 @@ def check_and_update_application_status(application_id):
         if not application:
             return
         
+        previous_status = application.status
+        
         # Define the required files for a complete application
         required_files = [
             'Form 1A - APPLICATION FOR RECOGNITION',
@@ -1181,8 +998,9 @@ def check_and_update_application_status(application_id):
             'LOGO WITH EXPLANATION'
         ]
         
-        # Get all files for this application
-        application_files = ApplicationFile.query.filter_by(application_id=application_id).all()
+        # Get the metadata of all files for this application
+        from app.organization_service import get_application_file_summaries
+        application_files = get_application_file_summaries(application_id)
         
         # Create a set of uploaded file names for easy checking
         uploaded_file_names = {file.file_name for file in application_files}
@@ -1208,6 +1026,14 @@ def check_and_update_application_status(application_id):
                 organization.status = 'Active'
             
             db.session.commit()
+        
+        # Push the new status to the organization user
+        if application.status != previous_status:
+            from app.event_hub import publish_application_event
+            publish_application_event(application_id, 'application_status', {
+                'status': application.status,
+                'previous_status': previous_status
+            })
     except Exception as e:
         # Log the error but don't disrupt the file upload process
         print(f"Error checking application status: {str(e)}")
@@ -1230,50 +1056,13 @@ def get_application_file(file_id):
             abort(403)  # Forbidden
     
     # Check if file data exists and has content
-    if not app_file.file or len(app_file.file) == 0:
+    if not app_file.has_content():
         return render_template('error.html', message="The file appears to be empty or corrupted."), 500
     
-    # Check file signatures to determine file type
-    # PDF signature check (%PDF)
-    if app_file.file[:4] == b'%PDF':
-        mimetype = 'application/pdf'
-        file_extension = 'pdf'
-    # DOCX files (PK zip signature)
-    elif len(app_file.file) > 4 and app_file.file[:4] == b'PK\x03\x04':
-        mimetype = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        file_extension = 'docx'
-    # DOC files (Compound File Binary Format signature)
-    elif len(app_file.file) > 8 and app_file.file[:8] == b'\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1':
-        mimetype = 'application/msword'
-        file_extension = 'doc'
-    else:
-        # If we can't determine the type from signature, try to infer from filename
-        if app_file.file_name.lower().endswith('.pdf'):
-            mimetype = 'application/pdf'
-            file_extension = 'pdf'
-        elif app_file.file_name.lower().endswith('.docx'):
-            mimetype = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            file_extension = 'docx'
-        elif app_file.file_name.lower().endswith('.doc'):
-            mimetype = 'application/msword'
-            file_extension = 'doc'
-        else:
-            # Default to PDF as a fallback
-            mimetype = 'application/pdf'
-            file_extension = 'pdf'
-    
-    # Create a filename with proper extension for the browser
-    if app_file.file_name.lower() in ['form 1a - application for recognition', 'form 2 - letter of acceptance', 
-                                     'form 3 - list of programs/projects/ activities', 'form 4 - list of members',
-                                     'board of officers', 'constitution and bylaws', 'logo with explanation']:
-        # These are form types, add the extension
-        download_name = f"{app_file.file_name}.{file_extension}"
-    else:
-        # For files that might already have an extension
-        if '.' in app_file.file_name:
-            download_name = app_file.file_name
-        else:
-            download_name = f"{app_file.file_name}.{file_extension}"
+    from app.download_service import get_document_type, send_stored_file
+    
+    # Determine the file type from the metadata recorded on upload
+    mimetype, download_name = get_document_type(app_file)
     
     # Check if download is requested
     download_requested = request.args.get('download', '').lower() == 'true'
@@ -1285,22 +1074,13 @@ def get_application_file(file_id):
     ]
     
     try:
-        # Create a BytesIO object from the file data
-        file_data = io.BytesIO(app_file.file)
-        
-        # Attempt to send the file
-        response = send_file(
-            file_data,
+        # Stream the file from the blob store, honouring Range and If-None-Match
+        return send_stored_file(
+            app_file,
             mimetype=mimetype,
-            as_attachment=force_download,  # True to download, False to preview in browser
-            download_name=download_name
+            download_name=download_name,
+            as_attachment=force_download  # True to download, False to preview in browser
         )
-        
-        # Add Content-Disposition header to ensure proper preview
-        if not force_download:
-            response.headers['Content-Disposition'] = f'inline; filename="{download_name}"'
-        
-        return response
     except Exception as e:
         # Log the error for debugging
         import traceback
@@ -1349,6 +1129,31 @@ def get_application_status():
         'previousStatus': previous_status
     })
 
+@user_organization_bp.route('/events')
+@login_required
+def application_events():
+    """Stream application status changes and new feedback as Server-Sent Events"""
+    # Ensure user is Organization President or Applicant
+    if current_user.role_id not in [2, 3]:
+        return jsonify({'success': False, 'message': "You don't have permission to access application events"}), 403
+    
+    # Import the service module here to avoid circular imports
+    from app.event_hub import open_event_stream, BUSY_RETRY_DELAY_MS
+    
+    stream = open_event_stream(current_user.user_id)
+    if stream is None:
+        # Too many open streams, application-events.js reconnects later with a growing delay
+        # and the page works without live updates meanwhile
+        return Response(f"retry: {BUSY_RETRY_DELAY_MS}\n\n", status=503, mimetype='text/event-stream', headers={
+            'Retry-After': str(BUSY_RETRY_DELAY_MS // 1000),
+            'Cache-Control': 'no-cache'
+        })
+    
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @user_organization_bp.route('/get-application-files')
 @login_required
 def get_application_files():
@@ -1357,7 +1162,7 @@ def get_application_files():
         return jsonify({'success': False, 'message': "You don't have permission to access files"})
     
     # Import the service module here to avoid circular imports
-    from app.organization_service import get_organization_by_user_id, get_application_by_organization_id
+    from app.organization_service import get_organization_by_user_id, get_application_by_organization_id, get_application_file_summaries
     
     # Get user's organization
     organization = get_organization_by_user_id(current_user.user_id)
@@ -1369,8 +1174,8 @@ def get_application_files():
     if not application:
         return jsonify({'success': False, 'message': "No application found for this organization"})
     
-    # Get all files for this application
-    files = ApplicationFile.query.filter_by(application_id=application.application_id).all()
+    # Get the metadata of all files for this application
+    files = get_application_file_summaries(application.application_id)
     
     # Define the expected file order for applications
     file_order = [
@@ -1410,15 +1215,46 @@ def get_logo(logo_id):
     # Import the service module here to avoid circular imports
     from app.organization_service import get_logo_by_id
     
+    from app.download_service import send_stored_file
+    
     logo = get_logo_by_id(logo_id)
-    if not logo:
+    if not logo or not logo.has_content():
         abort(404)
     
-    return send_file(
-        io.BytesIO(logo.logo),
-        mimetype='image/jpeg',
-        as_attachment=False,
-        download_name=f'logo_{logo_id}.jpg'
+    # This URL does not change when the logo is replaced, so browsers revalidate it with the ETag
+    return send_stored_file(
+        logo,
+        mimetype=logo.mimetype or 'image/jpeg',
+        download_name=f'logo_{logo_id}'
+    )
+
+@user_organization_bp.route('/logo/<int:logo_id>/<fingerprint>')
+@user_organization_bp.route('/logo/<int:logo_id>/<fingerprint>/<int:size>')
+def get_logo_image(logo_id, fingerprint, size=None):
+    # Import the service module here to avoid circular imports
+    from app.organization_service import get_logo_by_id
+    from app.download_service import send_stored_file
+    from app.logo_thumbnails import THUMBNAIL_SIZES, LOGO_CACHE_MAX_AGE, logo_fingerprint, logo_url, get_logo_thumbnail
+    
+    if size is not None and size not in THUMBNAIL_SIZES:
+        abort(404)
+    
+    logo = get_logo_by_id(logo_id)
+    if not logo or not logo.has_content():
+        abort(404)
+    
+    # Outdated fingerprints point to a replaced logo, send the browser to the current one
+    if fingerprint != logo_fingerprint(logo.content_hash):
+        return redirect(logo_url(logo.logo_id, logo.content_hash, size))
+    
+    # Fall back to the original image for logos without thumbnails
+    image = (get_logo_thumbnail(logo, size) if size else None) or logo
+    
+    return send_stored_file(
+        image,
+        mimetype=image.mimetype or 'image/jpeg',
+        download_name=f'logo_{logo_id}',
+        max_age=LOGO_CACHE_MAX_AGE
     )
 
 @user_organization_bp.route('/get-application-feedback')
@@ -1429,7 +1265,7 @@ def get_application_feedback():
         return jsonify({'success': False, 'message': "You don't have permission to access feedback"})
     
     # Import the service module here to avoid circular imports
-    from app.organization_service import get_organization_by_user_id, get_application_by_organization_id
+    from app.organization_service import get_organization_by_user_id, get_application_by_organization_id, get_application_file_ids
     from app.models import Feedback
     
     # Get user's organization
@@ -1442,11 +1278,8 @@ def get_application_feedback():
     if not application:
         return jsonify({'success': False, 'message': "No application found for this organization"})
     
-    # Get all files for this application
-    application_files = ApplicationFile.query.filter_by(application_id=application.application_id).all()
-    
     # Get all feedback for files in this application
-    file_ids = [file.app_file_id for file in application_files]
+    file_ids = get_application_file_ids(application.application_id)
     feedbacks = Feedback.query.filter(Feedback.app_file_id.in_(file_ids)).order_by(Feedback.date_sent.desc()).all() if file_ids else []
     
     # Format the response
@@ -1504,6 +1337,10 @@ def mark_feedback_read():
     
     try:
         db.session.commit()
+        
+        from app.notification_counts import invalidate_user_counts
+        invalidate_user_counts(current_user.user_id)
+        
         return jsonify({'success': True, 'message': "Feedback marked as read"})
     except Exception as e:
         db.session.rollback()
@@ -67,7 +67,7 @@ def carry_forward_logo():
         
         if existing_logo:
             # Update existing logo with previous year's data
-            existing_logo.file = previous_logo.file
+            existing_logo.copy_content_from(previous_logo)
             existing_logo.status = "Pending"
             existing_logo.submission_date = datetime.utcnow()
             db.session.commit()
@@ -78,9 +78,9 @@ def carry_forward_logo():
             new_logo = ApplicationFile(
                 application_id=current_renewal_application.application_id,
                 file_name='LOGO WITH EXPLANATION',
-                file=previous_logo.file,
                 status="Pending"
             )
+            new_logo.copy_content_from(previous_logo)
             db.session.add(new_logo)
             db.session.commit()
             
@@ -209,9 +209,6 @@ def upload_renewal_file():
         # Secure the filename
         filename = secure_filename(file.filename)
         
-        # Read the file data
-        file_data = file.read()
-        
         # Handle file replacement if replace_file_id is provided
         if replace_file_id:
             try:
@@ -223,7 +220,7 @@ def upload_renewal_file():
                 
                 if existing_file_by_id:
                     # Update existing file
-                    existing_file_by_id.file = file_data
+                    existing_file_by_id.store_content(file, filename)
                     existing_file_by_id.status = "Pending"
                     existing_file_by_id.submission_date = datetime.utcnow()  # Reset submission date on update
                     db.session.commit()
@@ -253,7 +250,7 @@ def upload_renewal_file():
         
         if existing_file:
             # Update existing file
-            existing_file.file = file_data
+            existing_file.store_content(file, filename)
             existing_file.status = "Pending"
             existing_file.submission_date = datetime.utcnow()  # Reset submission date on update
             db.session.commit()
@@ -275,9 +272,9 @@ def upload_renewal_file():
             new_file = ApplicationFile(
                 application_id=renewal_application.application_id,
                 file_name=file_type,
-                file=file_data,
                 status="Pending"
             )
+            new_file.store_content(file, filename)
             db.session.add(new_file)
             db.session.commit()
             
@@ -327,8 +324,9 @@ def check_and_update_renewal_status(application_id):
             'LOGO WITH EXPLANATION'
         ]
         
-        # Get all files for this application
-        application_files = ApplicationFile.query.filter_by(application_id=application_id).all()
+        # Get the metadata of all files for this application
+        from app.organization_service import get_application_file_summaries
+        application_files = get_application_file_summaries(application_id)
         
         # Create a set of uploaded file names for easy checking
         uploaded_file_names = {file.file_name for file in application_files}
@@ -382,8 +380,9 @@ def get_renewal_files():
     if not renewal_application:
         return jsonify({'success': False, 'message': "No renewal application found for this organization"})
     
-    # Get all files for this application
-    files = ApplicationFile.query.filter_by(application_id=renewal_application.application_id).all()
+    # Get the metadata of all files for this application
+    from app.organization_service import get_application_file_summaries
+    files = get_application_file_summaries(renewal_application.application_id)
     
     # Define the expected file order (same as admin renewal page)
     file_order = [
@@ -448,11 +447,9 @@ def get_renewal_feedback():
     if not renewal_application:
         return jsonify({'success': False, 'message': "No renewal application found for this organization"})
     
-    # Get all files for this application
-    application_files = ApplicationFile.query.filter_by(application_id=renewal_application.application_id).all()
-    
     # Get all feedback for files in this application
-    file_ids = [file.app_file_id for file in application_files]
+    from app.organization_service import get_application_file_ids
+    file_ids = get_application_file_ids(renewal_application.application_id)
     feedbacks = Feedback.query.filter(Feedback.app_file_id.in_(file_ids)).order_by(Feedback.date_sent.desc()).all() if file_ids else []
     
     # Format the response
@@ -511,8 +508,8 @@ def mark_feedback_read():
         return jsonify({'success': False, 'message': "No renewal application found for this organization"})
     
     # Check if the feedback belongs to a file in this application
-    application_files = ApplicationFile.query.filter_by(application_id=renewal_application.application_id).all()
-    file_ids = [file.app_file_id for file in application_files]
+    from app.organization_service import get_application_file_ids
+    file_ids = get_application_file_ids(renewal_application.application_id)
     
     if not feedback.app_file_id in file_ids:
         return jsonify({'success': False, 'message': "You don't have permission to access this feedback"})
@@ -522,6 +519,10 @@ def mark_feedback_read():
     
     try:
         db.session.commit()
+        
+        from app.notification_counts import invalidate_user_counts
+        invalidate_user_counts(current_user.user_id)
+        
         return jsonify({'success': True, 'message': "Feedback marked as read"})
     except Exception as e:
         db.session.rollback()
@@ -544,24 +545,17 @@ def get_renewal_file(file_id):
             abort(403)  # Forbidden
     
     # Check if file data exists and has content
-    if not app_file.file or len(app_file.file) == 0:
+    if not app_file.has_content():
         return render_template('error.html', message="The file appears to be empty or corrupted."), 500
     
-    # Check file signatures to determine file type
-    # PDF signature check (%PDF)
-    if app_file.file[:4] == b'%PDF':
-        mimetype = 'application/pdf'
-        file_extension = 'pdf'
-    else:
-        # Default to PDF if signature check fails
-        mimetype = 'application/pdf'
-        file_extension = 'pdf'
-    
-    return send_file(
-        io.BytesIO(app_file.file),
-        mimetype=mimetype,
-        as_attachment=False,
-        download_name=f'{app_file.file_name}.{file_extension}'
+    from app.download_service import send_stored_file
+    
+    # Renewal files are always PDF documents
+    return send_stored_file(
+        app_file,
+        mimetype='application/pdf',
+        download_name=f'{app_file.file_name}.pdf',
+        as_attachment=False
     )
 
 @user_renewal_bp.route('/replace-renewal-file/<int:file_id>', methods=['POST'])
@@ -604,11 +598,8 @@ def replace_renewal_file(file_id):
         if not application or application.organization_id != organization.organization_id:
             return jsonify({'success': False, 'message': 'You do not have permission to modify this file'})
         
-        # Read the file data
-        file_data = file.read()
-        
         # Update the existing file record
-        existing_file.file = file_data
+        existing_file.store_content(file, secure_filename(file.filename))
         existing_file.status = 'Pending'  # Reset status to pending after replacement
         existing_file.submission_date = datetime.utcnow()
         
@@ -124,9 +124,7 @@ def notifications():
     
     # Import the service module here to avoid circular imports
     from app.organization_service import get_organization_by_user_id, get_application_by_organization_id
-    from app.models import AnnouncementRecipient, Announcement, Feedback, ApplicationFile
-    from sqlalchemy import desc
-    from datetime import datetime
+    from app.notification_service import get_notifications_page, mark_notifications_read
     
     # Get user's organization
     organization = get_organization_by_user_id(current_user.user_id)
@@ -136,121 +134,67 @@ def notifications():
     if organization:
         application = get_application_by_organization_id(organization.organization_id, 'New')
     
-    # Get announcements for this user
-    announcements_query = db.session.query(Announcement, AnnouncementRecipient)\
-        .join(AnnouncementRecipient, Announcement.announcement_id == AnnouncementRecipient.announcement_id)\
-        .filter(AnnouncementRecipient.user_id == current_user.user_id)\
-        .order_by(desc(Announcement.date_sent))
-    
-    # Get feedback for this user's application files
-    feedback_query = []
-    if organization and application:
-        # Get all application files for this organization's application
-        app_files = ApplicationFile.query.filter_by(application_id=application.application_id).all()
-        app_file_ids = [file.app_file_id for file in app_files]
-        
-        # Get feedback for these files
-        if app_file_ids:
-            feedback_query = Feedback.query\
-                .filter(Feedback.app_file_id.in_(app_file_ids))\
-                .order_by(desc(Feedback.date_sent))\
-                .all()
-    
-    # Combine announcements and feedback into a single notifications list
-    notifications = []
-    
-    # Process announcements and mark them as read
-    for announcement, recipient in announcements_query:
-        time_diff = datetime.utcnow() - announcement.date_sent
-        
-        if time_diff.days > 0:
-            if time_diff.days == 1:
-                time_str = "1 day ago"
-            else:
-                time_str = f"{time_diff.days} days ago"
-        elif time_diff.seconds >= 3600:
-            hours = time_diff.seconds // 3600
-            if hours == 1:
-                time_str = "1 hour ago"
-            else:
-                time_str = f"{hours} hours ago"
-        elif time_diff.seconds >= 60:
-            minutes = time_diff.seconds // 60
-            if minutes == 1:
-                time_str = "1 minute ago"
-            else:
-                time_str = f"{minutes} minutes ago"
-        else:
-            time_str = "Just now"
-        
-        notifications.append({
-            'type': 'announcement',
-            'subject': announcement.subject,
-            'message': announcement.message,
-            'time': time_str,
-            'date_sent': announcement.date_sent,
-            'is_read': recipient.is_read,
-            'id': recipient.user_id
-        })
-        
-        # Mark announcement as read if it's not already
-        if not recipient.is_read:
-            recipient.is_read = True
-            db.session.add(recipient)
-    
-    # Process feedback and mark them as read
-    for feedback in feedback_query:
-        time_diff = datetime.utcnow() - feedback.date_sent
-        
-        if time_diff.days > 0:
-            if time_diff.days == 1:
-                time_str = "1 day ago"
-            else:
-                time_str = f"{time_diff.days} days ago"
-        elif time_diff.seconds >= 3600:
-            hours = time_diff.seconds // 3600
-            if hours == 1:
-                time_str = "1 hour ago"
-            else:
-                time_str = f"{hours} hours ago"
-        elif time_diff.seconds >= 60:
-            minutes = time_diff.seconds // 60
-            if minutes == 1:
-                time_str = "1 minute ago"
-            else:
-                time_str = f"{minutes} minutes ago"
-        else:
-            time_str = "Just now"
-        
-        file_name = "Unknown File"
-        if feedback.application_file:
-            file_name = feedback.application_file.file_name
-        
-        notifications.append({
-            'type': 'feedback',
-            'subject': feedback.subject,
-            'message': feedback.message,
-            'time': time_str,
-            'date_sent': feedback.date_sent,
-            'is_read': feedback.is_read,
-            'file_name': file_name,
-            'id': feedback.feedback_id
-        })
-        
-        # Mark feedback as read if it's not already
-        if not feedback.is_read:
-            feedback.is_read = True
-            db.session.add(feedback)
+    # Get the first page of announcements and feedback, newest first
+    page = get_notifications_page(current_user.user_id)
     
-    # Commit changes to database if any notifications were marked as read
-    if db.session.dirty:
+    # Mark the notifications of this page as read
+    if mark_notifications_read(current_user.user_id, page['notifications']):
         db.session.commit()
-    
-    # Sort notifications by date_sent (newest first)
-    notifications.sort(key=lambda x: x['date_sent'], reverse=True)
+        
+        from app.notification_counts import invalidate_user_counts
+        invalidate_user_counts(current_user.user_id)
     
     # current_user is provided by Flask-Login
-    return render_template('user/notifications.html', user=current_user, organization=organization, application=application, active_page='notifications', notifications=notifications)
+    return render_template('user/notifications.html', user=current_user, organization=organization, application=application, active_page='notifications',
+                           notifications=page['notifications'], next_cursor=page['next_cursor'])
+
+@user_routes_bp.route('/notifications/feed')
+@login_required
+def notifications_feed():
+    """Get the next page of notifications and mark them as read"""
+    # Ensure user is Organization President or Applicant
+    if current_user.role_id not in [2, 3]:
+        return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
+    
+    try:
+        # Import the service module here to avoid circular imports
+        from app.notification_service import get_notifications_page, mark_notifications_read
+        
+        page = get_notifications_page(current_user.user_id, after=request.args.get('after'))
+        
+        if mark_notifications_read(current_user.user_id, page['notifications']):
+            db.session.commit()
+            
+            from app.notification_counts import invalidate_user_counts
+            invalidate_user_counts(current_user.user_id)
+        
+        return jsonify({
+            'success': True,
+            'notifications': page['notifications'],
+            'next_cursor': page['next_cursor']
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error getting notifications: {str(e)}")
+        return jsonify({'success': False, 'message': 'Error loading notifications'}), 500
+
+@user_routes_bp.route('/notifications/unread-count')
+@login_required
+def unread_notification_count():
+    """Get the number of unread announcements and feedback for the sidebar badge"""
+    # Ensure user is Organization President or Applicant
+    if current_user.role_id not in [2, 3]:
+        return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
+    
+    try:
+        # Import the service module here to avoid circular imports
+        from app.notification_counts import get_unread_counts
+        return jsonify({'success': True, 'unread': get_unread_counts(current_user.user_id)})
+        
+    except Exception as e:
+        print(f"Error getting unread notification count: {str(e)}")
+        return jsonify({'success': False, 'message': 'Error loading unread notifications'}), 500
 
 @user_routes_bp.route('/blockmanageaccess')
 @login_required
@@ -324,8 +268,9 @@ def documentcompilation():
         application = get_application_by_organization_and_academic_year(organization.organization_id, selected_academic_year)
         
         if application:
-            # Get all files for this application
-            application_files = ApplicationFile.query.filter_by(application_id=application.application_id).all()
+            # Get the metadata of all files for this application
+            from app.organization_service import get_application_file_summaries
+            application_files = get_application_file_summaries(application.application_id)
             
             # Define the expected file order based on application type
             if application.type == 'New':
@@ -601,15 +546,17 @@ def get_logo(logo_id):
     # Import the service module here to avoid circular imports
     from app.organization_service import get_logo_by_id
     
+    from app.download_service import send_stored_file
+    
     logo = get_logo_by_id(logo_id)
-    if not logo:
+    if not logo or not logo.has_content():
         abort(404)
     
-    return send_file(
-        io.BytesIO(logo.logo),
-        mimetype='image/jpeg',
-        as_attachment=False,
-        download_name=f'logo_{logo_id}.jpg'
+    # This URL does not change when the logo is replaced, so browsers revalidate it with the ETag
+    return send_stored_file(
+        logo,
+        mimetype=logo.mimetype or 'image/jpeg',
+        download_name=f'logo_{logo_id}'
     )
 
 @user_routes_bp.route('/update-name', methods=['POST'])
@@ -629,10 +576,12 @@ def update_name():
         if not first_name or not last_name:
             return jsonify({'success': False, 'message': 'First name and last name are required'}), 400
         
-        # Update user information
-        current_user.first_name = first_name
-        current_user.middle_name = middle_name if middle_name else None
-        current_user.last_name = last_name
+        # Update user information (current_user is a cached copy, update the row itself)
+        from app.models import User
+        user = User.query.get(current_user.user_id)
+        user.first_name = first_name
+        user.middle_name = middle_name if middle_name else None
+        user.last_name = last_name
         
         db.session.commit()
         
@@ -640,9 +589,9 @@ def update_name():
             'success': True, 
             'message': 'Name updated successfully',
             'data': {
-                'first_name': current_user.first_name,
-                'middle_name': current_user.middle_name or '',
-                'last_name': current_user.last_name
+                'first_name': user.first_name,
+                'middle_name': user.middle_name or '',
+                'last_name': user.last_name
             }
         })
         
@@ -705,81 +654,49 @@ def update_email():
         print(f"Created email change session for user {current_user.user_id}")
         
         # Send verification email with link
-        from flask_mail import Message
-        from app import mail
+        from app.mail_outbox import dispatch_email
+        from app.email_templates import render_email
         from flask import url_for
         
         verification_url = url_for('user_routes.confirm_email_change', token=token, _external=True)
         
-        msg = Message(
+        text, html = render_email(
+            'email_change_request',
+            first_name=current_user.first_name,
+            account_label='email address',
+            old_email=current_user.email,
+            new_email=new_email,
+            verification_url=verification_url,
+            team_name='NPSOMS Team'
+        )
+        
+        dispatch_email(
+            new_email,
             'Confirm Your Email Change - NPSOMS',
-            sender=current_app.config.get('MAIL_DEFAULT_SENDER', 'noreply@yourdomain.com'),
-            recipients=[new_email]
+            html=html,
+            body=text,
+            sender=current_app.config.get('MAIL_DEFAULT_SENDER', 'noreply@yourdomain.com')
         )
-        msg.html = f'''
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #2c3e50;">Email Change Verification</h2>
-                <p>Hello {current_user.first_name},</p>
-                <p>You have requested to change your email address from <strong>{current_user.email}</strong> to <strong>{new_email}</strong>.</p>
-                <p>To confirm this change, please click the button below:</p>
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="{verification_url}" 
-                       style="background-color: #3498db; color: white; padding: 12px 30px; text-decoration: none; border-radius: 5px; display: inline-block;">
-                        Confirm Email Change
-                    </a>
-                </div>
-                <p><strong>Important:</strong></p>
-                <ul>
-                    <li>This link will expire in 15 minutes</li>
-                    <li>If you did not request this change, please ignore this email</li>
-                    <li>For security, you will be automatically logged out after the change and will need to log in again with your new email address</li>
-                </ul>
-                <p>If the button doesn't work, copy and paste this link into your browser:</p>
-                <p style="word-break: break-all; background: #f8f9fa; padding: 10px; border-radius: 3px;">{verification_url}</p>
-                <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
-                <p style="font-size: 12px; color: #666;">
-                    Best regards,<br>
-                    NPSOMS Team
-                </p>
-            </div>
-        </body>
-        </html>
-        '''
-        
-        mail.send(msg)
         
         # Send notification to old email
-        old_email_msg = Message(
+        old_email_text, old_email_html = render_email(
+            'email_change_notice',
+            first_name=current_user.first_name,
+            account_label='email address',
+            old_email=current_user.email,
+            new_email=new_email,
+            team_name='NPSOMS Team',
+            generated_at=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        )
+        
+        dispatch_email(
+            current_user.email,
             'Email Change Request Notification - NPSOMS',
-            sender=current_app.config.get('MAIL_DEFAULT_SENDER', 'noreply@yourdomain.com'),
-            recipients=[current_user.email]
+            html=old_email_html,
+            body=old_email_text,
+            sender=current_app.config.get('MAIL_DEFAULT_SENDER', 'noreply@yourdomain.com')
         )
-        old_email_msg.html = f'''
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #e74c3c;">Email Change Request</h2>
-                <p>Hello {current_user.first_name},</p>
-                <p>We received a request to change your email address from <strong>{current_user.email}</strong> to <strong>{new_email}</strong>.</p>
-                <div style="background: #fff3cd; border: 1px solid #ffeaa7; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                    <p style="margin: 0;"><strong>⚠️ Security Notice:</strong></p>
-                    <p style="margin: 5px 0 0 0;">If you did not request this change, please contact the system administrator immediately.</p>
-                </div>
-                <p>The change will only take effect if the verification link sent to the new email address is clicked within 15 minutes.</p>
-                <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
-                <p style="font-size: 12px; color: #666;">
-                    Best regards,<br>
-                    NPSOMS Team<br>
-                    Time: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
-                </p>
-            </div>
-        </body>
-        </html>
-        '''
-        
-        mail.send(old_email_msg)
+        db.session.commit()
         
         return jsonify({
             'success': True, 
@@ -901,8 +818,7 @@ def update_password():
             return jsonify({'success': False, 'message': 'New password must be at least 8 characters long'})
         
         # Update password
-        import bcrypt
-        entrykey_record.entry_key = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        entrykey_record.set_entrykey(new_password)
         db.session.commit()
         
         return jsonify({'success': True, 'message': 'Password updated successfully'})
@@ -9,4 +9,15 @@ def inject_cache_version():
         dict: A dictionary containing the cache_version variable
     """
     # Using timestamp as cache version ensures a new version on each server restart
-    return {'cache_version': int(time.time())}
\ No newline at end of file
+    return {'cache_version': int(time.time())}
+
+def inject_logo_url():
+    """
+    Injects the logo_url helper into the template context.
+    Logo URLs carry a fingerprint of the logo content, so they can be cached for a year.
+    
+    Returns:
+        dict: A dictionary containing the logo_url function
+    """
+    from app.logo_thumbnails import logo_url
+    return {'logo_url': logo_url}
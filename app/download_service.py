@@ -0,0 +1,123 @@
+from urllib.parse import quote
+from flask import request, Response
+from werkzeug.datastructures import ContentRange
+
+# Extensions of the document types accepted for application files
+DOCUMENT_EXTENSIONS = {
+    'application/pdf': 'pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': 'docx',
+    'application/msword': 'doc',
+}
+
+# Names of required forms, which are stored without an extension
+FORM_FILE_NAMES = [
+    'form 1a - application for recognition', 'form 2 - letter of acceptance',
+    'form 3 - list of programs/projects/ activities', 'form 4 - list of members',
+    'board of officers', 'constitution and bylaws', 'logo with explanation'
+]
+
+
+def get_document_type(app_file):
+    """
+    Determine the mimetype and download name of an application file
+
+    Args:
+        app_file (ApplicationFile): Application file with stored content
+
+    Returns:
+        tuple: (mimetype, download_name)
+    """
+    mimetype = app_file.mimetype
+    if mimetype not in DOCUMENT_EXTENSIONS:
+        # If the type was not recognized on upload, try to infer it from the filename
+        file_name = app_file.file_name.lower()
+        mimetype = 'application/pdf'
+        for candidate, extension in DOCUMENT_EXTENSIONS.items():
+            if file_name.endswith(f".{extension}"):
+                mimetype = candidate
+                break
+
+    file_extension = DOCUMENT_EXTENSIONS[mimetype]
+
+    # Form names have no extension, so add one for the browser
+    if app_file.file_name.lower() in FORM_FILE_NAMES or '.' not in app_file.file_name:
+        download_name = f"{app_file.file_name}.{file_extension}"
+    else:
+        download_name = app_file.file_name
+
+    return mimetype, download_name
+
+
+def _content_disposition(disposition, download_name):
+    try:
+        download_name.encode('ascii')
+        return f'{disposition}; filename="{download_name}"'
+    except UnicodeEncodeError:
+        # Non-ASCII names are sent using the RFC 5987 encoding
+        return f"{disposition}; filename*=UTF-8''{quote(download_name)}"
+
+
+def send_stored_file(stored, mimetype, download_name, as_attachment=False, max_age=None):
+    """
+    Send content from the blob store as a streamed, cacheable response
+
+    The response carries a strong ETag derived from the content hash, so
+    repeated requests are answered with 304 Not Modified, and single byte
+    ranges are served with 206 Partial Content so viewers such as PDF.js
+    can load documents progressively. The content is streamed in chunks
+    and never held in memory as a whole.
+
+    Args:
+        stored (StoredBlobMixin): Model instance with stored content
+        mimetype (str): Mimetype of the response
+        download_name (str): Filename presented to the browser
+        as_attachment (bool): True to download, False to preview in browser
+        max_age (int, optional): Seconds the response may be cached for when its URL is immutable
+
+    Returns:
+        Response: Streamed file response
+    """
+    from app.blob_storage import stream_blob
+
+    file_size = stored.file_size
+    etag = stored.content_hash
+
+    response = Response(mimetype=mimetype, direct_passthrough=True)
+    response.set_etag(etag)
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Content-Disposition'] = _content_disposition(
+        'attachment' if as_attachment else 'inline', download_name
+    )
+    if max_age:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.cache_control.immutable = True
+    else:
+        # Files can change status or be replaced, so browsers revalidate with the ETag
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+
+    # The content has not changed since the browser last fetched it
+    if request.if_none_match.contains(etag):
+        response.status_code = 304
+        return response
+
+    start, stop = 0, file_size
+    if request.range and request.range.units == 'bytes':
+        # Only honour the range if the browser's copy is still the current content
+        if 'If-Range' not in request.headers or request.if_range.etag == etag:
+            byte_range = request.range.range_for_length(file_size)
+            if byte_range is None and len(request.range.ranges) == 1:
+                response.status_code = 416
+                response.headers['Content-Range'] = f"bytes */{file_size}"
+                return response
+            if byte_range is not None:
+                start, stop = byte_range
+                response.status_code = 206
+                response.content_range = ContentRange('bytes', start, stop, file_size)
+
+    response.content_length = stop - start
+    if request.method != 'HEAD':
+        response.response = stream_blob(stored.storage_key, start, stop - start)
+
+    return response
@@ -0,0 +1,124 @@
+# Email bodies are Jinja templates in templates/email, one .html and one .txt file
+# per email. They are compiled once when the application starts, and mass emails
+# render their shared content once and only fill in the recipient fields per message.
+import html
+import os
+import re
+from flask import current_app
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup, escape
+
+# Key of the compiled templates in app.extensions
+EXTENSION_KEY = 'email_templates'
+
+# Directory of the email templates, relative to the template folder
+EMAIL_TEMPLATE_DIR = 'email'
+
+# Wraps the name of a recipient field in a rendered body until it is filled in
+FIELD_MARKER = '\x1e'
+FIELD_PATTERN = re.compile(f'{FIELD_MARKER}(\\w+){FIELD_MARKER}')
+
+# Tags that end a line when an HTML message is turned into plain text
+_LINE_BREAK_TAGS = re.compile(r'<\s*(br|/p|/div|/li|/h[1-6])\b[^>]*>', re.IGNORECASE)
+_TAGS = re.compile(r'<[^>]+>')
+_BLANK_LINES = re.compile(r'\n\s*\n\s*\n+')
+
+
+def html_to_text(value):
+    """Turn an HTML fragment into plain text for the text part of an email"""
+    text = _LINE_BREAK_TAGS.sub('\n', str(value or ''))
+    text = html.unescape(_TAGS.sub('', text))
+    return _BLANK_LINES.sub('\n\n', text).strip()
+
+
+def init_email_templates(app):
+    """
+    Compile every email template once
+
+    Args:
+        app (Flask): Flask application
+    """
+    template_dir = os.path.join(app.root_path, app.template_folder, EMAIL_TEMPLATE_DIR)
+
+    # Compiled templates are kept for the lifetime of the process, the files are not checked again
+    environment = Environment(
+        loader=FileSystemLoader(template_dir),
+        autoescape=select_autoescape(['html']),
+        auto_reload=False,
+        cache_size=-1
+    )
+    environment.filters['html_to_text'] = html_to_text
+
+    templates = {}
+    for filename in environment.list_templates(extensions=['html', 'txt']):
+        templates[filename] = environment.get_template(filename)
+
+    app.extensions[EXTENSION_KEY] = templates
+
+
+def _get_templates(name):
+    templates = current_app.extensions[EXTENSION_KEY]
+    return templates[f'{name}.txt'], templates[f'{name}.html']
+
+
+def render_email(name, **context):
+    """
+    Render the text and HTML bodies of an email
+
+    Args:
+        name (str): Template name without extension, e.g. 'password_reset'
+        **context: Values used by the template
+
+    Returns:
+        tuple: (text body, HTML body)
+    """
+    text_template, html_template = _get_templates(name)
+    return text_template.render(**context), html_template.render(**context)
+
+
+class PreparedEmail:
+    """Email rendered once for many recipients, only the recipient fields are filled in per message"""
+
+    def __init__(self, text_parts, html_parts):
+        self.text_parts = text_parts
+        self.html_parts = html_parts
+
+    @staticmethod
+    def _fill(parts, values, escape_value):
+        # Even positions are rendered text, odd positions are field names
+        return ''.join(
+            part if index % 2 == 0 else escape_value(values.get(part, ''))
+            for index, part in enumerate(parts)
+        )
+
+    def render(self, **values):
+        """
+        Fill in the recipient fields
+
+        Args:
+            **values: Value of every recipient field
+
+        Returns:
+            tuple: (text body, HTML body)
+        """
+        return (
+            self._fill(self.text_parts, values, str),
+            self._fill(self.html_parts, values, lambda value: str(escape(value)))
+        )
+
+
+def prepare_email(name, fields, **context):
+    """
+    Render the shared content of an email once for a mass send
+
+    Args:
+        name (str): Template name without extension, e.g. 'announcement'
+        fields (list): Names of the context values that differ per recipient
+        **context: Values shared by every recipient
+
+    Returns:
+        PreparedEmail: Email whose render method fills in the recipient fields
+    """
+    markers = {field: Markup(f'{FIELD_MARKER}{field}{FIELD_MARKER}') for field in fields}
+    text_body, html_body = render_email(name, **context, **markers)
+    return PreparedEmail(FIELD_PATTERN.split(text_body), FIELD_PATTERN.split(html_body))
@@ -0,0 +1,271 @@
+# Application status changes and new feedback are pushed to the browser of the
+# organization user over Server-Sent Events. Every process keeps the open streams
+# of its own users in an EventHub; publishing goes through a backend so that an
+# event raised in one process reaches streams held by another process.
+import json
+import queue
+import threading
+import time
+from flask import current_app
+from app import db
+
+# Key of the event hub in app.extensions
+EXTENSION_KEY = 'event_hub'
+
+# Events kept for a stream that is not reading fast enough, older events are dropped
+STREAM_QUEUE_SIZE = 100
+
+# Milliseconds the browser waits before reconnecting a closed stream
+RECONNECT_DELAY_MS = 3000
+
+# Milliseconds the browser waits before trying again when every stream slot is taken
+BUSY_RETRY_DELAY_MS = 30000
+
+
+class EventBackend:
+    """Base interface for event hub backends"""
+
+    def start(self, deliver):
+        """Start receiving events, deliver(user_id, message) hands them to the local streams"""
+        self.deliver = deliver
+
+    def publish(self, user_id, message):
+        """Send an event to the streams of a user in every process"""
+        raise NotImplementedError
+
+
+class LocalEventBackend(EventBackend):
+    """Backend for a single process, events go straight to the local streams"""
+
+    def publish(self, user_id, message):
+        self.deliver(user_id, message)
+
+
+class RedisEventBackend(EventBackend):
+    """
+    Backend sharing events between processes over a Redis pub/sub channel.
+
+    Every process subscribes to the channel from a background thread and
+    delivers the events of the users it holds streams for.
+    """
+
+    def __init__(self, client, channel):
+        self.client = client
+        self.channel = channel
+
+    def start(self, deliver):
+        super().start(deliver)
+        thread = threading.Thread(target=self._listen, name='event-hub', daemon=True)
+        thread.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for item in pubsub.listen():
+                    payload = json.loads(item['data'])
+                    self.deliver(payload['user_id'], payload['message'])
+            except Exception as e:
+                print(f"Error receiving events: {str(e)}")
+                time.sleep(1)
+
+    def publish(self, user_id, message):
+        self.client.publish(self.channel, json.dumps({'user_id': user_id, 'message': message}))
+
+
+class EventHub:
+    """Keeps the event streams open in this process and hands events to them"""
+
+    def __init__(self, backend, max_streams):
+        self.backend = backend
+        self.max_streams = max_streams
+        self.lock = threading.Lock()
+        self.streams = {}  # user_id -> set of queues
+        self.stream_count = 0
+        backend.start(self._deliver)
+
+    def has_capacity(self):
+        """Check if another stream can be opened"""
+        with self.lock:
+            return self.stream_count < self.max_streams
+
+    def subscribe(self, user_id):
+        """
+        Open a stream for a user
+
+        Returns:
+            queue.Queue: Queue receiving the events of the user, or None when too many streams are open
+        """
+        with self.lock:
+            if self.stream_count >= self.max_streams:
+                return None
+            stream = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+            self.streams.setdefault(user_id, set()).add(stream)
+            self.stream_count += 1
+            return stream
+
+    def unsubscribe(self, user_id, stream):
+        """Close a stream opened with subscribe"""
+        with self.lock:
+            streams = self.streams.get(user_id)
+            if streams and stream in streams:
+                streams.discard(stream)
+                self.stream_count -= 1
+                if not streams:
+                    del self.streams[user_id]
+
+    def publish(self, user_id, event, data):
+        """Send an event to every stream of a user"""
+        self.backend.publish(user_id, {'event': event, 'data': data})
+
+    def _deliver(self, user_id, message):
+        with self.lock:
+            streams = list(self.streams.get(user_id, ()))
+
+        for stream in streams:
+            try:
+                stream.put_nowait(message)
+            except queue.Full:
+                # The browser is not keeping up, drop the oldest event
+                try:
+                    stream.get_nowait()
+                    stream.put_nowait(message)
+                except (queue.Empty, queue.Full):
+                    pass
+
+
+def create_event_backend(config):
+    """
+    Create an event hub backend from the application configuration
+
+    Args:
+        config (dict): Flask application configuration
+
+    Returns:
+        EventBackend: Configured event backend
+    """
+    backend = (config.get('EVENT_BACKEND') or 'local').lower()
+
+    if backend == 'local':
+        return LocalEventBackend()
+
+    if backend == 'redis':
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The 'redis' event backend requires the redis package")
+
+        client = redis.Redis.from_url(config['EVENT_REDIS_URL'])
+        return RedisEventBackend(client, config.get('EVENT_REDIS_CHANNEL') or 'npsoms-events')
+
+    raise ValueError(f"Unknown event backend: {backend}")
+
+
+def init_event_hub(app):
+    """
+    Create the event hub of the application
+
+    Args:
+        app (Flask): Flask application
+    """
+    if EXTENSION_KEY not in app.extensions:
+        app.extensions[EXTENSION_KEY] = EventHub(create_event_backend(app.config), app.config['EVENT_STREAM_MAX_CONNECTIONS'])
+
+
+def publish_event(user_id, event, data):
+    """
+    Push an event to the open streams of a user
+
+    Call it after the change has been committed. Failures are logged and do
+    not affect the request that raised the event.
+
+    Args:
+        user_id (int): ID of the user
+        event (str): Event name, e.g. 'application_status'
+        data (dict): JSON serializable event data
+    """
+    hub = current_app.extensions.get(EXTENSION_KEY)
+    if not hub or not user_id:
+        return
+
+    try:
+        hub.publish(user_id, event, data)
+    except Exception as e:
+        print(f"Error publishing event {event}: {str(e)}")
+
+
+def publish_application_event(application_id, event, data):
+    """
+    Push an event to the user owning an application
+
+    Args:
+        application_id (int): ID of the application
+        event (str): Event name
+        data (dict): JSON serializable event data, the application id and type are added
+    """
+    from app.models import Application, Organization
+
+    if not current_app.extensions.get(EXTENSION_KEY):
+        return
+
+    row = db.session.query(Organization.user_id, Application.type).join(
+        Application, Application.organization_id == Organization.organization_id
+    ).filter(Application.application_id == application_id).first()
+
+    if row:
+        publish_event(row.user_id, event, dict(data, application_id=application_id, application_type=row.type))
+
+
+def _format_event(message):
+    return f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+
+
+def open_event_stream(user_id):
+    """
+    Open the event stream of a user
+
+    The stream sends a comment every EVENT_STREAM_HEARTBEAT seconds so closed
+    connections are noticed, and ends after EVENT_STREAM_TIMEOUT seconds so the
+    worker thread is released; the browser then reconnects on its own. Every
+    open stream holds a server thread, run_prod.py adds one thread per stream
+    slot on top of the threads serving requests.
+
+    Args:
+        user_id (int): ID of the user
+
+    Returns:
+        generator: Server-Sent Events body, or None when too many streams are open
+    """
+    hub = current_app.extensions[EXTENSION_KEY]
+    timeout = current_app.config['EVENT_STREAM_TIMEOUT']
+    heartbeat = current_app.config['EVENT_STREAM_HEARTBEAT']
+
+    if not hub.has_capacity():
+        return None
+
+    def generate():
+        # Subscribe once the response is being sent, a generator that is never started never unsubscribes
+        stream = hub.subscribe(user_id)
+        if stream is None:
+            # Taken by another stream since the capacity check, try again later
+            yield f"retry: {BUSY_RETRY_DELAY_MS}\n\n"
+            return
+
+        try:
+            yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    message = stream.get(timeout=min(heartbeat, remaining))
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _format_event(message)
+        finally:
+            hub.unsubscribe(user_id, stream)
+
+    return generate()
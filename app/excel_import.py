@@ -0,0 +1,319 @@
+import pandas as pd
+from app import db
+
+# Columns every upload type must provide
+REQUIRED_COLUMNS = {
+    'officers': ['Position', 'Student Number', 'First Name', 'Middle Name', 'Last Name', 'Program'],
+    'members': ['Student Number', 'First Name', 'Middle Name', 'Last Name', 'Program'],
+    'volunteers': ['Student Number', 'First Name', 'Middle Name', 'Last Name', 'Program'],
+    'plans': ['Programs/Projects/Activities', 'Objectives', 'Proposed Date', 'People Involved', 'Source of Funds', 'Target Output'],
+}
+
+# Number of rows written per batch, each batch is committed to a savepoint on its own
+BATCH_SIZE = 500
+
+# Maximum number of values sent in a single IN query
+LOOKUP_CHUNK_SIZE = 1000
+
+
+def _format_issues(message, issues):
+    if len(issues) <= 5:
+        return f"{message} Issues: {', '.join(issues)}"
+    return f"{message} Issues: {', '.join(issues[:5])} and {len(issues) - 5} more."
+
+
+def _clean_text(value):
+    # Handle nan values from pandas - convert to None for database
+    if pd.isna(value):
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _chunks(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def validate_import(df, upload_type):
+    """
+    Validate an uploaded Excel sheet before it is imported
+
+    Every check runs over whole columns of the DataFrame instead of row by row.
+
+    Args:
+        df (DataFrame): Rows read from the uploaded Excel file
+        upload_type (str): 'officers', 'members', 'volunteers' or 'plans'
+
+    Returns:
+        tuple: (DataFrame without empty rows, error message or None)
+    """
+    from app.models import Program
+
+    required_columns = REQUIRED_COLUMNS.get(upload_type, REQUIRED_COLUMNS['members'])
+
+    missing_columns = [col for col in required_columns if col not in df.columns]
+    if missing_columns:
+        return df, f'Missing required columns: {", ".join(missing_columns)}'
+
+    # Check if the Excel file is empty
+    if df.empty:
+        return df, 'The Excel file is empty. Please add data to the file.'
+
+    # Remove rows where all required fields are empty
+    df = df.dropna(subset=required_columns, how='all')
+
+    # Check if there are any rows left after removing empty rows
+    if df.empty:
+        return df, 'No valid data found in the Excel file. Please ensure all required fields are filled.'
+
+    if upload_type != 'plans':
+        # Validate student numbers (can contain numbers, letters, and hyphens)
+        student_numbers = df['Student Number'].astype(str).str.strip()
+        invalid = df.index[~student_numbers.str.fullmatch(r'[A-Za-z0-9-]+')]
+        if len(invalid):
+            issues = [f"Row {index+1}: '{student_numbers[index]}'" for index in invalid]
+            return df, _format_issues('Invalid student numbers found. Please check your student ID numbers.', issues)
+
+        # Validate program codes against database
+        valid_program_codes = [code.upper() for (code,) in db.session.query(Program.program_code).all()]
+        program_codes = df['Program'].astype(str).str.strip().str.upper()
+        invalid = df.index[~program_codes.isin(valid_program_codes)]
+        if len(invalid):
+            issues = [f"Row {index+1}: '{df.at[index, 'Program']}'" for index in invalid]
+            return df, _format_issues('Invalid program codes found. Please use valid program codes.', issues)
+    else:
+        # Validate date format for Plans
+        proposed_dates = df['Proposed Date']
+        text_dates = proposed_dates[proposed_dates.map(lambda value: isinstance(value, str))]
+        parsed = text_dates.map(lambda value: pd.to_datetime(value, errors='coerce'))
+        invalid = parsed.index[parsed.isna()]
+        if len(invalid):
+            issues = [f"Row {index+1}: '{proposed_dates[index]}'" for index in invalid]
+            return df, _format_issues('Invalid date format found. Please use YYYY-MM-DD format.', issues)
+
+    return df, None
+
+
+def _position_for(row, upload_type):
+    # Set position based on upload type
+    if upload_type == 'officers':
+        return _clean_text(row.get('Position')) or 'Member'
+    elif upload_type == 'volunteers':
+        return 'Volunteer'
+    return 'Member'
+
+
+def _write_batch(write, rows, error_messages):
+    """Write a batch in a savepoint, retrying row by row to pinpoint the rows that fail"""
+    try:
+        with db.session.begin_nested():
+            write(rows)
+        return len(rows)
+    except Exception:
+        pass
+
+    written = 0
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                write([row])
+            written += 1
+        except Exception as e:
+            error_messages.append(f"Row {row['_row'] + 1}: {str(e)}")
+    return written
+
+
+def _insert_default_addresses(count):
+    """Insert default addresses and return their IDs"""
+    from app.models import Address
+
+    addresses = Address.__table__
+    values = [{'city': "Default City", 'province': "Default Province"}] * count
+
+    if db.session.get_bind().dialect.insert_executemany_returning:
+        # One multi-row INSERT, the addresses are all alike so the order of the IDs does not matter
+        return list(db.session.execute(addresses.insert().returning(addresses.c.address_id), values).scalars())
+
+    # MySQL cannot return the IDs of a multi-row INSERT, write the addresses one by one
+    return [db.session.execute(addresses.insert().values(value)).inserted_primary_key[0] for value in values]
+
+
+def import_affiliations(df, organization, upload_type, academic_year, progress=None):
+    """
+    Import officers, members or volunteers of an organization in bulk
+
+    Programs, students and existing affiliations are resolved with IN queries
+    and new rows are written with multi-row inserts on the tables, so the number of round
+    trips depends on the number of batches instead of the number of rows.
+    A failing batch is rolled back to its savepoint and retried row by row,
+    the rest of the upload is kept.
+
+    Args:
+        df (DataFrame): Validated rows from validate_import
+        organization (Organization): Organization the affiliations belong to
+        upload_type (str): 'officers', 'members' or 'volunteers'
+        academic_year (str): Academic year of the affiliations
+        progress (callable, optional): Called after every batch with the processed, failed and skipped counts
+
+    Returns:
+        dict: Dictionary with success_count, skipped_count and error_messages
+    """
+    from app.models import Affiliation, Program, Student
+    from app.organization_stats import refresh_organization_year_stats
+
+    error_messages = []
+    skipped_count = 0
+
+    programs = {code.upper(): program_id for program_id, code in db.session.query(Program.program_id, Program.program_code).all()}
+
+    # Normalize every row once
+    rows = []
+    for index, row in df.iterrows():
+        student_number = str(row['Student Number']).strip()
+        program_id = programs.get(str(row['Program']).strip().upper())
+        if not program_id:
+            error_messages.append(f"Row {index+1}: Program code '{row['Program']}' not found")
+            continue
+        rows.append({
+            '_row': index,
+            'student_number': student_number,
+            'program_id': program_id,
+            'first_name': _clean_text(row['First Name']),
+            'middle_name': _clean_text(row['Middle Name']),
+            'last_name': _clean_text(row['Last Name']),
+            'position': _position_for(row, upload_type)
+        })
+
+    # Resolve existing students with one IN query per chunk
+    student_ids = {}
+    for numbers in _chunks({row['student_number'] for row in rows}, LOOKUP_CHUNK_SIZE):
+        student_ids.update(db.session.query(Student.student_number, Student.student_id).filter(
+            Student.student_number.in_(numbers)
+        ).all())
+
+    # Create students that do not exist yet, the first row of a student number wins
+    new_students = {}
+    for row in rows:
+        if row['student_number'] in student_ids or row['student_number'] in new_students:
+            continue
+        if not row['first_name'] or not row['last_name']:
+            error_messages.append(f"Row {row['_row']+1}: First Name and Last Name are required for new students")
+            continue
+        new_students[row['student_number']] = row
+
+    if new_students:
+        def insert_students(batch):
+            # Every new student gets a default address of its own (can be updated later)
+            address_ids = _insert_default_addresses(len(batch))
+            db.session.execute(Student.__table__.insert(), [{
+                'program_id': row['program_id'],
+                'address_id': address_id,
+                'first_name': row['first_name'],
+                'middle_name': row['middle_name'],
+                'last_name': row['last_name'],
+                'student_number': row['student_number']
+            } for row, address_id in zip(batch, address_ids)])
+
+        for batch in _chunks(new_students.values(), BATCH_SIZE):
+            _write_batch(insert_students, batch, error_messages)
+
+        # Get the IDs of the students that were created
+        for numbers in _chunks(new_students.keys(), LOOKUP_CHUNK_SIZE):
+            student_ids.update(db.session.query(Student.student_number, Student.student_id).filter(
+                Student.student_number.in_(numbers)
+            ).all())
+
+    # Find affiliations that already exist for this organization and academic year
+    existing_affiliations = set(db.session.query(Affiliation.student_id, Affiliation.position).filter(
+        Affiliation.organization_id == organization.organization_id,
+        Affiliation.academic_year == academic_year
+    ).all())
+
+    new_affiliations = []
+    for row in rows:
+        student_id = student_ids.get(row['student_number'])
+        if not student_id:
+            # The student could not be created, the error was already reported
+            continue
+        key = (student_id, row['position'])
+        if key in existing_affiliations:
+            skipped_count += 1
+            continue
+        existing_affiliations.add(key)
+        new_affiliations.append(dict(row, student_id=student_id))
+
+    def insert_affiliations(batch):
+        db.session.execute(Affiliation.__table__.insert(), [{
+            'student_id': row['student_id'],
+            'organization_id': organization.organization_id,
+            'position': row['position'],
+            'academic_year': academic_year
+        } for row in batch])
+
+    success_count = skipped_count
+    for batch in _chunks(new_affiliations, BATCH_SIZE):
+        success_count += _write_batch(insert_affiliations, batch, error_messages)
+        if progress:
+            progress(success_count, len(error_messages), skipped_count)
+
+    # Table inserts bypass the ORM events, so refresh the statistics summary here
+    refresh_organization_year_stats(db.session.connection(), [(organization.organization_id, academic_year)])
+
+    return {'success_count': success_count, 'skipped_count': skipped_count, 'error_messages': error_messages}
+
+
+def import_plans(df, application, progress=None):
+    """
+    Import the plans of an application in bulk
+
+    Args:
+        df (DataFrame): Validated rows from validate_import
+        application (Application): Application the plans belong to
+        progress (callable, optional): Called after every batch with the processed, failed and skipped counts
+
+    Returns:
+        dict: Dictionary with success_count, skipped_count and error_messages
+    """
+    from app.models import Plan
+
+    error_messages = []
+    rows = []
+    for index, row in df.iterrows():
+        title = _clean_text(row['Programs/Projects/Activities'])
+        if not title:
+            error_messages.append(f"Row {index+1}: Programs/Projects/Activities is required")
+            continue
+
+        proposed_date = None
+        if not pd.isna(row['Proposed Date']):
+            try:
+                proposed_date = pd.to_datetime(row['Proposed Date']).date()
+            except Exception:
+                error_messages.append(f"Row {index+1}: Invalid proposed date '{row['Proposed Date']}'")
+                continue
+
+        rows.append({
+            '_row': index,
+            'application_id': application.application_id,
+            'title': title,
+            'objectives': _clean_text(row['Objectives']),
+            'proposed_date': proposed_date,
+            'people_involved': _clean_text(row['People Involved']),
+            'funding_source': _clean_text(row['Source of Funds']),
+            'target_output': _clean_text(row['Target Output'])
+        })
+
+    def insert_plans(batch):
+        db.session.execute(Plan.__table__.insert(), [
+            {key: value for key, value in row.items() if key != '_row'} for row in batch
+        ])
+
+    success_count = 0
+    for batch in _chunks(rows, BATCH_SIZE):
+        success_count += _write_batch(insert_plans, batch, error_messages)
+        if progress:
+            progress(success_count, len(error_messages), 0)
+
+    return {'success_count': success_count, 'skipped_count': 0, 'error_messages': error_messages}
@@ -0,0 +1,208 @@
+# Excel uploads are stored as import jobs and imported by a small thread pool,
+# so the request that accepts the upload returns right away instead of holding
+# a Waitress thread for the whole import.
+import io
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+
+# Key of the executor in app.extensions
+EXTENSION_KEY = 'import_jobs'
+
+
+def init_import_jobs(app):
+    """
+    Start the import worker pool and pick up the jobs left over by other processes
+
+    Queued jobs are submitted again, another process may already run them, the
+    atomic claim in run_import_job makes sure only one does. Running jobs are
+    only queued again once IMPORT_JOB_LEASE has passed since they started, their
+    process is then assumed to be gone.
+
+    Args:
+        app (Flask): Flask application
+    """
+    if EXTENSION_KEY in app.extensions:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=app.config['IMPORT_WORKERS'], thread_name_prefix='import-job')
+    app.extensions[EXTENSION_KEY] = executor
+
+    from app.models import ImportJob
+
+    try:
+        with app.app_context():
+            # Running jobs never committed their rows, so they can safely start over
+            table = ImportJob.__table__
+            lease_expired = datetime.now() - timedelta(seconds=app.config['IMPORT_JOB_LEASE'])
+            db.session.execute(table.update().where(
+                table.c.status == 'Running',
+                table.c.started_at < lease_expired
+            ).values(status='Queued'))
+            db.session.commit()
+
+            job_ids = [job_id for (job_id,) in db.session.query(ImportJob.job_id).filter(
+                ImportJob.status == 'Queued'
+            ).order_by(ImportJob.job_id).all()]
+        for job_id in job_ids:
+            executor.submit(run_import_job, app, job_id)
+    except Exception as e:
+        print(f"Error requeuing import jobs: {str(e)}")
+
+
+def submit_import_job(job_id):
+    """
+    Queue an import job on the worker pool of the current application
+
+    Without a worker pool (background workers disabled) the job stays Queued
+    and is picked up when a server process starts.
+
+    Args:
+        job_id (int): ID of a committed ImportJob
+    """
+    app = current_app._get_current_object()
+    executor = app.extensions.get(EXTENSION_KEY)
+    if executor:
+        executor.submit(run_import_job, app, job_id)
+
+
+def import_summary(success_count, error_messages):
+    """Build the message shown to the user once an import is finished"""
+    message = f"Successfully imported {success_count} records."
+    if error_messages:
+        message += f" Encountered {len(error_messages)} errors: {'; '.join(error_messages[:5])}"
+        if len(error_messages) > 5:
+            message += f" and {len(error_messages) - 5} more."
+    return message
+
+
+def job_to_dict(job):
+    """
+    Convert an import job to the dictionary returned to the polling client
+
+    Args:
+        job (ImportJob): Import job
+
+    Returns:
+        dict: Status, counts and message of the job
+    """
+    return {
+        'job_id': job.job_id,
+        'upload_type': job.upload_type,
+        'status': job.status,
+        'total_count': job.total_count,
+        'processed_count': job.processed_count,
+        'failed_count': job.failed_count,
+        'skipped_count': job.skipped_count,
+        'message': job.message,
+        'created_at': job.created_at.strftime('%Y-%m-%d %H:%M:%S') if job.created_at else None,
+        'finished_at': job.finished_at.strftime('%Y-%m-%d %H:%M:%S') if job.finished_at else None
+    }
+
+
+def _progress_reporter(job_id):
+    from app.models import ImportJob
+
+    # SQLite allows a single writer, the counts are only written when the job finishes
+    if db.engine.dialect.name == 'sqlite':
+        return None
+
+    table = ImportJob.__table__
+
+    def report(processed_count, failed_count, skipped_count):
+        # Written on its own connection so the import itself stays one transaction
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(table.update().where(table.c.job_id == job_id).values(
+                    processed_count=processed_count,
+                    failed_count=failed_count,
+                    skipped_count=skipped_count
+                ))
+        except Exception as e:
+            print(f"Error reporting progress of import job {job_id}: {str(e)}")
+
+    return report
+
+
+def _finish_job(job, status, message):
+    job.status = status
+    job.message = message
+    job.finished_at = datetime.now()
+    # The upload is not needed any more, its blob is deleted once this commits
+    job.content_hash = None
+    job.file_size = None
+    job.mimetype = None
+    job.storage_key = None
+    db.session.commit()
+
+
+def run_import_job(app, job_id):
+    """
+    Import the Excel file of a job, called on a worker thread
+
+    The imported rows and the final counts of the job are committed together,
+    a job that fails leaves no imported rows behind.
+
+    Args:
+        app (Flask): Flask application
+        job_id (int): ID of the ImportJob to run
+    """
+    import pandas as pd
+    from app.models import ImportJob, Organization
+    from app.excel_import import validate_import, import_affiliations, import_plans
+
+    with app.app_context():
+        # Claim the job, another process or worker may already have taken it
+        table = ImportJob.__table__
+        claimed = db.session.execute(table.update().where(
+            table.c.job_id == job_id,
+            table.c.status == 'Queued'
+        ).values(status='Running', started_at=datetime.now())).rowcount
+        db.session.commit()
+        if not claimed:
+            return
+
+        job = ImportJob.query.get(job_id)
+
+        try:
+            df = pd.read_excel(io.BytesIO(job.read_content()))
+
+            # Validate the Excel file structure and data based on upload type
+            df, error_message = validate_import(df, job.upload_type)
+            if error_message:
+                _finish_job(job, 'Failed', error_message)
+                return
+
+            job.total_count = len(df)
+            db.session.commit()
+
+            progress = _progress_reporter(job.job_id)
+
+            if job.upload_type == 'plans':
+                # Get the application for this organization
+                from app.organization_service import get_application_by_organization_id
+                application = get_application_by_organization_id(job.organization_id, 'New')
+                if not application:
+                    _finish_job(job, 'Failed', 'No application found for this organization. Please create an application first.')
+                    return
+                result = import_plans(df, application, progress=progress)
+            else:
+                # Get current academic year
+                current_year = datetime.now().year
+                academic_year = f"{current_year}-{current_year + 1}"
+                organization = Organization.query.get(job.organization_id)
+                result = import_affiliations(df, organization, job.upload_type, academic_year, progress=progress)
+
+            job.processed_count = result['success_count']
+            job.failed_count = len(result['error_messages'])
+            job.skipped_count = result['skipped_count']
+            _finish_job(job, 'Completed', import_summary(result['success_count'], result['error_messages']))
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error running import job {job_id}: {str(e)}")
+
+            job = ImportJob.query.get(job_id)
+            if job:
+                _finish_job(job, 'Failed', f'Error processing file: {str(e)}')
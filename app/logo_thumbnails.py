@@ -0,0 +1,144 @@
+import io
+from flask import url_for
+
+# Square sizes, in pixels, of the thumbnails rendered for every logo
+THUMBNAIL_SIZES = (64, 128, 256)
+
+# Fingerprinted logo URLs never change content, so they can be cached for a year
+LOGO_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Number of hash characters used to fingerprint logo URLs
+FINGERPRINT_LENGTH = 16
+
+
+def logo_fingerprint(content_hash):
+    """Build the URL fingerprint of a logo from its content hash"""
+    return content_hash[:FINGERPRINT_LENGTH] if content_hash else None
+
+
+def logo_url(logo_id, content_hash=None, size=None):
+    """
+    Build the URL of an organization logo
+
+    Args:
+        logo_id (int): ID of the logo
+        content_hash (str, optional): Content hash of the logo, used to build an immutable URL
+        size (int, optional): Thumbnail size in pixels, or None for the original image
+
+    Returns:
+        str: URL of the logo
+    """
+    fingerprint = logo_fingerprint(content_hash)
+    if not fingerprint:
+        # Without the hash the logo can only be served from its revalidated URL
+        return url_for('user_organization.get_logo', logo_id=logo_id)
+
+    if size:
+        return url_for('user_organization.get_logo_image', logo_id=logo_id, fingerprint=fingerprint, size=size)
+    return url_for('user_organization.get_logo_image', logo_id=logo_id, fingerprint=fingerprint)
+
+
+def _render_thumbnail(image, size):
+    from PIL import Image, features
+
+    thumbnail = image.copy()
+    thumbnail.thumbnail((size, size), Image.LANCZOS)
+
+    output = io.BytesIO()
+    if features.check('webp'):
+        thumbnail.save(output, format='WEBP', quality=85, method=4)
+        filename = f"thumbnail_{size}.webp"
+    else:
+        thumbnail.save(output, format='PNG', optimize=True)
+        filename = f"thumbnail_{size}.png"
+    output.seek(0)
+    return output, filename
+
+
+def render_thumbnails(content):
+    """
+    Render the thumbnails of an image and save them to the blob store
+
+    Args:
+        content (bytes): Content of the original image
+
+    Returns:
+        list: List of (size, blob) tuples, where blob is the dictionary returned by save_blob
+
+    Raises:
+        ImportError: If Pillow is not installed
+    """
+    from PIL import Image, ImageOps
+    from app.blob_storage import save_blob
+
+    image = Image.open(io.BytesIO(content))
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    thumbnails = []
+    for size in THUMBNAIL_SIZES:
+        output, filename = _render_thumbnail(image, size)
+        thumbnails.append((size, save_blob(output, filename)))
+    return thumbnails
+
+
+def generate_logo_thumbnails(logo):
+    """
+    Render the thumbnails of a logo and store them alongside the original
+
+    Thumbnails are skipped, and the original image is served instead, when
+    Pillow is not installed or the image cannot be decoded.
+
+    Args:
+        logo (Logo): Logo with stored content
+
+    Returns:
+        list: List of LogoThumbnail objects
+    """
+    from app.models import LogoThumbnail
+
+    # Thumbnails of the previous image must never be served for the new one
+    logo.thumbnails = []
+
+    try:
+        rendered = render_thumbnails(logo.read_content())
+    except ImportError:
+        print("Pillow is not installed, logo thumbnails will not be generated")
+        return []
+    except Exception as e:
+        print(f"Error generating thumbnails for logo: {str(e)}")
+        return []
+
+    for size, blob in rendered:
+        logo.thumbnails.append(LogoThumbnail(size=size, **blob))
+
+    return logo.thumbnails
+
+
+def store_logo_image(logo, logo_file):
+    """
+    Store an uploaded logo image and render its thumbnails
+
+    Args:
+        logo (Logo): Logo to update
+        logo_file (FileStorage): Uploaded image file
+    """
+    logo.store_content(logo_file, logo_file.filename)
+    generate_logo_thumbnails(logo)
+
+
+def get_logo_thumbnail(logo, size):
+    """
+    Get the thumbnail of a logo for the given size
+
+    Args:
+        logo (Logo): Logo object
+        size (int): Thumbnail size in pixels
+
+    Returns:
+        LogoThumbnail: Thumbnail object or None
+    """
+    for thumbnail in logo.thumbnails:
+        if thumbnail.size == size and thumbnail.has_content():
+            return thumbnail
+    return None
@@ -0,0 +1,552 @@
+# Emails are written to the email_outbox table in the same transaction as the
+# change that triggers them, and a background thread delivers them in batches
+# over a single SMTP connection per batch, retrying failed messages with backoff.
+# Emails a user is waiting for are also handed to a small dispatcher pool that
+# sends them right away once the transaction that queued them is committed, the
+# outbox only takes over when that attempt fails.
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+from flask_mail import Message
+from sqlalchemy import event
+from app import db, mail
+
+# Key of the sender state in app.extensions
+EXTENSION_KEY = 'mail_outbox'
+
+# Longest delay between two attempts of the same message, in seconds
+MAX_RETRY_DELAY = 60 * 60
+
+# Seconds between two runs of the outbox maintenance (stale claims, old bodies)
+MAINTENANCE_INTERVAL = 5 * 60
+
+# Errors after which the SMTP connection cannot be used for the rest of the batch
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+# Key in Session.info with the messages to dispatch once the transaction commits
+DISPATCH_KEY = 'mail_outbox_dispatch'
+
+
+def queue_email(recipient, subject, html=None, body=None, sender=None):
+    """
+    Add an email to the outbox, it is sent once the current transaction is committed
+
+    Args:
+        recipient (str): Email address of the recipient
+        subject (str): Subject of the email
+        html (str, optional): HTML body
+        body (str, optional): Plain text body
+        sender (str, optional): Sender address, defaults to MAIL_DEFAULT_SENDER
+
+    Returns:
+        OutboxMessage: The queued message
+    """
+    from app.models import OutboxMessage
+
+    message = OutboxMessage(
+        recipient=recipient,
+        sender=sender,
+        subject=subject,
+        html_body=html,
+        text_body=body,
+        status='Pending',
+        next_attempt_at=datetime.now()
+    )
+    db.session.add(message)
+    return message
+
+
+def queue_emails(messages):
+    """
+    Add many emails to the outbox with one multi-row insert
+
+    Args:
+        messages (list): Dictionaries with recipient, subject and optional html, body and sender
+
+    Returns:
+        int: Number of queued emails
+    """
+    from app.models import OutboxMessage
+
+    if not messages:
+        return 0
+
+    now = datetime.now()
+    db.session.execute(OutboxMessage.__table__.insert(), [{
+        'recipient': message['recipient'],
+        'sender': message.get('sender'),
+        'subject': message['subject'],
+        'html_body': message.get('html'),
+        'text_body': message.get('body'),
+        'status': 'Pending',
+        'attempts': 0,
+        'next_attempt_at': now,
+        'created_at': now
+    } for message in messages])
+    return len(messages)
+
+
+def wake_outbox_sender():
+    """Ask the background sender to deliver the queued emails now instead of at its next poll"""
+    state = current_app.extensions.get(EXTENSION_KEY)
+    if state:
+        state['wake'].set()
+
+
+def dispatch_email(recipient, subject, html=None, body=None, sender=None):
+    """
+    Queue an email and send it on the dispatcher pool as soon as the caller commits
+
+    The message is part of the current transaction like queue_email, nothing is
+    sent when the caller rolls back. When sending fails the message stays in the
+    outbox and is retried with backoff.
+
+    Args:
+        recipient (str): Email address of the recipient
+        subject (str): Subject of the email
+        html (str, optional): HTML body
+        body (str, optional): Plain text body
+        sender (str, optional): Sender address, defaults to MAIL_DEFAULT_SENDER
+
+    Returns:
+        int: ID of the outbox message, used to poll its delivery status
+    """
+    message = queue_email(recipient, subject, html=html, body=body, sender=sender)
+    db.session.flush()
+    db.session.info.setdefault(DISPATCH_KEY, []).append(message.message_id)
+    return message.message_id
+
+
+def _dispatch_after_commit(session):
+    message_ids = session.info.pop(DISPATCH_KEY, None)
+    if not message_ids or not has_app_context():
+        return
+
+    state = current_app.extensions.get(EXTENSION_KEY)
+    if state:
+        app = current_app._get_current_object()
+        for message_id in message_ids:
+            state['dispatcher'].submit(_dispatch, app, message_id)
+
+
+def _discard_after_rollback(session):
+    session.info.pop(DISPATCH_KEY, None)
+
+
+event.listen(db.session, 'after_commit', _dispatch_after_commit)
+event.listen(db.session, 'after_rollback', _discard_after_rollback)
+
+
+def get_email_delivery(message_id):
+    """
+    Get the delivery state of an outbox message
+
+    Args:
+        message_id (int): ID of the outbox message
+
+    Returns:
+        dict: status ('Pending', 'Sending', 'Sent' or 'Failed'), attempts and last_error,
+        or None if the message does not exist
+    """
+    from app.models import OutboxMessage
+
+    row = db.session.query(
+        OutboxMessage.status, OutboxMessage.attempts, OutboxMessage.last_error
+    ).filter(OutboxMessage.message_id == message_id).first()
+    if not row:
+        return None
+    return {'status': row.status, 'attempts': row.attempts, 'last_error': row.last_error}
+
+
+def cancel_email(message_id, reason):
+    """
+    Stop the retries of a message that was not sent yet, e.g. a code replaced by a new one
+
+    The change is part of the current transaction, the caller commits it.
+
+    Args:
+        message_id (int): ID of the outbox message
+        reason (str): Stored as the last error of the message
+
+    Returns:
+        bool: True if the message was cancelled, False if it is being sent or was already sent
+    """
+    from app.models import OutboxMessage
+
+    table = OutboxMessage.__table__
+    cancelled = db.session.execute(table.update().where(
+        table.c.message_id == message_id,
+        table.c.status == 'Pending'
+    ).values(status='Failed', last_error=reason)).rowcount
+    return bool(cancelled)
+
+
+def _new_metrics():
+    return {
+        'sent_total': 0,
+        'failed_total': 0,
+        'retried_total': 0,
+        'batch_count': 0,
+        'last_batch_size': 0,
+        'last_batch_seconds': 0.0,
+        'last_batch_rate': 0.0,  # Messages per second of the last batch
+        'last_run_at': None,
+        'last_error': None
+    }
+
+
+def init_mail_outbox(app):
+    """
+    Start the background sender of the email outbox
+
+    Messages left in the Sending status by a lost process are queued again once
+    MAIL_OUTBOX_SENDING_LEASE has passed since they were claimed.
+
+    Args:
+        app (Flask): Flask application
+    """
+    if EXTENSION_KEY in app.extensions:
+        return
+
+    state = {
+        'wake': threading.Event(),
+        'lock': threading.Lock(),
+        'metrics': _new_metrics(),
+        'dispatcher': ThreadPoolExecutor(max_workers=app.config['MAIL_DISPATCH_WORKERS'], thread_name_prefix='mail-dispatch')
+    }
+    app.extensions[EXTENSION_KEY] = state
+
+    thread = threading.Thread(target=_sender_loop, args=(app, state), name='mail-outbox', daemon=True)
+    state['thread'] = thread
+    thread.start()
+
+
+def requeue_stale_messages():
+    """
+    Queue again the messages whose sender stopped before finishing them
+
+    Returns:
+        int: Number of messages set back to Pending
+    """
+    from app.models import OutboxMessage
+
+    table = OutboxMessage.__table__
+    lease_expired = datetime.now() - timedelta(seconds=current_app.config['MAIL_OUTBOX_SENDING_LEASE'])
+    requeued = db.session.execute(table.update().where(
+        table.c.status == 'Sending',
+        db.or_(table.c.claimed_at.is_(None), table.c.claimed_at < lease_expired)
+    ).values(status='Pending', claimed_at=None)).rowcount
+    db.session.commit()
+    return requeued
+
+
+def purge_message_bodies():
+    """
+    Remove the bodies of sent and failed messages older than MAIL_OUTBOX_BODY_RETENTION days,
+    they contain password reset links and verification codes
+
+    Returns:
+        int: Number of messages whose bodies were removed
+    """
+    from app.models import OutboxMessage
+
+    table = OutboxMessage.__table__
+    cutoff = datetime.now() - timedelta(days=current_app.config['MAIL_OUTBOX_BODY_RETENTION'])
+    has_body = db.or_(table.c.html_body.isnot(None), table.c.text_body.isnot(None))
+    purged = db.session.execute(table.update().where(
+        db.or_(
+            db.and_(table.c.status == 'Sent', table.c.sent_at < cutoff),
+            db.and_(table.c.status == 'Failed', table.c.created_at < cutoff)
+        ),
+        has_body
+    ).values(html_body=None, text_body=None)).rowcount
+    db.session.commit()
+    return purged
+
+
+def _maintain_outbox(app):
+    try:
+        with app.app_context():
+            requeue_stale_messages()
+            purge_message_bodies()
+    except Exception as e:
+        print(f"Error maintaining the outbox: {str(e)}")
+
+
+def _sender_loop(app, state):
+    _maintain_outbox(app)
+    last_maintenance = time.monotonic()
+
+    while True:
+        state['wake'].wait(app.config['MAIL_OUTBOX_POLL_INTERVAL'])
+        state['wake'].clear()
+
+        if time.monotonic() - last_maintenance >= MAINTENANCE_INTERVAL:
+            _maintain_outbox(app)
+            last_maintenance = time.monotonic()
+
+        try:
+            # Keep sending while full batches are waiting
+            while True:
+                with app.app_context():
+                    processed = send_outbox_batch()
+                if processed < app.config['MAIL_OUTBOX_BATCH_SIZE']:
+                    break
+        except Exception as e:
+            print(f"Error sending outbox emails: {str(e)}")
+
+
+def _build_message(outbox_message):
+    return Message(
+        subject=outbox_message.subject,
+        sender=outbox_message.sender or current_app.config.get('MAIL_DEFAULT_SENDER'),
+        recipients=[outbox_message.recipient],
+        body=outbox_message.text_body,
+        html=outbox_message.html_body
+    )
+
+
+def _record_failure(outbox_message, error):
+    outbox_message.attempts += 1
+    outbox_message.last_error = str(error)
+
+    if outbox_message.attempts >= current_app.config['MAIL_OUTBOX_MAX_ATTEMPTS']:
+        outbox_message.status = 'Failed'
+        return False
+
+    # Exponential backoff: retry delay, then twice that, then four times...
+    delay = min(current_app.config['MAIL_OUTBOX_RETRY_DELAY'] * 2 ** (outbox_message.attempts - 1), MAX_RETRY_DELAY)
+    outbox_message.status = 'Pending'
+    outbox_message.next_attempt_at = datetime.now() + timedelta(seconds=delay)
+    return True
+
+
+def _mark_sent(outbox_message):
+    outbox_message.attempts += 1
+    outbox_message.status = 'Sent'
+    outbox_message.sent_at = datetime.now()
+    outbox_message.last_error = None
+
+
+def _record_metrics(sent_count, failed_count, retried_count, batch_size, elapsed, last_error):
+    state = current_app.extensions.get(EXTENSION_KEY)
+    if not state:
+        return
+
+    with state['lock']:
+        metrics = state['metrics']
+        metrics['sent_total'] += sent_count
+        metrics['failed_total'] += failed_count
+        metrics['retried_total'] += retried_count
+        metrics['batch_count'] += 1
+        metrics['last_batch_size'] = batch_size
+        metrics['last_batch_seconds'] = round(elapsed, 3)
+        metrics['last_batch_rate'] = round(sent_count / elapsed, 2) if elapsed else float(sent_count)
+        metrics['last_run_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if last_error:
+            metrics['last_error'] = last_error
+
+
+def _dispatch(app, message_id):
+    from app.models import OutboxMessage
+
+    with app.app_context():
+        try:
+            # Claim the message, it may already have been taken by the outbox sender
+            table = OutboxMessage.__table__
+            claimed = db.session.execute(table.update().where(
+                table.c.message_id == message_id,
+                table.c.status == 'Pending'
+            ).values(status='Sending', claimed_at=datetime.now())).rowcount
+            db.session.commit()
+            if not claimed:
+                return
+
+            message = OutboxMessage.query.get(message_id)
+            started = time.monotonic()
+            sent = False
+            error = None
+            try:
+                with mail.connect() as connection:
+                    connection.send(_build_message(message))
+                    sent = True
+            except Exception as e:
+                error = e
+
+            if sent:
+                _mark_sent(message)
+                retried = False
+            else:
+                print(f"Error dispatching email {message_id}: {str(error)}")
+                retried = _record_failure(message, error)
+            db.session.commit()
+
+            _record_metrics(
+                1 if sent else 0,
+                0 if sent or retried else 1,
+                1 if retried else 0,
+                1,
+                time.monotonic() - started,
+                str(error) if error else None
+            )
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error dispatching email {message_id}: {str(e)}")
+
+
+def send_outbox_batch():
+    """
+    Send one batch of due outbox messages over a single SMTP connection
+
+    Returns:
+        int: Number of messages taken from the outbox
+    """
+    from app.models import OutboxMessage
+
+    # Claim the batch, rows locked by another sender are skipped
+    messages = OutboxMessage.query.filter(
+        OutboxMessage.status == 'Pending',
+        OutboxMessage.next_attempt_at <= datetime.now()
+    ).order_by(
+        OutboxMessage.message_id
+    ).limit(
+        current_app.config['MAIL_OUTBOX_BATCH_SIZE']
+    ).with_for_update(skip_locked=True).all()
+
+    if not messages:
+        db.session.commit()
+        return 0
+
+    claimed_at = datetime.now()
+    for message in messages:
+        message.status = 'Sending'
+        message.claimed_at = claimed_at
+    db.session.commit()
+
+    started = time.monotonic()
+    sent_count = failed_count = retried_count = 0
+    last_error = None
+
+    try:
+        with mail.connect() as connection:
+            for message in messages:
+                try:
+                    connection.send(_build_message(message))
+                except CONNECTION_ERRORS:
+                    raise
+                except Exception as e:
+                    # Only this message is rejected, keep using the connection
+                    last_error = str(e)
+                    if _record_failure(message, e):
+                        retried_count += 1
+                    else:
+                        failed_count += 1
+                else:
+                    _mark_sent(message)
+                    sent_count += 1
+
+                # Commit every message so a crash never sends it twice
+                db.session.commit()
+    except Exception as e:
+        # Connecting failed or the connection was lost, the rest of the batch is retried later
+        last_error = str(e)
+        print(f"Error sending outbox batch: {last_error}")
+        for message in messages:
+            if message.status == 'Sending':
+                if _record_failure(message, e):
+                    retried_count += 1
+                else:
+                    failed_count += 1
+        db.session.commit()
+
+    _record_metrics(sent_count, failed_count, retried_count, len(messages), time.monotonic() - started, last_error)
+
+    return len(messages)
+
+
+def get_outbox_status():
+    """
+    Get the number of outbox messages per status and the sender metrics
+
+    Returns:
+        dict: Dictionary with counts per status and the metrics of this process
+    """
+    from app.models import OutboxMessage
+
+    counts = {'Pending': 0, 'Sending': 0, 'Sent': 0, 'Failed': 0}
+    counts.update(db.session.query(
+        OutboxMessage.status, db.func.count(OutboxMessage.message_id)
+    ).group_by(OutboxMessage.status).all())
+
+    metrics = _new_metrics()
+    state = current_app.extensions.get(EXTENSION_KEY)
+    if state:
+        with state['lock']:
+            metrics = dict(state['metrics'])
+
+    return {'counts': counts, 'metrics': metrics}
+
+
+mail_cli = AppGroup('mail', help='Email outbox tools.')
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+@mail_cli.command('benchmark')
+@click.option('--messages', default=100, show_default=True, help='Emails sent per mode.')
+@click.option('--recipient', default='benchmark@localhost', show_default=True, help='Recipient of the benchmark emails.')
+def benchmark_command(messages, recipient):
+    """Compare how long a request waits for an email: sent over SMTP or dispatched from the outbox.
+
+    Emails go to the configured MAIL_SERVER, point it to a local debugging SMTP server.
+    """
+    from app.models import OutboxMessage
+
+    app = current_app._get_current_object()
+    subject = 'NPSOMS mail benchmark'
+    click.echo(f"{messages} emails per mode through {app.config['MAIL_SERVER']}:{app.config['MAIL_PORT']}")
+
+    # Sending over SMTP in the request, as the auth routes did before the outbox
+    latencies = []
+    for index in range(messages):
+        started = time.monotonic()
+        mail.send(Message(subject=subject, sender=app.config.get('MAIL_DEFAULT_SENDER'), recipients=[recipient], body=f'Message {index}'))
+        latencies.append(time.monotonic() - started)
+    click.echo(f"smtp:     p50 {_percentile(latencies, 50) * 1000:.1f}ms, p99 {_percentile(latencies, 99) * 1000:.1f}ms")
+
+    # The CLI does not start the background workers, start the dispatcher for this run
+    init_mail_outbox(app)
+
+    latencies = []
+    message_ids = []
+    started_all = time.monotonic()
+    for index in range(messages):
+        started = time.monotonic()
+        message_ids.append(dispatch_email(recipient, subject, body=f'Message {index}'))
+        db.session.commit()
+        latencies.append(time.monotonic() - started)
+    click.echo(f"dispatch: p50 {_percentile(latencies, 50) * 1000:.1f}ms, p99 {_percentile(latencies, 99) * 1000:.1f}ms")
+
+    # Wait for the dispatcher to deliver the queued emails
+    delivered = 0
+    while time.monotonic() - started_all < 120:
+        db.session.rollback()
+        delivered = OutboxMessage.query.filter(
+            OutboxMessage.message_id.in_(message_ids),
+            OutboxMessage.status.in_(['Sent', 'Failed'])
+        ).count()
+        if delivered == len(message_ids):
+            break
+        time.sleep(0.2)
+    click.echo(f"dispatch: {delivered}/{len(message_ids)} delivered in {time.monotonic() - started_all:.2f}s")
+
+    OutboxMessage.query.filter(OutboxMessage.message_id.in_(message_ids)).delete(synchronize_session=False)
+    db.session.commit()
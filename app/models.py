@@ -1,8 +1,40 @@
 from app import db
 from flask_login import UserMixin
-import bcrypt
 from datetime import datetime
 
+# ✅ Stored Blob Mixin (content lives in the blob store, rows keep metadata only)
+class StoredBlobMixin:
+    content_hash = db.Column(db.String(64))  # SHA-256 of the content
+    file_size = db.Column(db.Integer)
+    mimetype = db.Column(db.String(100))
+    storage_key = db.Column(db.String(255))  # Key of the content in the blob store
+
+    def store_content(self, source, filename=None):
+        from app.blob_storage import save_blob
+        blob = save_blob(source, filename)
+        self.content_hash = blob['content_hash']
+        self.file_size = blob['file_size']
+        self.mimetype = blob['mimetype']
+        self.storage_key = blob['storage_key']
+
+    def copy_content_from(self, other):
+        # Content is addressed by hash, so copying only needs the metadata
+        self.content_hash = other.content_hash
+        self.file_size = other.file_size
+        self.mimetype = other.mimetype
+        self.storage_key = other.storage_key
+
+    def has_content(self):
+        return bool(self.storage_key) and bool(self.file_size)
+
+    def open_content(self):
+        from app.blob_storage import open_blob
+        return open_blob(self.storage_key)
+
+    def read_content(self):
+        from app.blob_storage import read_blob
+        return read_blob(self.storage_key)
+
 # ✅ Role Model
 class Role(db.Model):
     __tablename__ = 'roles'
@@ -23,6 +55,7 @@ class User(db.Model, UserMixin):
     last_name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(255), unique=True, nullable=False)
     is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)  # UTC like Announcement.date_sent, NULL for users created before it was recorded
 
     # Relationships
     entry_key = db.relationship('EntryKey', backref='user', uselist=False, cascade="all, delete-orphan")
@@ -41,10 +74,19 @@ class EntryKey(db.Model):
     entry_key = db.Column(db.String(255), nullable=False)
 
     def __init__(self, entrykey):
-        self.entry_key = bcrypt.hashpw(entrykey.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.set_entrykey(entrykey)
+
+    def set_entrykey(self, entrykey):
+        from app.password_hashing import hash_password
+        self.entry_key = hash_password(entrykey)
 
     def check_entrykey(self, entrykey):
-        return bcrypt.checkpw(entrykey.encode('utf-8'), self.entry_key.encode('utf-8'))
+        from app.password_hashing import verify_password
+        return verify_password(entrykey, self.entry_key)
+
+    def needs_rehash(self):
+        from app.password_hashing import needs_rehash
+        return needs_rehash(self.entry_key)
 
 # ✅ Program Model
 class Program(db.Model):
@@ -67,14 +109,21 @@ class Address(db.Model):
     students = db.relationship('Student', backref='address', lazy=True)
 
 # ✅ Logo Model
-class Logo(db.Model):
+class Logo(StoredBlobMixin, db.Model):
     __tablename__ = 'logos'
     logo_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    logo = db.Column(db.LargeBinary)  # LONGBLOB equivalent
     description = db.Column(db.Text)
     
     # Relationships
     organizations = db.relationship('Organization', backref='logo', lazy=True)
+    thumbnails = db.relationship('LogoThumbnail', backref='logo', lazy=True, cascade="all, delete-orphan")
+
+# ✅ LogoThumbnail Model (pre-rendered logo sizes)
+class LogoThumbnail(StoredBlobMixin, db.Model):
+    __tablename__ = 'logo_thumbnails'
+    thumbnail_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    logo_id = db.Column(db.Integer, db.ForeignKey('logos.logo_id', ondelete='CASCADE'), nullable=False)
+    size = db.Column(db.Integer, nullable=False)  # Width and height limit in pixels
 
 # ✅ Organization Model
 class Organization(db.Model):
@@ -120,6 +169,42 @@ class Affiliation(db.Model):
     organization_id = db.Column(db.Integer, db.ForeignKey('organizations.organization_id'), nullable=False)
     position = db.Column(db.String(100))
     academic_year = db.Column(db.String(20))
+    
+    __table_args__ = (
+        db.Index('idx_affiliation_org_position_year', 'organization_id', 'position', 'academic_year'),
+    )
+
+# ✅ Organization Year Stats Model (summary kept up to date by app.organization_stats)
+class OrganizationYearStats(db.Model):
+    __tablename__ = 'organization_year_stats'
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.organization_id'), primary_key=True)
+    academic_year = db.Column(db.String(20), primary_key=True)
+    officer_count = db.Column(db.Integer, nullable=False, default=0)
+    member_count = db.Column(db.Integer, nullable=False, default=0)  # Members only, officers are counted separately
+    volunteer_count = db.Column(db.Integer, nullable=False, default=0)
+    accomplished_activities = db.Column(db.Integer, nullable=False, default=0)
+
+# ✅ Import Job Model (Excel uploads imported in the background, the uploaded file lives in the blob store)
+class ImportJob(StoredBlobMixin, db.Model):
+    __tablename__ = 'import_jobs'
+    job_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.organization_id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    upload_type = db.Column(db.String(20), nullable=False)  # officers, members, volunteers, plans
+    filename = db.Column(db.String(255))
+    status = db.Column(db.String(20), nullable=False, default='Queued')  # Queued, Running, Completed, Failed
+    total_count = db.Column(db.Integer, nullable=False, default=0)
+    processed_count = db.Column(db.Integer, nullable=False, default=0)
+    failed_count = db.Column(db.Integer, nullable=False, default=0)
+    skipped_count = db.Column(db.Integer, nullable=False, default=0)
+    message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('idx_import_job_status', 'status'),
+    )
 
 # ✅ Social Media Model
 class SocialMedia(db.Model):
@@ -144,6 +229,11 @@ class Application(db.Model):
     # Relationships
     plans = db.relationship('Plan', backref='application', lazy=True)
     application_files = db.relationship('ApplicationFile', backref='application', lazy=True)
+    
+    __table_args__ = (
+        db.Index('idx_application_org_type_year', 'organization_id', 'type', 'academic_year'),
+        db.Index('idx_application_status_type', 'status', 'type'),
+    )
 
 # ✅ Plan Model
 class Plan(db.Model):
@@ -161,16 +251,19 @@ class Plan(db.Model):
     # Note: academic_year is available through plan.application.academic_year relationship
 
 # ✅ Application File Model
-class ApplicationFile(db.Model):
+class ApplicationFile(StoredBlobMixin, db.Model):
     __tablename__ = 'application_files'
     app_file_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     application_id = db.Column(db.Integer, db.ForeignKey('applications.application_id'), nullable=False)
     file_name = db.Column(db.String(255), nullable=False)
-    file = db.Column(db.LargeBinary)  # LONGBLOB equivalent
     status = db.Column(db.String(50))  # pending, approved, rejected
     submission_date = db.Column(db.DateTime, default=datetime.utcnow)  # Date and time when the file was submitted
     
     # Note: feedback relationship is defined in the Feedback model
+    
+    __table_args__ = (
+        db.Index('idx_application_file_app_status', 'application_id', 'status'),
+    )
 
 # ✅ Adviser Model
 class Adviser(db.Model):
@@ -212,20 +305,117 @@ class Announcement(db.Model):
     subject = db.Column(db.String(255), nullable=False)
     message = db.Column(db.Text, nullable=False)
     date_sent = db.Column(db.DateTime, default=datetime.utcnow)
+    # Who receives the announcement: 'all' organization users, the users of the
+    # organizations in announcement_organizations, or the users in announcement_recipients
+    audience = db.Column(db.String(20), nullable=False, default='users')
+    recipient_count = db.Column(db.Integer)  # Size of the audience when the announcement was sent
     
     # Relationships
     announcement_recipients = db.relationship('AnnouncementRecipient', backref='announcement', lazy=True)
+    announcement_organizations = db.relationship('AnnouncementOrganization', backref='announcement', lazy=True)
+    announcement_reads = db.relationship('AnnouncementRead', backref='announcement', lazy=True)
+    
+    __table_args__ = (
+        db.Index('idx_announcement_audience_date', 'audience', 'date_sent'),
+    )
 
-# ✅ Announcement Recipient Model (Junction table)
+# ✅ Announcement Recipient Model (users targeted by an announcement with the 'users' audience)
 class AnnouncementRecipient(db.Model):
     __tablename__ = 'announcement_recipients'
     announcement_id = db.Column(db.Integer, db.ForeignKey('announcements.announcement_id'), primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
-    is_read = db.Column(db.Boolean, default=False)
+    
+    __table_args__ = (
+        db.Index('idx_announcement_recipient_user', 'user_id'),
+    )
+
+# ✅ Announcement Organization Model (organizations targeted by an announcement with the 'organizations' audience)
+class AnnouncementOrganization(db.Model):
+    __tablename__ = 'announcement_organizations'
+    announcement_id = db.Column(db.Integer, db.ForeignKey('announcements.announcement_id'), primary_key=True)
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.organization_id'), primary_key=True)
+    
+    __table_args__ = (
+        db.Index('idx_announcement_organization_org', 'organization_id'),
+    )
+
+# ✅ Announcement Read Model (a row only exists once the user has read the announcement)
+class AnnouncementRead(db.Model):
+    __tablename__ = 'announcement_reads'
+    announcement_id = db.Column(db.Integer, db.ForeignKey('announcements.announcement_id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    read_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_announcement_read_user', 'user_id'),
+    )
+
+# ✅ Outbox Message Model (emails queued in the request and delivered by the background sender)
+class OutboxMessage(db.Model):
+    __tablename__ = 'email_outbox'
+    message_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    recipient = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.String(255))
+    subject = db.Column(db.String(255), nullable=False)
+    html_body = db.Column(db.Text)
+    text_body = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False, default='Pending')  # Pending, Sending, Sent, Failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.now)
+    claimed_at = db.Column(db.DateTime)  # When a sender set the message to Sending
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('idx_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+# ✅ Rate Limit Bucket Model (token buckets shared by every process with the 'database' rate limit backend)
+class RateLimitBucket(db.Model):
+    __tablename__ = 'rate_limit_buckets'
+    bucket_key = db.Column(db.String(255), primary_key=True)  # e.g. login:ip:203.0.113.5
+    tokens = db.Column(db.Double, nullable=False)
+    updated_at = db.Column(db.Double, nullable=False)  # Unix time of the last update
+    expires_at = db.Column(db.Double, nullable=False)  # Unix time at which the bucket is full again
+
+    __table_args__ = (
+        db.Index('idx_rate_limit_bucket_expires', 'expires_at'),
+    )
+
+# ✅ User Session Model (session data kept on the server, the cookie only carries session_id)
+class UserSession(db.Model):
+    __tablename__ = 'user_sessions'
+    session_id = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)  # Session serialized with Flask's tagged JSON
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_user_session_expires', 'expires_at'),
+    )
+
+# ✅ Scheduler Run Model (history of the background jobs, e.g. the organization expiry check)
+class SchedulerRun(db.Model):
+    __tablename__ = 'scheduler_runs'
+    run_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    job_name = db.Column(db.String(100), nullable=False)
+    trigger = db.Column(db.String(20), nullable=False)  # scheduler, manual
+    status = db.Column(db.String(20), nullable=False)  # Success, Failed
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    duration_ms = db.Column(db.Integer)
+    rows_affected = db.Column(db.Integer, nullable=False, default=0)
+    affected_ids = db.Column(db.Text)  # Comma separated ids of the changed rows
+    error = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('idx_scheduler_run_job_started', 'job_name', 'started_at'),
+    )
 
 # User loader callback for Flask-Login
 from app import login_manager
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
\ No newline at end of file
+    from app.user_cache import load_cached_user
+    return load_cached_user(int(user_id))
\ No newline at end of file
@@ -0,0 +1,140 @@
+# Unread notification counts shown on the user sidebar are cached per user in
+# the process. A new or deleted announcement changes the count of many users at
+# once, so it only bumps a version that makes every cached announcement count
+# stale, while feedback changes drop the cached counts of the one user they
+# belong to. Entries also expire after NOTIFICATION_COUNT_TTL seconds so changes
+# made by another process are picked up.
+import threading
+import time
+from flask import current_app
+from app import db
+
+# Key of the cached counts in app.extensions
+EXTENSION_KEY = 'notification_counts'
+
+
+def init_notification_counts(app):
+    """
+    Create the unread notification count cache
+
+    Args:
+        app (Flask): Flask application
+    """
+    app.extensions[EXTENSION_KEY] = {
+        'lock': threading.Lock(),
+        'counts': {},
+        'announcement_version': 0,
+        # Bumped by every per-user invalidation so counts computed before it are not cached
+        'generation': 0
+    }
+
+
+def count_unread_feedback(user_id):
+    """
+    Count the unread feedback on the application files of a user's organizations
+
+    Args:
+        user_id (int): ID of the user
+
+    Returns:
+        int: Number of unread feedback
+    """
+    from app.models import Feedback, ApplicationFile, Application, Organization
+
+    return db.session.query(db.func.count(Feedback.feedback_id)).join(
+        ApplicationFile, Feedback.app_file_id == ApplicationFile.app_file_id
+    ).join(
+        Application, ApplicationFile.application_id == Application.application_id
+    ).join(
+        Organization, Application.organization_id == Organization.organization_id
+    ).filter(
+        Organization.user_id == user_id,
+        Feedback.is_read == False
+    ).scalar()
+
+
+def get_unread_counts(user_id):
+    """
+    Get the number of unread announcements and feedback of a user
+
+    Args:
+        user_id (int): ID of the user
+
+    Returns:
+        dict: Dictionary with announcements, feedback and total counts
+    """
+    from app.announcement_service import count_unread_announcements
+
+    state = current_app.extensions.get(EXTENSION_KEY)
+    if not state:
+        announcements = count_unread_announcements(user_id)
+        feedback = count_unread_feedback(user_id)
+        return {'announcements': announcements, 'feedback': feedback, 'total': announcements + feedback}
+
+    now = time.monotonic()
+    with state['lock']:
+        version = state['announcement_version']
+        generation = state['generation']
+        entry = state['counts'].get(user_id)
+
+    if entry and now - entry['cached_at'] < current_app.config['NOTIFICATION_COUNT_TTL']:
+        if entry['version'] == version:
+            return entry['unread']
+        # Only the announcement count is stale
+        announcements = count_unread_announcements(user_id)
+        feedback = entry['unread']['feedback']
+        cached_at = entry['cached_at']
+    else:
+        announcements = count_unread_announcements(user_id)
+        feedback = count_unread_feedback(user_id)
+        cached_at = now
+
+    unread = {'announcements': announcements, 'feedback': feedback, 'total': announcements + feedback}
+
+    with state['lock']:
+        if state['generation'] == generation:
+            state['counts'][user_id] = {'version': version, 'cached_at': cached_at, 'unread': unread}
+
+    return unread
+
+
+def invalidate_announcement_counts():
+    """Mark the cached announcement counts of every user as stale"""
+    state = current_app.extensions.get(EXTENSION_KEY)
+    if state:
+        with state['lock']:
+            state['announcement_version'] += 1
+
+
+def invalidate_user_counts(user_id):
+    """
+    Drop the cached counts of a user
+
+    Args:
+        user_id (int): ID of the user
+    """
+    state = current_app.extensions.get(EXTENSION_KEY)
+    if state:
+        with state['lock']:
+            state['generation'] += 1
+            state['counts'].pop(user_id, None)
+
+
+def invalidate_application_counts(application_id):
+    """
+    Drop the cached counts of the owner of an application
+
+    Args:
+        application_id (int): ID of the application
+    """
+    from app.models import Application, Organization
+
+    if not current_app.extensions.get(EXTENSION_KEY):
+        return
+
+    row = db.session.query(Organization.user_id).join(
+        Application, Application.organization_id == Organization.organization_id
+    ).filter(Application.application_id == application_id).first()
+
+    if row and row.user_id:
+        invalidate_user_counts(row.user_id)
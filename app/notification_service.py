@@ -0,0 +1,188 @@
+import base64
+import json
+from datetime import datetime
+from app import db
+from app.models import Announcement, AnnouncementRead, Feedback, ApplicationFile, Application, Organization
+from sqlalchemy import select, insert, update, literal, union_all, false, String
+from sqlalchemy.exc import IntegrityError
+
+# Number of notifications per page of the notifications feed
+NOTIFICATION_PAGE_SIZE = 20
+
+# Notification types, in the order used to break ties between notifications sent at the same time
+NOTIFICATION_TYPES = ('announcement', 'feedback')
+
+
+def _encode_cursor(date_sent, notification_type, notification_id):
+    raw = json.dumps([date_sent.isoformat(), notification_type, notification_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    try:
+        date_sent, notification_type, notification_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if notification_type not in NOTIFICATION_TYPES:
+            return None
+        return datetime.fromisoformat(date_sent), notification_type, int(notification_id)
+    except Exception:
+        # Ignore malformed cursors and start from the first page
+        return None
+
+
+def _after_cursor(notification_type, date_column, id_column, cursor):
+    # Rows of one type that come after the cursor in (date_sent, type, id) descending order
+    date_sent, cursor_type, cursor_id = cursor
+    if notification_type < cursor_type:
+        return date_column <= date_sent
+    if notification_type > cursor_type:
+        return date_column < date_sent
+    return db.or_(date_column < date_sent, db.and_(date_column == date_sent, id_column < cursor_id))
+
+
+def _announcement_notifications(user_id, cursor, limit):
+    from app.announcement_service import visible_announcement_ids
+
+    visible = visible_announcement_ids(user_id).subquery()
+
+    query = select(
+        literal('announcement', String).label('type'),
+        Announcement.announcement_id.label('id'),
+        Announcement.subject.label('subject'),
+        Announcement.message.label('message'),
+        Announcement.date_sent.label('date_sent'),
+        AnnouncementRead.user_id.isnot(None).label('is_read'),
+        literal(None, String).label('file_name')
+    ).select_from(Announcement).join(
+        visible, visible.c.announcement_id == Announcement.announcement_id
+    ).outerjoin(
+        AnnouncementRead, db.and_(
+            AnnouncementRead.announcement_id == Announcement.announcement_id,
+            AnnouncementRead.user_id == user_id
+        )
+    )
+
+    if cursor:
+        query = query.where(_after_cursor('announcement', Announcement.date_sent, Announcement.announcement_id, cursor))
+
+    query = query.order_by(Announcement.date_sent.desc(), Announcement.announcement_id.desc()).limit(limit)
+    # Wrapped so the ORDER BY and LIMIT stay inside this branch of the UNION ALL
+    return select(query.subquery())
+
+
+def _feedback_notifications(user_id, cursor, limit):
+    query = select(
+        literal('feedback', String).label('type'),
+        Feedback.feedback_id.label('id'),
+        Feedback.subject.label('subject'),
+        Feedback.message.label('message'),
+        Feedback.date_sent.label('date_sent'),
+        db.func.coalesce(Feedback.is_read, false()).label('is_read'),
+        ApplicationFile.file_name.label('file_name')
+    ).select_from(Feedback).join(
+        ApplicationFile, Feedback.app_file_id == ApplicationFile.app_file_id
+    ).join(
+        Application, ApplicationFile.application_id == Application.application_id
+    ).join(
+        Organization, Application.organization_id == Organization.organization_id
+    ).where(
+        Organization.user_id == user_id
+    )
+
+    if cursor:
+        query = query.where(_after_cursor('feedback', Feedback.date_sent, Feedback.feedback_id, cursor))
+
+    query = query.order_by(Feedback.date_sent.desc(), Feedback.feedback_id.desc()).limit(limit)
+    return select(query.subquery())
+
+
+def get_notifications_page(user_id, after=None, limit=NOTIFICATION_PAGE_SIZE):
+    """
+    Get one page of a user's announcements and feedback, newest first
+
+    Both kinds of notifications are merged with a UNION ALL and paged with a
+    keyset on (date_sent, type, id). Each branch is limited to the page size
+    before the merge, so a page costs one query however many notifications
+    the user has.
+
+    Args:
+        user_id (int): ID of the user
+        after (str, optional): Cursor returned with the previous page
+        limit (int, optional): Number of notifications per page
+
+    Returns:
+        dict: Dictionary with the notifications and the cursor of the next page (None on the last page)
+    """
+    cursor = _decode_cursor(after) if after else None
+
+    # Fetch one extra row to know whether there is a next page
+    feed = union_all(
+        _announcement_notifications(user_id, cursor, limit + 1),
+        _feedback_notifications(user_id, cursor, limit + 1)
+    ).subquery()
+
+    rows = db.session.execute(
+        select(feed).order_by(
+            feed.c.date_sent.desc(), feed.c.type.desc(), feed.c.id.desc()
+        ).limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].date_sent, rows[-1].type, rows[-1].id)
+
+    notifications = [{
+        'type': row.type,
+        'id': row.id,
+        'subject': row.subject,
+        'message': row.message,
+        # Dates are stored in UTC, the browser shows them relative to the current time
+        'date_sent': row.date_sent.isoformat() + 'Z',
+        'is_read': bool(row.is_read),
+        'file_name': row.file_name
+    } for row in rows]
+
+    return {'notifications': notifications, 'next_cursor': next_cursor}
+
+
+def mark_notifications_read(user_id, notifications):
+    """
+    Mark the unread notifications of a page as read
+
+    Feedback is updated with one UPDATE and announcements get their read rows
+    with one INSERT ... SELECT.
+
+    Args:
+        user_id (int): ID of the user
+        notifications (list): Notifications returned by get_notifications_page
+
+    Returns:
+        int: Number of notifications marked as read
+    """
+    feedback_ids = [n['id'] for n in notifications if n['type'] == 'feedback' and not n['is_read']]
+    announcement_ids = [n['id'] for n in notifications if n['type'] == 'announcement' and not n['is_read']]
+
+    if feedback_ids:
+        db.session.execute(
+            update(Feedback).where(Feedback.feedback_id.in_(feedback_ids)).values(is_read=True)
+        )
+
+    if announcement_ids:
+        now = datetime.utcnow()
+        try:
+            # A concurrent request may mark the same announcements, keep the outer transaction usable
+            with db.session.begin_nested():
+                db.session.execute(insert(AnnouncementRead.__table__).from_select(
+                    ['announcement_id', 'user_id', 'read_at'],
+                    select(Announcement.announcement_id, literal(user_id), literal(now)).where(
+                        Announcement.announcement_id.in_(announcement_ids),
+                        ~select(AnnouncementRead.announcement_id).where(
+                            AnnouncementRead.announcement_id == Announcement.announcement_id,
+                            AnnouncementRead.user_id == user_id
+                        ).exists()
+                    )
+                ))
+        except IntegrityError:
+            pass
+
+    return len(feedback_ids) + len(announcement_ids)
@@ -32,6 +32,7 @@ def get_all_active_organizations():
                 'tagline': org.tagline,
                 'description': org.description,
                 'logo_id': org.logo_id,
+                'logo_hash': logo.content_hash if logo else None,
                 'status': org.status
             })
         
@@ -77,9 +78,11 @@ def save_organization_application(org_name, org_type, logo_file, logo_descriptio
         if organization_name_exists(org_name):
             return False, f"Organization name '{org_name}' is already taken. Please choose a different name.", None
         
-        # Save logo to database
-        logo_data = logo_file.read()
-        new_logo = Logo(logo=logo_data, description=logo_description)
+        # Save logo to the blob store
+        from app.logo_thumbnails import store_logo_image
+        
+        new_logo = Logo(description=logo_description)
+        store_logo_image(new_logo, logo_file)
         db.session.add(new_logo)
         db.session.flush()  # Get the logo_id without committing
         
@@ -116,9 +119,49 @@ def save_organization_application(org_name, org_type, logo_file, logo_descriptio
         return False, f"An error occurred: {str(e)}", None
 
 
+def expire_organizations():
+    """
+    Set every active organization whose activation or last renewal is over a year old to Inactive.
+    The rows are changed with one statement in the transaction of db.session, the caller commits.
+    
+    Returns:
+        list: IDs of the organizations set to Inactive
+    """
+    from datetime import timedelta
+    from sqlalchemy import select, update, or_, and_
+    
+    one_year_ago = datetime.now() - timedelta(days=365)
+    table = Organization.__table__
+    
+    # 1. Never renewed (last_renewal_date is NULL), check activation_date only
+    # 2. Renewed, check last_renewal_date
+    expired = and_(
+        table.c.status == 'Active',
+        or_(
+            and_(table.c.last_renewal_date.is_(None), table.c.activation_date <= one_year_ago),
+            and_(table.c.last_renewal_date.isnot(None), table.c.last_renewal_date <= one_year_ago)
+        )
+    )
+    
+    if db.session.connection().dialect.update_returning:
+        result = db.session.execute(
+            update(table).where(expired).values(status='Inactive').returning(table.c.organization_id)
+        )
+        return [row[0] for row in result]
+    
+    # MySQL has no UPDATE ... RETURNING, lock the expired rows and update them by id in the same transaction
+    organization_ids = [row[0] for row in db.session.execute(
+        select(table.c.organization_id).where(expired).with_for_update()
+    )]
+    if organization_ids:
+        db.session.execute(
+            update(table).where(table.c.organization_id.in_(organization_ids)).values(status='Inactive')
+        )
+    return organization_ids
+
 def get_organization_by_user_id(user_id):
     """
-    Get organization by user ID
+    Get organization by user ID, loaded once per request
     
     Args:
         user_id (int): ID of the user
@@ -126,8 +169,13 @@ def get_organization_by_user_id(user_id):
     Returns:
         Organization: Organization object or None
     """
+    from app.request_context import memoize
+    
     # Use filter_by for exact matches and add options to optimize query
-    return Organization.query.filter_by(user_id=user_id).options(db.joinedload(Organization.logo)).first()
+    return memoize(
+        ('organization', user_id),
+        lambda: Organization.query.filter_by(user_id=user_id).options(db.joinedload(Organization.logo)).first()
+    )
 
 
 def user_has_organization(user_id):
@@ -146,7 +194,7 @@ def user_has_organization(user_id):
 
 def get_application_by_organization_id(organization_id, application_type=None):
     """
-    Get the latest application by organization ID, optionally filtered by type
+    Get the latest application by organization ID, optionally filtered by type, loaded once per request
     
     Args:
         organization_id (int): ID of the organization
@@ -155,12 +203,80 @@ def get_application_by_organization_id(organization_id, application_type=None):
     Returns:
         Application: Latest application object or None
     """
-    query = Application.query.filter_by(organization_id=organization_id)
+    from app.request_context import memoize
     
-    if application_type:
-        query = query.filter_by(type=application_type)
+    def load():
+        query = Application.query.filter_by(organization_id=organization_id)
+        
+        if application_type:
+            query = query.filter_by(type=application_type)
+        
+        return query.order_by(Application.submission_date.desc()).first()
     
-    return query.order_by(Application.submission_date.desc()).first()
+    return memoize(('application', organization_id, application_type), load)
+
+
+def get_organization_academic_year(organization_id):
+    """
+    Get the current academic year of an organization, loaded once per request
+    
+    Args:
+        organization_id (int): ID of the organization
+        
+    Returns:
+        str: Academic year of the organization, or the calendar academic year if it has none
+    """
+    from app.request_context import memoize
+    
+    def load():
+        organization = Organization.query.get(organization_id)
+        if organization and organization.current_academic_year:
+            return organization.current_academic_year
+        
+        # Fallback to current academic year
+        current_year = datetime.now().year
+        return f"{current_year}-{current_year + 1}"
+    
+    return memoize(('academic_year', organization_id), load)
+
+
+def get_application_file_summaries(application_id):
+    """
+    Get the metadata of all files of an application without loading full ORM objects
+    
+    Only the columns needed by listing pages are selected, so the rows stay
+    lightweight regardless of how large the stored documents are.
+    
+    Args:
+        application_id (int): ID of the application
+        
+    Returns:
+        list: List of rows with app_file_id, file_name, status and submission_date attributes
+    """
+    return db.session.query(
+        ApplicationFile.app_file_id,
+        ApplicationFile.file_name,
+        ApplicationFile.status,
+        ApplicationFile.submission_date
+    ).filter(
+        ApplicationFile.application_id == application_id
+    ).all()
+
+
+def get_application_file_ids(application_id):
+    """
+    Get the IDs of all files of an application
+    
+    Args:
+        application_id (int): ID of the application
+        
+    Returns:
+        list: List of application file IDs
+    """
+    rows = db.session.query(ApplicationFile.app_file_id).filter(
+        ApplicationFile.application_id == application_id
+    ).all()
+    return [row.app_file_id for row in rows]
 
 
 def get_logo_by_id(logo_id):
@@ -473,18 +589,11 @@ def get_affiliations_by_position_type(organization_id, position_type, academic_y
     Returns:
         list: List of dictionaries containing affiliation information
     """
-    from app.models import Affiliation, Student, Program, Organization
+    from app.models import Affiliation, Student, Program
     
     # If no academic year specified, get the organization's current academic year
     if academic_year is None:
-        organization = Organization.query.get(organization_id)
-        if organization and organization.current_academic_year:
-            academic_year = organization.current_academic_year
-        else:
-            # Fallback to current academic year
-            from datetime import datetime
-            current_year = datetime.now().year
-            academic_year = f"{current_year}-{current_year + 1}"
+        academic_year = get_organization_academic_year(organization_id)
     
     # Define position categories
     officer_positions = ['President', 'Vice President', 'Secretary', 'Treasurer', 'Auditor', 'P.I.O', 'Business Manager']
@@ -528,95 +637,247 @@ def get_affiliations_by_position_type(organization_id, position_type, academic_y
     
     return result
 
-def get_pending_applications():
+# Sort orders of the pending application queues
+PENDING_SORT_OPTIONS = ['newest', 'oldest', 'name']
+
+# Number of applications shown per page of the pending application queues
+PENDING_PAGE_SIZE = 24
+
+
+def _encode_cursor(sort_value, application_id):
+    import base64
+    import json
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, application_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _decode_cursor(cursor, sort):
+    import base64
+    import json
+    try:
+        sort_value, application_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if sort != 'name':
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(application_id)
+    except Exception:
+        # Ignore malformed cursors and start from the first page
+        return None
+
+
+def get_pending_applications_page(application_type, sort='newest', search=None, academic_year=None, after=None, limit=PENDING_PAGE_SIZE):
     """
-    Get all pending NEW organization applications
+    Get one page of pending applications with their pending file counts
+    
+    Pages are fetched with keyset pagination and the pending files of only
+    the applications on the page are counted in the same query, so every
+    page costs one query however many applications and files exist.
     
+    Args:
+        application_type (str): 'New' or 'Renewal'
+        sort (str, optional): 'newest', 'oldest' or 'name'
+        search (str, optional): Filter by organization name
+        academic_year (str, optional): Filter by academic year
+        after (str, optional): Cursor returned with the previous page
+        limit (int, optional): Maximum number of applications to return, or None for all
+        
     Returns:
-        list: List of dictionaries containing application information
+        dict: Dictionary with the list of applications and the cursor of the next page
+    """
+    if sort not in PENDING_SORT_OPTIONS:
+        sort = 'newest'
+    
+    # Applications that were never submitted sort as the oldest
+    submission_date = db.func.coalesce(Application.submission_date, datetime(1970, 1, 1))
+    if sort == 'name':
+        sort_column = Organization.organization_name
+    else:
+        sort_column = submission_date
+    
+    query = db.session.query(
+        Application.application_id,
+        Application.submission_date,
+        Application.status,
+        Organization.organization_id,
+        Organization.organization_name,
+        Organization.logo_id,
+        Logo.content_hash.label('logo_hash'),
+        sort_column.label('sort_value')
+    ).join(
+        Organization, Application.organization_id == Organization.organization_id
+    ).outerjoin(
+        Logo, Organization.logo_id == Logo.logo_id
+    ).filter(
+        Application.status == 'Pending',
+        Application.type == application_type
+    )
+    
+    if search:
+        query = query.filter(Organization.organization_name.ilike(f'%{search}%'))
+    if academic_year:
+        query = query.filter(Application.academic_year == academic_year)
+    
+    # Continue after the last application of the previous page
+    cursor = _decode_cursor(after, sort) if after else None
+    if cursor:
+        sort_value, application_id = cursor
+        if sort == 'newest':
+            query = query.filter(db.or_(sort_column < sort_value,
+                                        db.and_(sort_column == sort_value, Application.application_id < application_id)))
+        else:
+            query = query.filter(db.or_(sort_column > sort_value,
+                                        db.and_(sort_column == sort_value, Application.application_id > application_id)))
+    
+    if sort == 'newest':
+        query = query.order_by(sort_column.desc(), Application.application_id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), Application.application_id.asc())
+    
+    # Fetch one extra row to know whether there is a next page
+    if limit:
+        query = query.limit(limit + 1)
+    page = query.subquery()
+    
+    # Count the pending files of the applications on this page only
+    pending_count = db.session.query(
+        db.func.count(ApplicationFile.app_file_id)
+    ).filter(
+        ApplicationFile.application_id == page.c.application_id,
+        ApplicationFile.status.in_(['Pending', 'Incomplete'])
+    ).scalar_subquery()
+    
+    rows = db.session.query(page, pending_count.label('pending_count'))
+    if sort == 'newest':
+        rows = rows.order_by(page.c.sort_value.desc(), page.c.application_id.desc()).all()
+    else:
+        rows = rows.order_by(page.c.sort_value.asc(), page.c.application_id.asc()).all()
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].sort_value, rows[-1].application_id)
+    
+    applications = [{
+        'application_id': row.application_id,
+        'organization_id': row.organization_id,
+        'organization_name': row.organization_name,
+        'submission_date': row.submission_date.strftime('%B %d, %Y, %I:%M %p') if row.submission_date else 'Not submitted',
+        'status': row.status,
+        'logo_id': row.logo_id,
+        'logo_hash': row.logo_hash,
+        'pending_count': row.pending_count
+    } for row in rows]
+    
+    return {'applications': applications, 'next_cursor': next_cursor}
+
+
+def get_pending_applications(sort='newest', search=None, academic_year=None, after=None, limit=None):
+    """
+    Get pending NEW organization applications
+    
+    Args:
+        sort (str, optional): 'newest', 'oldest' or 'name'
+        search (str, optional): Filter by organization name
+        academic_year (str, optional): Filter by academic year
+        after (str, optional): Cursor returned with the previous page
+        limit (int, optional): Maximum number of applications to return, or None for all
+    
+    Returns:
+        dict: Dictionary with the list of applications and the cursor of the next page
     """
     try:
-        # Query for organizations with applications that have status 'Pending' and type 'New' only
-        applications = db.session.query(
-            Application, Organization, Logo
-        ).join(
-            Organization, Application.organization_id == Organization.organization_id
-        ).outerjoin(
-            Logo, Organization.logo_id == Logo.logo_id
-        ).filter(
-            Application.status == 'Pending',
-            Application.type == 'New'
-        ).order_by(
-            Application.submission_date.desc()
-        ).all()
-        
-        result = []
-        for app, org, logo in applications:
-            # Count pending files for this application
-            pending_count = db.session.query(ApplicationFile).filter(
-                ApplicationFile.application_id == app.application_id,
-                ApplicationFile.status.in_(['Pending', 'Incomplete'])
-            ).count()
-            
-            result.append({
-                'application_id': app.application_id,
-                'organization_id': org.organization_id,
-                'organization_name': org.organization_name,
-                'submission_date': app.submission_date.strftime('%B %d, %Y, %I:%M %p') if app.submission_date else 'Not submitted',
-                'status': app.status,
-                'logo_id': org.logo_id,
-                'pending_count': pending_count
-            })
-        
-        return result
+        return get_pending_applications_page('New', sort, search, academic_year, after, limit)
     except Exception as e:
         print(f"Error fetching pending applications: {str(e)}")
-        return []
+        return {'applications': [], 'next_cursor': None}
 
-def get_pending_renewal_applications():
+def get_pending_renewal_applications(sort='newest', search=None, academic_year=None, after=None, limit=None):
     """
-    Get all pending RENEWAL organization applications
+    Get pending RENEWAL organization applications
     
+    Args:
+        sort (str, optional): 'newest', 'oldest' or 'name'
+        search (str, optional): Filter by organization name
+        academic_year (str, optional): Filter by academic year
+        after (str, optional): Cursor returned with the previous page
+        limit (int, optional): Maximum number of applications to return, or None for all
+    
+    Returns:
+        dict: Dictionary with the list of renewal applications and the cursor of the next page
+    """
+    try:
+        return get_pending_applications_page('Renewal', sort, search, academic_year, after, limit)
+    except Exception as e:
+        print(f"Error fetching pending renewal applications: {str(e)}")
+        return {'applications': [], 'next_cursor': None}
+
+def _empty_statistics(org_status='Unknown'):
+    return {
+        'member_count': 0,
+        'volunteer_count': 0,
+        'accomplished_activities': 0,
+        'organization_status': org_status
+    }
+
+
+def get_statistics_for_organizations(organization_ids, academic_year=None):
+    """
+    Get statistics for several organizations in a single query on the statistics summary
+    
+    Args:
+        organization_ids (list): IDs of the organizations
+        academic_year (str, optional): Academic year to filter by. If None, uses each organization's current academic year
+        
     Returns:
-        list: List of dictionaries containing renewal application information
+        dict: Dictionary mapping organization IDs to their statistics
     """
+    from app.models import OrganizationYearStats
+    
+    organization_ids = list(organization_ids)
+    if not organization_ids:
+        return {}
+    
     try:
-        # Query for organizations with applications that have status 'Pending' and type 'Renewal' only
-        applications = db.session.query(
-            Application, Organization, Logo
-        ).join(
-            Organization, Application.organization_id == Organization.organization_id
+        # Fallback to current academic year for organizations without one
+        current_year = datetime.now().year
+        fallback_academic_year = f"{current_year}-{current_year + 1}"
+        if academic_year is not None:
+            selected_year = db.literal(academic_year)
+        else:
+            selected_year = db.func.coalesce(Organization.current_academic_year, fallback_academic_year)
+        
+        # Read one summary row per organization, kept up to date by app.organization_stats
+        rows = db.session.query(
+            Organization.organization_id,
+            Organization.status,
+            OrganizationYearStats.officer_count,
+            OrganizationYearStats.member_count,
+            OrganizationYearStats.volunteer_count,
+            OrganizationYearStats.accomplished_activities
         ).outerjoin(
-            Logo, Organization.logo_id == Logo.logo_id
+            OrganizationYearStats,
+            db.and_(OrganizationYearStats.organization_id == Organization.organization_id,
+                    OrganizationYearStats.academic_year == selected_year)
         ).filter(
-            Application.status == 'Pending',
-            Application.type == 'Renewal'
-        ).order_by(
-            Application.submission_date.desc()
+            Organization.organization_id.in_(organization_ids)
         ).all()
         
-        result = []
-        for app, org, logo in applications:
-            # Count pending files for this application
-            pending_count = db.session.query(ApplicationFile).filter(
-                ApplicationFile.application_id == app.application_id,
-                ApplicationFile.status.in_(['Pending', 'Incomplete'])
-            ).count()
-            
-            result.append({
-                'application_id': app.application_id,
-                'organization_id': org.organization_id,
-                'organization_name': org.organization_name,
-                'submission_date': app.submission_date.strftime('%B %d, %Y, %I:%M %p') if app.submission_date else 'Not submitted',
-                'status': app.status,
-                'logo_id': org.logo_id,
-                'pending_count': pending_count
-            })
+        statistics = {organization_id: _empty_statistics() for organization_id in organization_ids}
+        for row in rows:
+            statistics[row.organization_id] = {
+                # Total members = officers + members (not including volunteers)
+                'member_count': (row.officer_count or 0) + (row.member_count or 0),
+                'volunteer_count': row.volunteer_count or 0,
+                'accomplished_activities': row.accomplished_activities or 0,
+                'organization_status': row.status
+            }
+        
+        return statistics
         
-        return result
     except Exception as e:
-        print(f"Error fetching pending renewal applications: {str(e)}")
-        return []
+        print(f"Error calculating organization statistics: {str(e)}")
+        return {organization_id: _empty_statistics() for organization_id in organization_ids}
+
 
 def get_organization_statistics(organization_id, academic_year=None):
     """
@@ -629,76 +890,7 @@ def get_organization_statistics(organization_id, academic_year=None):
     Returns:
         dict: Dictionary containing organization statistics
     """
-    from app.models import Affiliation, Application, Plan, Organization
-    
-    try:
-        # If no academic year specified, get the organization's current academic year
-        if academic_year is None:
-            organization = Organization.query.get(organization_id)
-            if organization and organization.current_academic_year:
-                academic_year = organization.current_academic_year
-            else:
-                # Fallback to current academic year
-                from datetime import datetime
-                current_year = datetime.now().year
-                academic_year = f"{current_year}-{current_year + 1}"
-        
-        # Get member count (officers + members, not including volunteers)
-        officer_positions = ['President', 'Vice President', 'Secretary', 'Treasurer', 'Auditor', 'P.I.O', 'Business Manager']
-        member_positions = ['Member']
-        
-        # Count officers for the specific academic year
-        officer_count = db.session.query(Affiliation).filter(
-            Affiliation.organization_id == organization_id,
-            Affiliation.position.in_(officer_positions),
-            Affiliation.academic_year == academic_year
-        ).count()
-        
-        # Count members for the specific academic year
-        member_count = db.session.query(Affiliation).filter(
-            Affiliation.organization_id == organization_id,
-            Affiliation.position.in_(member_positions),
-            Affiliation.academic_year == academic_year
-        ).count()
-        
-        # Total members = officers + members (not including volunteers)
-        total_members = officer_count + member_count
-        
-        # Count volunteers for the specific academic year
-        volunteer_count = db.session.query(Affiliation).filter(
-            Affiliation.organization_id == organization_id,
-            Affiliation.position == 'Volunteer',
-            Affiliation.academic_year == academic_year
-        ).count()
-        
-        # Count accomplished activities (plans with accomplished_date set) for the specific academic year
-        accomplished_activities = db.session.query(Plan).join(
-            Application, Plan.application_id == Application.application_id
-        ).filter(
-            Application.organization_id == organization_id,
-            Application.academic_year == academic_year,
-            Plan.accomplished_date.isnot(None)
-        ).count()
-        
-        # Get organization status
-        organization = get_organization_by_id(organization_id)
-        org_status = organization.status if organization else 'Unknown'
-        
-        return {
-            'member_count': total_members,
-            'volunteer_count': volunteer_count,
-            'accomplished_activities': accomplished_activities,
-            'organization_status': org_status
-        }
-        
-    except Exception as e:
-        print(f"Error calculating organization statistics: {str(e)}")
-        return {
-            'member_count': 0,
-            'volunteer_count': 0,
-            'accomplished_activities': 0,
-            'organization_status': 'Unknown'
-        }
+    return get_statistics_for_organizations([organization_id], academic_year)[organization_id]
 
 
 def get_available_academic_years(organization_id):
@@ -773,19 +965,12 @@ def get_plans_by_organization_id(organization_id, academic_year=None):
     Returns:
         list: List of dictionaries containing plan information
     """
-    from app.models import Plan, Application, Organization
+    from app.models import Plan, Application
     
     try:
         # If no academic year specified, get the organization's current academic year
         if academic_year is None:
-            organization = Organization.query.get(organization_id)
-            if organization and organization.current_academic_year:
-                academic_year = organization.current_academic_year
-            else:
-                # Fallback to current academic year
-                from datetime import datetime
-                current_year = datetime.now().year
-                academic_year = f"{current_year}-{current_year + 1}"
+            academic_year = get_organization_academic_year(organization_id)
         
         # Get plans for this organization and academic year
         plans = db.session.query(Plan).join(
@@ -0,0 +1,287 @@
+# Affiliation, plan and application changes are recorded while the session flushes,
+# and the affected (organization, academic year) rows of organization_year_stats are
+# recomputed once right before the transaction commits.
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event, select, delete, insert, tuple_
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import object_session
+from app import db
+from app.models import Affiliation, Plan, Application, OrganizationYearStats
+
+OFFICER_POSITIONS = ['President', 'Vice President', 'Secretary', 'Treasurer', 'Auditor', 'P.I.O', 'Business Manager']
+MEMBER_POSITIONS = ['Member']
+VOLUNTEER_POSITIONS = ['Volunteer']
+
+# Keys in Session.info used to collect the changes of the current transaction
+STATS_KEYS = 'organization_year_stats_keys'
+STATS_APPLICATIONS = 'organization_year_stats_applications'
+
+
+def _compute_stats(connection, organization_ids=None, academic_years=None):
+    affiliations = Affiliation.__table__
+    plans = Plan.__table__
+    applications = Application.__table__
+
+    affiliation_query = select(
+        affiliations.c.organization_id,
+        affiliations.c.academic_year,
+        db.func.sum(db.case((affiliations.c.position.in_(OFFICER_POSITIONS), 1), else_=0)),
+        db.func.sum(db.case((affiliations.c.position.in_(MEMBER_POSITIONS), 1), else_=0)),
+        db.func.sum(db.case((affiliations.c.position.in_(VOLUNTEER_POSITIONS), 1), else_=0))
+    ).where(
+        affiliations.c.academic_year.isnot(None)
+    ).group_by(
+        affiliations.c.organization_id, affiliations.c.academic_year
+    )
+
+    activity_query = select(
+        applications.c.organization_id,
+        applications.c.academic_year,
+        db.func.count(plans.c.plan_id)
+    ).join(
+        plans, plans.c.application_id == applications.c.application_id
+    ).where(
+        applications.c.academic_year.isnot(None),
+        plans.c.accomplished_date.isnot(None)
+    ).group_by(
+        applications.c.organization_id, applications.c.academic_year
+    )
+
+    if organization_ids is not None:
+        affiliation_query = affiliation_query.where(
+            affiliations.c.organization_id.in_(organization_ids),
+            affiliations.c.academic_year.in_(academic_years)
+        )
+        activity_query = activity_query.where(
+            applications.c.organization_id.in_(organization_ids),
+            applications.c.academic_year.in_(academic_years)
+        )
+
+    stats = {}
+    for organization_id, academic_year, officers, members, volunteers in connection.execute(affiliation_query):
+        stats[(organization_id, academic_year)] = {
+            'organization_id': organization_id,
+            'academic_year': academic_year,
+            'officer_count': int(officers or 0),
+            'member_count': int(members or 0),
+            'volunteer_count': int(volunteers or 0),
+            'accomplished_activities': 0
+        }
+
+    for organization_id, academic_year, activities in connection.execute(activity_query):
+        row = stats.setdefault((organization_id, academic_year), {
+            'organization_id': organization_id,
+            'academic_year': academic_year,
+            'officer_count': 0,
+            'member_count': 0,
+            'volunteer_count': 0,
+            'accomplished_activities': 0
+        })
+        row['accomplished_activities'] = int(activities or 0)
+
+    return stats
+
+
+def refresh_organization_year_stats(connection, keys):
+    """
+    Recompute the summary rows of the given organizations and academic years
+
+    Args:
+        connection (Connection): Database connection of the current transaction
+        keys (iterable): (organization_id, academic_year) pairs to recompute
+    """
+    keys = {(organization_id, academic_year) for organization_id, academic_year in keys
+            if organization_id is not None and academic_year is not None}
+    if not keys:
+        return
+
+    stats = _compute_stats(
+        connection,
+        organization_ids={organization_id for organization_id, _ in keys},
+        academic_years={academic_year for _, academic_year in keys}
+    )
+
+    table = OrganizationYearStats.__table__
+    emptied = sorted(key for key in keys if key not in stats)
+    if emptied:
+        connection.execute(delete(table).where(
+            tuple_(table.c.organization_id, table.c.academic_year).in_(emptied)
+        ))
+
+    rows = [stats[key] for key in sorted(keys) if key in stats]
+    if rows:
+        _upsert_stats(connection, rows)
+
+
+def _upsert_stats(connection, rows):
+    # Written as an upsert in key order, so two transactions refreshing the same
+    # summary rows wait for each other instead of colliding on the primary key
+    table = OrganizationYearStats.__table__
+    counts = ['officer_count', 'member_count', 'volunteer_count', 'accomplished_activities']
+    dialect = connection.dialect.name
+
+    if dialect in ('mysql', 'mariadb'):
+        statement = mysql.insert(table)
+        connection.execute(statement.on_duplicate_key_update(
+            {column: statement.inserted[column] for column in counts}
+        ), rows)
+    elif dialect in ('postgresql', 'sqlite'):
+        statement = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.organization_id, table.c.academic_year],
+            set_={column: statement.excluded[column] for column in counts}
+        ), rows)
+    else:
+        connection.execute(delete(table).where(
+            tuple_(table.c.organization_id, table.c.academic_year).in_(
+                [(row['organization_id'], row['academic_year']) for row in rows]
+            )
+        ))
+        connection.execute(insert(table), rows)
+
+
+def rebuild_organization_year_stats(connection):
+    """
+    Recompute the whole summary table from the affiliations and plans
+
+    Args:
+        connection (Connection): Database connection of the current transaction
+
+    Returns:
+        int: Number of summary rows written
+    """
+    table = OrganizationYearStats.__table__
+    rows = list(_compute_stats(connection).values())
+
+    connection.execute(delete(table))
+    if rows:
+        connection.execute(insert(table), rows)
+
+    return len(rows)
+
+
+# Load the previous value when these attributes are set on an expired object,
+# otherwise the history would not know which summary row the object moved from
+@event.listens_for(Affiliation.organization_id, 'set', active_history=True)
+@event.listens_for(Affiliation.academic_year, 'set', active_history=True)
+@event.listens_for(Plan.application_id, 'set', active_history=True)
+@event.listens_for(Application.organization_id, 'set', active_history=True)
+@event.listens_for(Application.academic_year, 'set', active_history=True)
+def _keep_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+def _history_values(target, attribute):
+    # Current value plus the value it had before this flush, if it changed
+    history = db.inspect(target).attrs[attribute].history
+    values = set(history.deleted or [])
+    values.add(getattr(target, attribute))
+    return values
+
+
+def _record_keys(target, keys):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(STATS_KEYS, set()).update(keys)
+
+
+def _record_applications(target, application_ids):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(STATS_APPLICATIONS, set()).update(application_ids)
+
+
+@event.listens_for(Affiliation, 'after_insert')
+@event.listens_for(Affiliation, 'after_delete')
+def _affiliation_inserted_or_deleted(mapper, connection, target):
+    _record_keys(target, [(target.organization_id, target.academic_year)])
+
+
+@event.listens_for(Affiliation, 'after_update')
+def _affiliation_updated(mapper, connection, target):
+    _record_keys(target, [
+        (organization_id, academic_year)
+        for organization_id in _history_values(target, 'organization_id')
+        for academic_year in _history_values(target, 'academic_year')
+    ])
+
+
+@event.listens_for(Plan, 'after_insert')
+@event.listens_for(Plan, 'after_delete')
+def _plan_inserted_or_deleted(mapper, connection, target):
+    _record_applications(target, [target.application_id])
+
+
+@event.listens_for(Plan, 'after_update')
+def _plan_updated(mapper, connection, target):
+    _record_applications(target, _history_values(target, 'application_id'))
+
+
+@event.listens_for(Application, 'after_update')
+def _application_updated(mapper, connection, target):
+    # Moving an application to another organization or year moves its plans too
+    organization_ids = _history_values(target, 'organization_id')
+    academic_years = _history_values(target, 'academic_year')
+    if len(organization_ids) > 1 or len(academic_years) > 1:
+        _record_keys(target, [
+            (organization_id, academic_year)
+            for organization_id in organization_ids
+            for academic_year in academic_years
+        ])
+
+
+def _has_stats_changes(session):
+    if session.info.get(STATS_KEYS) or session.info.get(STATS_APPLICATIONS):
+        return True
+
+    # Changes not flushed yet are only recorded by the flush
+    return any(
+        isinstance(instance, (Affiliation, Plan, Application))
+        for changes in (session.new, session.dirty, session.deleted)
+        for instance in changes
+    )
+
+
+# Only sessions of db.session are watched, other sessions never change the summary
+@event.listens_for(db.session, 'before_commit')
+def _refresh_before_commit(session):
+    if not _has_stats_changes(session):
+        return
+
+    # Flush so the last pending changes are recorded and visible to the recount
+    session.flush()
+    if not session.info.get(STATS_KEYS) and not session.info.get(STATS_APPLICATIONS):
+        return
+
+    keys = session.info.pop(STATS_KEYS, set())
+    application_ids = {application_id for application_id in session.info.pop(STATS_APPLICATIONS, set())
+                       if application_id is not None}
+
+    connection = session.connection()
+    if application_ids:
+        applications = Application.__table__
+        keys.update(connection.execute(
+            select(applications.c.organization_id, applications.c.academic_year)
+            .where(applications.c.application_id.in_(application_ids))
+        ).all())
+
+    refresh_organization_year_stats(connection, keys)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_after_rollback(session):
+    # Rolled back changes no longer affect the summary
+    session.info.pop(STATS_KEYS, None)
+    session.info.pop(STATS_APPLICATIONS, None)
+
+
+stats_cli = AppGroup('stats', help='Maintain the organization statistics summary.')
+
+
+@stats_cli.command('rebuild')
+def rebuild_command():
+    """Recompute organization_year_stats from the affiliations and plans."""
+    row_count = rebuild_organization_year_stats(db.session.connection())
+    db.session.commit()
+    click.echo(f"Rebuilt statistics for {row_count} organization academic years.")
@@ -0,0 +1,200 @@
+# Hashing and checking entry keys with bcrypt takes a few hundred milliseconds
+# of CPU each. When many users log in at once those hashes would keep every
+# Waitress thread busy, so they run on a separate process pool instead and the
+# request threads only wait for the result.
+#
+# Workers are forked so they do not import the server module again, which would
+# create a whole application in every worker. Forking a process that already runs
+# threads can copy a lock held by one of them, so the pool is started by
+# create_app before the scheduler, outbox or any other background thread exists,
+# and is never forked again afterwards. Where fork is not available, or in CLI
+# processes, the hashes run in the calling thread as before.
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+
+# Key of the pool state in app.extensions
+EXTENSION_KEY = 'password_hashing'
+
+# Cost factor used outside an application context, same as bcrypt.gensalt()
+DEFAULT_ROUNDS = 12
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+
+def init_password_hashing(app):
+    """
+    Start the password hashing pool, must run before any other thread is started
+
+    Args:
+        app (Flask): Flask application
+    """
+    if EXTENSION_KEY in app.extensions:
+        return
+
+    state = app.extensions[EXTENSION_KEY] = {
+        'lock': threading.Lock(),
+        'pool': None
+    }
+
+    if app.config['BACKGROUND_WORKERS']:
+        _start_pool(state, app.config['PASSWORD_HASH_WORKERS'])
+
+
+def _start_pool(state, workers):
+    if workers < 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+    try:
+        # The first task forks every worker at once, later tasks reuse them
+        pool.submit(int).result()
+    except BrokenProcessPool as e:
+        print(f"Error starting password hashing pool: {str(e)}")
+        pool.shutdown(wait=False)
+        return
+    state['pool'] = pool
+
+
+def _stop_pool(state):
+    if state['pool'] is not None:
+        state['pool'].shutdown()
+        state['pool'] = None
+
+
+def _get_pool():
+    if not has_app_context():
+        return None
+
+    state = current_app.extensions.get(EXTENSION_KEY)
+    if not state:
+        return None
+    return state['pool']
+
+
+def _reset_pool(pool):
+    state = current_app.extensions.get(EXTENSION_KEY)
+    with state['lock']:
+        if state['pool'] is pool:
+            state['pool'] = None
+    pool.shutdown(wait=False)
+
+
+def _run(function, *args):
+    pool = _get_pool()
+    if pool is None:
+        return function(*args)
+
+    try:
+        return pool.submit(function, *args).result()
+    except BrokenProcessPool as e:
+        # A worker died, the server has threads now so hash in the request threads from here on
+        print(f"Error in password hashing pool: {str(e)}")
+        _reset_pool(pool)
+        return function(*args)
+
+
+def get_hash_rounds():
+    """
+    Get the bcrypt cost factor of new hashes
+
+    Returns:
+        int: Configured BCRYPT_ROUNDS
+    """
+    if has_app_context():
+        return current_app.config['BCRYPT_ROUNDS']
+    return DEFAULT_ROUNDS
+
+
+def hash_password(password):
+    """
+    Hash a password with the configured cost factor
+
+    Args:
+        password (str): Plain text password
+
+    Returns:
+        str: bcrypt hash
+    """
+    return _run(_hash, password.encode('utf-8'), get_hash_rounds()).decode('utf-8')
+
+
+def verify_password(password, hashed):
+    """
+    Check a password against a bcrypt hash
+
+    Args:
+        password (str): Plain text password
+        hashed (str): Stored bcrypt hash
+
+    Returns:
+        bool: True if the password matches
+    """
+    return _run(_check, password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+def needs_rehash(hashed):
+    """
+    Check if a hash was made with a different cost factor than the configured one
+
+    Args:
+        hashed (str): Stored bcrypt hash, e.g. '$2b$12$...'
+
+    Returns:
+        bool: True if the password should be hashed again
+    """
+    try:
+        return int(hashed.split('$')[2]) != get_hash_rounds()
+    except (IndexError, ValueError):
+        return True
+
+
+passwords_cli = AppGroup('passwords', help='Password hashing tools.')
+
+
+@passwords_cli.command('benchmark')
+@click.option('--workers', default='0,1,2,4', show_default=True, help='Comma separated pool sizes, 0 hashes in the calling thread.')
+@click.option('--logins', default=64, show_default=True, help='Password checks per pool size.')
+@click.option('--threads', default=8, show_default=True, help='Concurrent request threads, like Waitress.')
+def benchmark_command(workers, logins, threads):
+    """Measure logins per second at different pool sizes."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    app = current_app._get_current_object()
+    hashed = hash_password('benchmark-password')
+    click.echo(f"bcrypt cost {get_hash_rounds()}, {logins} logins over {threads} threads, {os.cpu_count()} CPUs")
+
+    def login(_):
+        with app.app_context():
+            return verify_password('benchmark-password', hashed)
+
+    state = app.extensions[EXTENSION_KEY]
+    try:
+        for size in [int(value) for value in workers.split(',') if value.strip()]:
+            # Start the worker processes before timing, the CLI process runs no other threads yet
+            _stop_pool(state)
+            _start_pool(state, size)
+
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                started = time.monotonic()
+                results = list(executor.map(login, range(logins)))
+                elapsed = time.monotonic() - started
+
+            if not all(results):
+                raise click.ClickException("A password check failed")
+            click.echo(f"workers={size}: {logins / elapsed:.1f} logins/sec ({elapsed:.2f}s)")
+    finally:
+        _stop_pool(state)
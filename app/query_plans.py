@@ -0,0 +1,212 @@
+# The service layer filters a few tables on every page load. Each of those filters
+# has a matching index, and `flask indexes check` asks the database for the plan of
+# every such query and fails when one of them does not use its index, e.g. after a
+# migration dropped or renamed it or a query changed its filter columns.
+#
+# `flask listings check` runs the file listing queries and fails when one of them
+# selects the content columns of a stored file, which listing pages never need.
+from datetime import datetime
+import re
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select, event, Column
+from app import db
+from app.models import (Affiliation, Application, ApplicationFile, Announcement, AnnouncementRecipient,
+                        AnnouncementOrganization, AnnouncementRead, OutboxMessage, ImportJob, SchedulerRun,
+                        StoredBlobMixin)
+
+
+def hot_queries():
+    """
+    Build the hot queries of the service layer with placeholder values
+
+    Returns:
+        list: (description, index name, Select) tuples
+    """
+    return [
+        ('Affiliations of an organization by position and year', 'idx_affiliation_org_position_year',
+         select(Affiliation.affiliation_id).where(
+             Affiliation.organization_id == 1,
+             Affiliation.position.in_(['Member']),
+             Affiliation.academic_year == '2025-2026'
+         )),
+        ('Applications of an organization by type and year', 'idx_application_org_type_year',
+         select(Application.application_id).where(
+             Application.organization_id == 1,
+             Application.type == 'New',
+             Application.academic_year == '2025-2026'
+         )),
+        ('Pending applications by type', 'idx_application_status_type',
+         select(Application.application_id).where(
+             Application.status == 'Pending',
+             Application.type == 'New'
+         )),
+        ('Pending files of an application', 'idx_application_file_app_status',
+         select(ApplicationFile.app_file_id).where(
+             ApplicationFile.application_id == 1,
+             ApplicationFile.status.in_(['Pending', 'Incomplete'])
+         )),
+        ('Announcements sent to all users', 'idx_announcement_audience_date',
+         select(Announcement.announcement_id).where(
+             Announcement.audience == 'all',
+             Announcement.date_sent >= datetime(2025, 1, 1)
+         )),
+        ('Announcements sent to a user', 'idx_announcement_recipient_user',
+         select(AnnouncementRecipient.announcement_id).where(AnnouncementRecipient.user_id == 1)),
+        ('Announcements sent to an organization', 'idx_announcement_organization_org',
+         select(AnnouncementOrganization.announcement_id).where(AnnouncementOrganization.organization_id == 1)),
+        ('Announcements read by a user', 'idx_announcement_read_user',
+         select(AnnouncementRead.announcement_id).where(AnnouncementRead.user_id == 1)),
+        ('Emails due in the outbox', 'idx_email_outbox_status_next_attempt',
+         select(OutboxMessage.message_id).where(
+             OutboxMessage.status == 'Pending',
+             OutboxMessage.next_attempt_at <= datetime(2025, 1, 1)
+         )),
+        ('Queued import jobs', 'idx_import_job_status',
+         select(ImportJob.job_id).where(ImportJob.status == 'Queued')),
+        ('Latest runs of a scheduled job', 'idx_scheduler_run_job_started',
+         select(SchedulerRun.run_id).where(
+             SchedulerRun.job_name == 'organization_expiry'
+         ).order_by(SchedulerRun.started_at.desc()).limit(10)),
+    ]
+
+
+def explain(connection, statement):
+    """
+    Get the query plan of a statement as text
+
+    Args:
+        connection (Connection): Database connection
+        statement (Select): Query to explain
+
+    Returns:
+        str: Plan rows, one per line. For MySQL only the chosen key of each row, so
+        an index listed in possible_keys but not used does not count.
+    """
+    dialect = connection.dialect.name
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+
+    if dialect == 'sqlite':
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").mappings()
+        return '\n'.join(row['detail'] for row in rows)
+    if dialect in ('mysql', 'mariadb'):
+        rows = connection.exec_driver_sql(f"EXPLAIN {sql}").mappings()
+        return '\n'.join(f"{row['table']}: key={row['key']} type={row['type']}" for row in rows)
+    if dialect == 'postgresql':
+        return '\n'.join(row[0] for row in connection.exec_driver_sql(f"EXPLAIN {sql}"))
+    raise click.ClickException(f"EXPLAIN is not supported for {dialect}")
+
+
+indexes_cli = AppGroup('indexes', help='Check the indexes of the hot queries.')
+
+
+@indexes_cli.command('check')
+@click.option('--verbose', is_flag=True, help='Print the plan of every query.')
+def check_command(verbose):
+    """Fail when a hot query is not answered through its index."""
+    connection = db.session.connection()
+    missing = []
+
+    for description, index_name, statement in hot_queries():
+        plan = explain(connection, statement)
+        used = index_name in plan
+        click.echo(f"{'ok' if used else 'MISSING'}  {description}: {index_name}")
+        if verbose or not used:
+            click.echo('    ' + plan.replace('\n', '\n    '))
+        if not used:
+            missing.append(index_name)
+
+    if missing:
+        raise click.ClickException(f"{len(missing)} queries do not use their index: {', '.join(missing)}")
+    click.echo("All hot queries use their index.")
+
+
+def listing_queries():
+    """
+    Get the file listing functions of the service layer
+
+    Returns:
+        list: (description, function) tuples, each function runs its queries once
+    """
+    from app.organization_service import get_application_file_summaries, get_application_file_ids
+
+    return [
+        ('Application file summaries', lambda: get_application_file_summaries(0)),
+        ('Application file ids', lambda: get_application_file_ids(0)),
+    ]
+
+
+def content_columns():
+    """
+    Get the columns holding or locating the content of a stored file
+
+    Returns:
+        list: Qualified column names, e.g. 'application_files.storage_key'
+    """
+    columns = [name for name, value in vars(StoredBlobMixin).items() if isinstance(value, Column)]
+    # The content itself was stored in the 'file' column before the blob store
+    columns.append('file')
+    return [f"{ApplicationFile.__tablename__}.{column}" for column in columns]
+
+
+def capture_statements(function):
+    """
+    Run a function and record the SQL it sends to the database
+
+    Args:
+        function (callable): Function running the queries
+
+    Returns:
+        list: SQL statements in execution order
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        function()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return statements
+
+
+def selected_columns(statement):
+    """
+    Get the select list of a SQL statement, filters and joins on a column do not load it
+
+    Args:
+        statement (str): SQL statement, e.g. 'SELECT a.x, a.y FROM a WHERE a.z = ?'
+
+    Returns:
+        str: Text between the first SELECT and FROM, e.g. 'a.x, a.y'
+    """
+    match = re.search(r'\bSELECT\b(.*?)\bFROM\b', statement, re.IGNORECASE | re.DOTALL)
+    return match.group(1) if match else ''
+
+
+listings_cli = AppGroup('listings', help='Check the file listing queries.')
+
+
+@listings_cli.command('check')
+def check_listings_command():
+    """Fail when a file listing query selects the stored file content."""
+    columns = content_columns()
+    failed = []
+
+    for description, function in listing_queries():
+        statements = capture_statements(function)
+        if not statements:
+            raise click.ClickException(f"{description} ran no query")
+
+        selected = sorted({column for statement in statements for column in columns
+                           if re.search(rf"\b{re.escape(column)}\b", selected_columns(statement))})
+        click.echo(f"{'FAIL' if selected else 'ok'}  {description}: {len(statements)} queries")
+        if selected:
+            click.echo(f"    selects {', '.join(selected)}")
+            failed.append(description)
+
+    if failed:
+        raise click.ClickException(f"{len(failed)} listings select file content: {', '.join(failed)}")
+    click.echo("No listing selects file content.")
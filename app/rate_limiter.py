@@ -0,0 +1,469 @@
+# Rate limits are token buckets kept on the server, keyed by endpoint, client
+# IP and the email address a request is about, so a client cannot reset them by
+# dropping its session cookie. A bucket holds up to max_calls tokens and refills
+# at max_calls per timeout_duration seconds; each guarded request takes a token.
+#
+# Buckets live in memory by default. The 'database' backend keeps them in the
+# rate_limit_buckets table and the 'redis' backend in any Redis-compatible
+# server, so every process shares the same limits. A bucket that is full again
+# is the same as a missing one, which is when it is evicted.
+#
+# Failed logins are not a trickling limit but a lockout: record_failure counts
+# the failures in a bucket and, once none is left, empties a one-token block
+# bucket that takes the whole block duration to refill. check_blocked reads it.
+import math
+import threading
+import time
+from flask import current_app, request
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from app import db
+
+# Key of the limiter in app.extensions
+EXTENSION_KEY = 'rate_limiter'
+
+# Buckets are checked for eviction once every this many updates
+EVICTION_INTERVAL = 1000
+
+# Token bucket update run atomically by the 'redis' backend
+REDIS_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * refill_rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = math.min(capacity, tokens - cost)
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / refill_rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+def _refill(tokens, updated_at, now, capacity, refill_rate):
+    return min(capacity, tokens + max(0.0, now - updated_at) * refill_rate)
+
+
+def _spend(tokens, cost, capacity):
+    # A cost of 0 only reads the bucket and a negative cost gives tokens back
+    if tokens >= cost:
+        return True, min(capacity, tokens - cost)
+    return False, tokens
+
+
+class RateLimitStore:
+    """Base interface for token bucket stores"""
+
+    def take(self, key, capacity, refill_rate, cost=1):
+        """
+        Take tokens from a bucket
+
+        Args:
+            key (str): Key of the bucket
+            capacity (int): Tokens of a full bucket
+            refill_rate (float): Tokens added per second
+            cost (int, optional): Tokens to take, 0 to read the bucket, negative to give tokens back
+
+        Returns:
+            tuple: (allowed, tokens left in the bucket)
+        """
+        raise NotImplementedError
+
+    def reset(self, key):
+        """Forget a bucket, it starts full again"""
+        raise NotImplementedError
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """Store keeping the buckets of this process in a dictionary"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}  # key -> (tokens, updated_at, expires_at)
+        self.updates = 0
+
+    def take(self, key, capacity, refill_rate, cost=1):
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            tokens = capacity if bucket is None else _refill(bucket[0], bucket[1], now, capacity, refill_rate)
+            allowed, tokens = _spend(tokens, cost, capacity)
+            self.buckets[key] = (tokens, now, now + (capacity - tokens) / refill_rate)
+
+            self.updates += 1
+            if self.updates % EVICTION_INTERVAL == 0:
+                self._evict(now)
+
+        return allowed, tokens
+
+    def _evict(self, now):
+        for key in [key for key, bucket in self.buckets.items() if bucket[2] <= now]:
+            del self.buckets[key]
+
+    def reset(self, key):
+        with self.lock:
+            self.buckets.pop(key, None)
+
+
+class DatabaseRateLimitStore(RateLimitStore):
+    """
+    Store keeping the buckets in the rate_limit_buckets table.
+
+    Buckets are updated on their own connection so a rate limit check never
+    commits or rolls back the transaction of the request.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.updates = 0
+
+    def take(self, key, capacity, refill_rate, cost=1):
+        from app.models import RateLimitBucket
+
+        table = RateLimitBucket.__table__
+        now = time.time()
+
+        # A concurrent request may create the same bucket, then it is updated instead
+        for attempt in range(2):
+            try:
+                with db.engine.begin() as connection:
+                    row = connection.execute(
+                        select(table.c.tokens, table.c.updated_at).where(table.c.bucket_key == key).with_for_update()
+                    ).first()
+
+                    tokens = capacity if row is None else _refill(row.tokens, row.updated_at, now, capacity, refill_rate)
+                    allowed, tokens = _spend(tokens, cost, capacity)
+                    values = {'tokens': tokens, 'updated_at': now, 'expires_at': now + (capacity - tokens) / refill_rate}
+
+                    if row is None:
+                        connection.execute(insert(table).values(bucket_key=key, **values))
+                    else:
+                        connection.execute(update(table).where(table.c.bucket_key == key).values(**values))
+                break
+            except IntegrityError:
+                if attempt:
+                    raise
+
+        with self.lock:
+            self.updates += 1
+            evict = self.updates % EVICTION_INTERVAL == 0
+        if evict:
+            with db.engine.begin() as connection:
+                connection.execute(delete(table).where(table.c.expires_at <= now))
+
+        return allowed, tokens
+
+    def reset(self, key):
+        from app.models import RateLimitBucket
+
+        table = RateLimitBucket.__table__
+        with db.engine.begin() as connection:
+            connection.execute(delete(table).where(table.c.bucket_key == key))
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """Store keeping the buckets in a Redis-compatible server, each bucket expires once it is full again"""
+
+    def __init__(self, client, prefix):
+        self.client = client
+        self.prefix = prefix
+        self.script = client.register_script(REDIS_TAKE_SCRIPT)
+
+    def take(self, key, capacity, refill_rate, cost=1):
+        allowed, tokens = self.script(keys=[self.prefix + key], args=[capacity, refill_rate, cost, time.time()])
+        return bool(allowed), float(tokens)
+
+    def reset(self, key):
+        self.client.delete(self.prefix + key)
+
+
+class RateLimiter:
+    """Checks requests against the buckets of a store and counts the results per endpoint"""
+
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.metrics = {}  # endpoint -> counts
+        self.errors = 0
+
+    def _count(self, endpoint, result):
+        with self.lock:
+            counts = self.metrics.setdefault(endpoint, {'allowed': 0, 'limited': 0, 'refunded': 0})
+            counts[result] += 1
+
+    def take(self, endpoint, keys, cost=1):
+        """
+        Take a token from every bucket of a request
+
+        Args:
+            endpoint (str): Name of the guarded endpoint, used for the metrics
+            keys (list): (bucket key, capacity, refill rate) of every bucket the request counts against
+            cost (int, optional): Tokens to take from each bucket
+
+        Returns:
+            float: Seconds to wait when a bucket is empty, or None if the request is allowed
+        """
+        taken = []
+        try:
+            for key, capacity, refill_rate in keys:
+                allowed, tokens = self.store.take(key, capacity, refill_rate, cost)
+                if not allowed:
+                    # Give back the tokens of the buckets that allowed the request
+                    for taken_key, taken_capacity, taken_rate in taken:
+                        self.store.take(taken_key, taken_capacity, taken_rate, -cost)
+                    self._count(endpoint, 'limited')
+                    return max(1.0, (cost - tokens) / refill_rate)
+                taken.append((key, capacity, refill_rate))
+        except Exception as e:
+            # Never lock users out because the store is unavailable
+            print(f"Error checking rate limit: {str(e)}")
+            with self.lock:
+                self.errors += 1
+            return None
+
+        self._count(endpoint, 'allowed')
+        return None
+
+    def refund(self, endpoint, keys, cost=1):
+        """Give the tokens of an allowed request back"""
+        try:
+            for key, capacity, refill_rate in keys:
+                self.store.take(key, capacity, refill_rate, -cost)
+        except Exception as e:
+            print(f"Error refunding rate limit: {str(e)}")
+            with self.lock:
+                self.errors += 1
+            return
+        self._count(endpoint, 'refunded')
+
+    def reset(self, keys):
+        """Forget buckets by key, they start full again"""
+        try:
+            for key in keys:
+                self.store.reset(key)
+        except Exception as e:
+            print(f"Error resetting rate limit: {str(e)}")
+
+    def get_metrics(self):
+        """
+        Get the number of allowed, limited and refunded requests per endpoint
+
+        Returns:
+            dict: Dictionary with the counts per endpoint, the totals and the store errors
+        """
+        with self.lock:
+            endpoints = {endpoint: dict(counts) for endpoint, counts in self.metrics.items()}
+            errors = self.errors
+
+        totals = {'allowed': 0, 'limited': 0, 'refunded': 0}
+        for counts in endpoints.values():
+            for name in totals:
+                totals[name] += counts[name]
+
+        return {'endpoints': endpoints, 'totals': totals, 'errors': errors}
+
+
+def create_rate_limit_store(config):
+    """
+    Create a token bucket store from the application configuration
+
+    Args:
+        config (dict): Flask application configuration
+
+    Returns:
+        RateLimitStore: Configured store
+    """
+    backend = (config.get('RATE_LIMIT_BACKEND') or 'memory').lower()
+
+    if backend == 'memory':
+        return MemoryRateLimitStore()
+
+    if backend == 'database':
+        return DatabaseRateLimitStore()
+
+    if backend == 'redis':
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The 'redis' rate limit backend requires the redis package")
+
+        client = redis.Redis.from_url(config['RATE_LIMIT_REDIS_URL'])
+        return RedisRateLimitStore(client, config.get('RATE_LIMIT_REDIS_PREFIX') or 'npsoms-rate-limit:')
+
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+
+def init_rate_limiter(app):
+    """
+    Create the rate limiter of the application
+
+    Args:
+        app (Flask): Flask application
+    """
+    if EXTENSION_KEY not in app.extensions:
+        app.extensions[EXTENSION_KEY] = RateLimiter(create_rate_limit_store(app.config))
+
+
+def _get_limiter():
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def _bucket_key(name, kind, value):
+    return f"{name}:{kind}:{value.strip().lower()}"
+
+
+def _bucket(name, kind, value, max_calls, timeout_duration):
+    return (_bucket_key(name, kind, value), max_calls, max_calls / timeout_duration)
+
+
+def limit_keys(name, max_calls, timeout_duration, email=None):
+    """
+    Build the buckets a request to an endpoint counts against
+
+    The email bucket protects one account. When the request names an email,
+    the IP bucket only guards against one client trying many accounts and
+    allows RATE_LIMIT_IP_FACTOR times more calls, so users sharing a campus
+    network do not block each other.
+
+    Args:
+        name (str): Name of the endpoint
+        max_calls (int): Calls allowed per timeout_duration
+        timeout_duration (int): Seconds in which the bucket refills completely
+        email (str, optional): Email address the request is about
+
+    Returns:
+        list: (bucket key, capacity, refill rate) tuples
+    """
+    ip_calls = max_calls
+    keys = []
+    if email:
+        ip_calls = max_calls * current_app.config['RATE_LIMIT_IP_FACTOR']
+        keys.append(_bucket(name, 'email', email, max_calls, timeout_duration))
+    keys.insert(0, _bucket(name, 'ip', request.remote_addr or 'unknown', ip_calls, timeout_duration))
+    return keys
+
+
+def record_attempt(name, identifier, max_calls, timeout_duration):
+    """
+    Use one attempt of an identifier
+
+    Args:
+        name (str): Name of the limit
+        identifier (str): Value the attempts are counted for
+        max_calls (int): Attempts allowed per timeout_duration
+        timeout_duration (int): Seconds in which the attempts refill completely
+
+    Returns:
+        int: Seconds to wait when no attempt was left, or None if the attempt was allowed
+    """
+    limiter = _get_limiter()
+    if not limiter:
+        return None
+
+    retry_after = limiter.take(name, [_bucket(name, 'email', identifier, max_calls, timeout_duration)])
+    return math.ceil(retry_after) if retry_after else None
+
+
+def _block_bucket(name, identifier, block_duration):
+    return (_bucket_key(name, 'block', identifier), 1, 1 / block_duration)
+
+
+def check_blocked(name, identifier, block_duration):
+    """
+    Check if an identifier is blocked by record_failure
+
+    Args:
+        name (str): Name of the limit, e.g. 'login_failures'
+        identifier (str): Value the failures are counted for, e.g. an email address
+        block_duration (int): Seconds an identifier stays blocked
+
+    Returns:
+        int: Seconds left until the block ends, or None when not blocked
+    """
+    limiter = _get_limiter()
+    if not limiter:
+        return None
+
+    key, capacity, refill_rate = _block_bucket(name, identifier, block_duration)
+    try:
+        allowed, tokens = limiter.store.take(key, capacity, refill_rate, 0)
+    except Exception as e:
+        print(f"Error checking rate limit: {str(e)}")
+        return None
+
+    if tokens < 1:
+        limiter._count(name, 'limited')
+        return math.ceil((1 - tokens) / refill_rate)
+    return None
+
+
+def record_failure(name, identifier, max_failures, block_duration):
+    """
+    Count a failed attempt and block the identifier for the whole block_duration
+    once max_failures attempts failed within it
+
+    Unlike record_attempt no attempt comes back while the identifier is blocked,
+    and all of them are available again when the block ends.
+
+    Args:
+        name (str): Name of the limit, e.g. 'login_failures'
+        identifier (str): Value the failures are counted for
+        max_failures (int): Failures allowed within block_duration
+        block_duration (int): Seconds an identifier stays blocked
+
+    Returns:
+        int: block_duration when this failure started a block, or None
+    """
+    limiter = _get_limiter()
+    if not limiter:
+        return None
+
+    key, capacity, refill_rate = _bucket(name, 'email', identifier, max_failures, block_duration)
+    try:
+        allowed, tokens = limiter.store.take(key, capacity, refill_rate)
+        if allowed and tokens >= 1:
+            return None
+
+        block_key, block_capacity, block_rate = _block_bucket(name, identifier, block_duration)
+        limiter.store.take(block_key, block_capacity, block_rate)
+        limiter.store.reset(key)
+    except Exception as e:
+        print(f"Error recording failed attempt: {str(e)}")
+        return None
+
+    limiter._count(name, 'limited')
+    return block_duration
+
+
+def reset_attempts(name, identifier):
+    """
+    Give all attempts of an identifier back and end its block
+
+    Args:
+        name (str): Name of the limit
+        identifier (str): Value the attempts are counted for
+    """
+    limiter = _get_limiter()
+    if limiter:
+        limiter.reset([_bucket_key(name, 'email', identifier), _bucket_key(name, 'block', identifier)])
+
+
+def get_rate_limit_metrics():
+    """
+    Get the rate limiter metrics of this process
+
+    Returns:
+        dict: Dictionary with the counts per endpoint, the totals, the store errors and the backend
+    """
+    limiter = _get_limiter()
+    if not limiter:
+        return {'endpoints': {}, 'totals': {'allowed': 0, 'limited': 0, 'refunded': 0}, 'errors': 0, 'backend': None}
+
+    return dict(limiter.get_metrics(), backend=current_app.config.get('RATE_LIMIT_BACKEND'))
+
@@ -0,0 +1,156 @@
+# Almost every user route looks up the organization of the signed in user and
+# its current application, often several times through service helpers. The
+# results are kept on flask.g for the rest of the request. Cached values are
+# dropped as soon as an organization or application is added, changed or
+# deleted in the session, and on every commit and rollback, so a route never
+# sees a value from before its own changes.
+import threading
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+from app import db
+
+# Key of the metrics in app.extensions
+EXTENSION_KEY = 'request_context'
+
+
+class RequestContext:
+    """Values resolved once per request"""
+
+    def __init__(self):
+        self.values = {}
+        self.lookups = 0
+        self.queries_saved = 0
+
+    def resolve(self, key, loader):
+        """
+        Get a value of the request, loading it on first use
+
+        Args:
+            key (tuple): Key of the value, e.g. ('organization', user_id)
+            loader (callable): Function loading the value
+
+        Returns:
+            The cached or loaded value
+        """
+        self.lookups += 1
+        if key in self.values:
+            self.queries_saved += 1
+            return self.values[key]
+
+        value = loader()
+        self.values[key] = value
+        return value
+
+    def clear(self):
+        """Drop every cached value"""
+        self.values.clear()
+
+
+def get_request_context():
+    """
+    Get the context of the current request
+
+    Returns:
+        RequestContext: Context stored on flask.g, or None outside a request
+    """
+    if not has_request_context():
+        return None
+
+    context = g.get('request_context')
+    if context is None:
+        context = g.request_context = RequestContext()
+    return context
+
+
+def memoize(key, loader):
+    """
+    Load a value once per request
+
+    Args:
+        key (tuple): Key of the value
+        loader (callable): Function loading the value
+
+    Returns:
+        The cached or loaded value, loaded every time outside a request
+    """
+    context = get_request_context()
+    if context is None:
+        return loader()
+    return context.resolve(key, loader)
+
+
+def _clear_request_context(*args):
+    if has_request_context():
+        context = g.get('request_context')
+        if context is not None:
+            context.clear()
+
+
+def _clear_on_flush(session, flush_context):
+    from app.models import Organization, Application
+
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (Organization, Application)):
+            _clear_request_context()
+            return
+
+
+def _new_metrics():
+    return {
+        'requests': 0,
+        'lookups': 0,
+        'queries_saved': 0
+    }
+
+
+def init_request_context(app):
+    """
+    Register the request context hooks and metrics
+
+    Args:
+        app (Flask): Flask application
+    """
+    if EXTENSION_KEY in app.extensions:
+        return
+
+    state = {
+        'lock': threading.Lock(),
+        'metrics': _new_metrics()
+    }
+    app.extensions[EXTENSION_KEY] = state
+
+    # Listening on the scoped session applies to every session it creates
+    if not event.contains(db.session, 'after_commit', _clear_request_context):
+        event.listen(db.session, 'after_commit', _clear_request_context)
+        event.listen(db.session, 'after_rollback', _clear_request_context)
+        event.listen(db.session, 'after_flush', _clear_on_flush)
+
+    @app.teardown_request
+    def record_request_context(exception=None):
+        context = g.pop('request_context', None)
+        if context is None or not context.lookups:
+            return
+
+        with state['lock']:
+            metrics = state['metrics']
+            metrics['requests'] += 1
+            metrics['lookups'] += context.lookups
+            metrics['queries_saved'] += context.queries_saved
+
+
+def get_request_context_metrics():
+    """
+    Get the number of memoized lookups and the queries they saved in this process
+
+    Returns:
+        dict: Dictionary with requests, lookups, queries_saved and queries_saved_per_request
+    """
+    state = current_app.extensions.get(EXTENSION_KEY)
+    if not state:
+        return dict(_new_metrics(), queries_saved_per_request=0.0)
+
+    with state['lock']:
+        metrics = dict(state['metrics'])
+
+    metrics['queries_saved_per_request'] = round(metrics['queries_saved'] / metrics['requests'], 2) if metrics['requests'] else 0.0
+    return metrics
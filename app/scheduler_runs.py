@@ -0,0 +1,146 @@
+# Every run of a background job is recorded in the scheduler_runs table with
+# its duration, the number of rows it changed and the error if it failed. A
+# successful run is committed in the same transaction as the changes of the job,
+# so a run marked Success always matches what is in the database.
+import time
+from datetime import datetime
+from sqlalchemy import select, func, case
+from app import db
+
+# Name of the daily organization expiry check
+ORGANIZATION_EXPIRY_JOB = 'organization_expiry'
+
+
+def _serialize_run(run):
+    return {
+        'run_id': run.run_id,
+        'job_name': run.job_name,
+        'trigger': run.trigger,
+        'status': run.status,
+        'started_at': run.started_at.isoformat() if run.started_at else None,
+        'finished_at': run.finished_at.isoformat() if run.finished_at else None,
+        'duration_ms': run.duration_ms,
+        'rows_affected': run.rows_affected,
+        'affected_ids': [int(value) for value in run.affected_ids.split(',')] if run.affected_ids else [],
+        'error': run.error
+    }
+
+
+def run_job(job_name, trigger, job):
+    """
+    Run a job in one transaction and record the run
+    
+    Args:
+        job_name (str): Name of the job, e.g. ORGANIZATION_EXPIRY_JOB
+        trigger (str): 'scheduler' or 'manual'
+        job (callable): Function changing rows in db.session and returning their ids
+        
+    Returns:
+        dict: The recorded run
+    """
+    from app.models import SchedulerRun
+    
+    started_at = datetime.now()
+    started = time.monotonic()
+    
+    try:
+        ids = job()
+        run = SchedulerRun(
+            job_name=job_name,
+            trigger=trigger,
+            status='Success',
+            started_at=started_at,
+            finished_at=datetime.now(),
+            duration_ms=int((time.monotonic() - started) * 1000),
+            rows_affected=len(ids),
+            affected_ids=','.join(str(value) for value in ids) or None
+        )
+        db.session.add(run)
+        db.session.flush()
+        result = _serialize_run(run)
+        db.session.commit()
+        return result
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error running {job_name}: {str(e)}")
+        error = str(e)
+    
+    run = SchedulerRun(
+        job_name=job_name,
+        trigger=trigger,
+        status='Failed',
+        started_at=started_at,
+        finished_at=datetime.now(),
+        duration_ms=int((time.monotonic() - started) * 1000),
+        rows_affected=0,
+        error=error
+    )
+    try:
+        db.session.add(run)
+        db.session.flush()
+        result = _serialize_run(run)
+        db.session.commit()
+        return result
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error recording {job_name} run: {str(e)}")
+        return _serialize_run(run)
+
+
+def get_last_run(job_name):
+    """
+    Get the latest run of a job
+    
+    Args:
+        job_name (str): Name of the job
+        
+    Returns:
+        dict: The run, or None if the job never ran
+    """
+    from app.models import SchedulerRun
+    
+    run = SchedulerRun.query.filter_by(job_name=job_name).order_by(
+        SchedulerRun.started_at.desc(), SchedulerRun.run_id.desc()
+    ).first()
+    return _serialize_run(run) if run else None
+
+
+def get_scheduler_summary(job_name, limit=20):
+    """
+    Get the totals and the latest runs of a job
+    
+    Args:
+        job_name (str): Name of the job
+        limit (int): Number of runs to include
+        
+    Returns:
+        dict: Dictionary with the totals, the last successful run and the latest runs
+    """
+    from app.models import SchedulerRun
+    
+    totals = db.session.execute(
+        select(
+            func.count(SchedulerRun.run_id),
+            func.sum(case((SchedulerRun.status == 'Failed', 1), else_=0)),
+            func.sum(SchedulerRun.rows_affected),
+            func.avg(SchedulerRun.duration_ms)
+        ).where(SchedulerRun.job_name == job_name)
+    ).one()
+    
+    last_success = SchedulerRun.query.filter_by(job_name=job_name, status='Success').order_by(
+        SchedulerRun.started_at.desc(), SchedulerRun.run_id.desc()
+    ).first()
+    
+    runs = SchedulerRun.query.filter_by(job_name=job_name).order_by(
+        SchedulerRun.started_at.desc(), SchedulerRun.run_id.desc()
+    ).limit(limit).all()
+    
+    return {
+        'job_name': job_name,
+        'total_runs': totals[0] or 0,
+        'failed_runs': int(totals[1] or 0),
+        'rows_affected': int(totals[2] or 0),
+        'average_duration_ms': round(float(totals[3]), 1) if totals[3] is not None else None,
+        'last_success': _serialize_run(last_success) if last_success else None,
+        'runs': [_serialize_run(run) for run in runs]
+    }
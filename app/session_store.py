@@ -0,0 +1,260 @@
+# Session data is stored in the user_sessions table and the session cookie only
+# carries a random session id, so responses no longer re-sign and resend the
+# whole session on every request. Rows are read through a small LRU cache of
+# the serialized data, written only when the session changes, and their expiry
+# is pushed back at most once per TOUCH_INTERVAL. Expired rows are swept every
+# SESSION_SWEEP_INTERVAL seconds.
+#
+# Sessions are written on their own connection so saving a session never
+# commits or rolls back the transaction of the request.
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SessionInterface
+from flask_login import user_logged_in, user_logged_out
+from sqlalchemy import select, insert, update, delete
+from app import db
+
+# Seconds before the expiry of an unchanged session is pushed back again
+TOUCH_INTERVAL = 60
+
+# Session ids are 43 url-safe characters, anything else is ignored
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{43}$')
+
+
+class ServerSideSession(SecureCookieSession):
+    """Session whose data is kept on the server under session_id"""
+
+    def __init__(self, initial=None, session_id=None, expires_at=None):
+        super().__init__(initial)
+        self.session_id = session_id
+        self.expires_at = expires_at
+        self.new = session_id is None
+        self.previous_id = None
+
+    def regenerate(self):
+        """Move the data to a new session id, called when the user logs in or out"""
+        if self.session_id:
+            self.previous_id = self.session_id
+        self.session_id = None
+        self.modified = True
+
+
+class DatabaseSessionInterface(SessionInterface):
+    """Session interface keeping the session data in the user_sessions table"""
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, cache_size, cache_ttl, sweep_interval):
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.sweep_interval = sweep_interval
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()  # session_id -> (data, expires_at, cached_at)
+        self.last_sweep = time.monotonic()
+
+    def _cache_get(self, session_id):
+        with self.lock:
+            entry = self.cache.get(session_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[2] > self.cache_ttl:
+                del self.cache[session_id]
+                return None
+            self.cache.move_to_end(session_id)
+            return entry
+
+    def _cache_set(self, session_id, data, expires_at):
+        if self.cache_size < 1:
+            return
+        with self.lock:
+            self.cache[session_id] = (data, expires_at, time.monotonic())
+            self.cache.move_to_end(session_id)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def _cache_delete(self, session_id):
+        with self.lock:
+            self.cache.pop(session_id, None)
+
+    def _load(self, session_id):
+        from app.models import UserSession
+
+        entry = self._cache_get(session_id)
+        if entry is None:
+            table = UserSession.__table__
+            with db.engine.connect() as connection:
+                row = connection.execute(
+                    select(table.c.data, table.c.expires_at).where(table.c.session_id == session_id)
+                ).first()
+            if row is None:
+                return None
+            entry = (row.data, row.expires_at, None)
+            self._cache_set(session_id, row.data, row.expires_at)
+
+        data, expires_at = entry[0], entry[1]
+        if expires_at <= datetime.now():
+            self._cache_delete(session_id)
+            return None
+        return data, expires_at
+
+    def open_session(self, app, request):
+        session_id = request.cookies.get(self.get_cookie_name(app))
+        if not session_id or not SESSION_ID_PATTERN.match(session_id):
+            return ServerSideSession()
+
+        try:
+            loaded = self._load(session_id)
+        except Exception as e:
+            print(f"Error loading session: {str(e)}")
+            loaded = None
+
+        if loaded is None:
+            return ServerSideSession()
+
+        data, expires_at = loaded
+        try:
+            return ServerSideSession(self.serializer.loads(data), session_id=session_id, expires_at=expires_at)
+        except Exception:
+            # Unreadable data, start over with an empty session
+            return ServerSideSession()
+
+    def _delete(self, session_id):
+        from app.models import UserSession
+
+        table = UserSession.__table__
+        self._cache_delete(session_id)
+        with db.engine.begin() as connection:
+            connection.execute(delete(table).where(table.c.session_id == session_id))
+
+    def _sweep(self):
+        from app.models import UserSession
+
+        with self.lock:
+            now = time.monotonic()
+            if now - self.last_sweep < self.sweep_interval:
+                return
+            self.last_sweep = now
+
+        table = UserSession.__table__
+        with db.engine.begin() as connection:
+            connection.execute(delete(table).where(table.c.expires_at <= datetime.now()))
+
+    def save_session(self, app, session, response):
+        from app.models import UserSession
+
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        partitioned = self.get_cookie_partitioned(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        # Add a "Vary: Cookie" header if the session was accessed at all.
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        try:
+            if session.previous_id:
+                self._delete(session.previous_id)
+                session.previous_id = None
+
+            # If the session is modified to be empty, remove the row and the cookie.
+            if not session:
+                if session.session_id:
+                    self._delete(session.session_id)
+                if session.modified or session.session_id:
+                    response.delete_cookie(
+                        name,
+                        domain=domain,
+                        path=path,
+                        secure=secure,
+                        partitioned=partitioned,
+                        samesite=samesite,
+                        httponly=httponly,
+                    )
+                    response.vary.add("Cookie")
+                return
+
+            table = UserSession.__table__
+            expires_at = datetime.now() + app.permanent_session_lifetime
+            set_cookie = False
+
+            if session.session_id is None:
+                session.session_id = secrets.token_urlsafe(32)
+                data = self.serializer.dumps(dict(session))
+                with db.engine.begin() as connection:
+                    connection.execute(insert(table).values(
+                        session_id=session.session_id, data=data, expires_at=expires_at
+                    ))
+                self._cache_set(session.session_id, data, expires_at)
+                set_cookie = True
+            elif session.modified:
+                data = self.serializer.dumps(dict(session))
+                with db.engine.begin() as connection:
+                    connection.execute(update(table).where(table.c.session_id == session.session_id).values(
+                        data=data, expires_at=expires_at
+                    ))
+                self._cache_set(session.session_id, data, expires_at)
+                set_cookie = session.permanent
+            elif session.expires_at and expires_at - session.expires_at > timedelta(seconds=TOUCH_INTERVAL):
+                # Unchanged session, only push its expiry back
+                with db.engine.begin() as connection:
+                    connection.execute(update(table).where(table.c.session_id == session.session_id).values(
+                        expires_at=expires_at
+                    ))
+                entry = self._cache_get(session.session_id)
+                if entry:
+                    self._cache_set(session.session_id, entry[0], expires_at)
+                set_cookie = session.permanent
+
+            self._sweep()
+        except Exception as e:
+            print(f"Error saving session: {str(e)}")
+            return
+
+        if not set_cookie:
+            return
+
+        response.set_cookie(
+            name,
+            session.session_id,
+            expires=self.get_expiration_time(app, session),
+            httponly=httponly,
+            domain=domain,
+            path=path,
+            secure=secure,
+            partitioned=partitioned,
+            samesite=samesite,
+        )
+        response.vary.add("Cookie")
+
+
+def _regenerate_session_id(sender, **extra):
+    from flask import session
+
+    if isinstance(session._get_current_object(), ServerSideSession):
+        session.regenerate()
+
+
+def init_session_store(app):
+    """
+    Keep the sessions of the application in the database
+
+    Args:
+        app (Flask): Flask application
+    """
+    app.session_interface = DatabaseSessionInterface(
+        cache_size=app.config['SESSION_CACHE_SIZE'],
+        cache_ttl=app.config['SESSION_CACHE_TTL'],
+        sweep_interval=app.config['SESSION_SWEEP_INTERVAL']
+    )
+
+    # A new session id after login and logout prevents session fixation
+    user_logged_in.connect(_regenerate_session_id, app)
+    user_logged_out.connect(_regenerate_session_id, app)
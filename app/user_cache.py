@@ -0,0 +1,147 @@
+# Flask-Login loads the signed in user on every authenticated request, including
+# logo fetches, file previews and JSON polls. The few user fields the app reads
+# are kept in a small LRU cache for USER_CACHE_TTL seconds so those requests
+# resolve current_user without a query. A user is dropped from the cache when a
+# transaction that changed its row or its entry key is committed.
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app import db
+from app.models import User, EntryKey
+
+# Key of the cache in app.extensions
+EXTENSION_KEY = 'user_cache'
+
+# Key in Session.info used to collect the users changed by the current transaction
+CHANGED_USERS = 'user_cache_changed_users'
+
+# Fields of a user kept in the cache
+USER_FIELDS = ('user_id', 'role_id', 'first_name', 'middle_name', 'last_name', 'email', 'is_active')
+
+
+class CachedUser(UserMixin):
+    """Read-only copy of the fields of a user, used as current_user"""
+
+    def __init__(self, user_id, role_id, first_name, middle_name, last_name, email, is_active):
+        self.user_id = user_id
+        self.role_id = role_id
+        self.first_name = first_name
+        self.middle_name = middle_name
+        self.last_name = last_name
+        self.email = email
+        self._is_active = is_active
+
+    @property
+    def is_active(self):
+        return bool(self._is_active)
+
+    def get_id(self):
+        return str(self.user_id)
+
+
+def init_user_cache(app):
+    """
+    Create the user cache of the application
+
+    Args:
+        app (Flask): Flask application
+    """
+    if EXTENSION_KEY not in app.extensions:
+        app.extensions[EXTENSION_KEY] = {
+            'lock': threading.Lock(),
+            'users': OrderedDict(),  # user_id -> (CachedUser, cached_at)
+            # Bumped by every invalidation so users loaded before it are not cached
+            'generation': 0
+        }
+
+
+def load_cached_user(user_id):
+    """
+    Get the signed in user from the cache, loading it on a miss
+
+    Args:
+        user_id (int): ID of the user
+
+    Returns:
+        CachedUser: Fields of the user, or None if the user does not exist
+    """
+    state = current_app.extensions.get(EXTENSION_KEY)
+    if not state:
+        return db.session.get(User, user_id)
+
+    now = time.monotonic()
+    with state['lock']:
+        entry = state['users'].get(user_id)
+        if entry and now - entry[1] < current_app.config['USER_CACHE_TTL']:
+            state['users'].move_to_end(user_id)
+            return entry[0]
+        generation = state['generation']
+
+    row = db.session.query(*[getattr(User, field) for field in USER_FIELDS]).filter(User.user_id == user_id).first()
+    if row is None:
+        return None
+
+    user = CachedUser(*row)
+    with state['lock']:
+        if state['generation'] != generation:
+            return user
+        state['users'][user_id] = (user, now)
+        state['users'].move_to_end(user_id)
+        while len(state['users']) > current_app.config['USER_CACHE_SIZE']:
+            state['users'].popitem(last=False)
+
+    return user
+
+
+def invalidate_user(user_id):
+    """
+    Drop a user from the cache
+
+    Args:
+        user_id (int): ID of the user
+    """
+    state = current_app.extensions.get(EXTENSION_KEY)
+    if state:
+        with state['lock']:
+            state['generation'] += 1
+            state['users'].pop(user_id, None)
+
+
+def _record_user(session, user_id):
+    if session is not None and user_id is not None:
+        session.info.setdefault(CHANGED_USERS, set()).add(user_id)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _record_user_change(mapper, connection, target):
+    _record_user(object_session(target), target.user_id)
+
+
+@event.listens_for(EntryKey, 'after_insert')
+@event.listens_for(EntryKey, 'after_update')
+def _record_entry_key_change(mapper, connection, target):
+    _record_user(object_session(target), target.user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    user_ids = session.info.pop(CHANGED_USERS, None)
+    if not user_ids:
+        return
+
+    try:
+        for user_id in user_ids:
+            invalidate_user(user_id)
+    except RuntimeError:
+        # Committed outside an application context, no cache to update
+        pass
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop(CHANGED_USERS, None)
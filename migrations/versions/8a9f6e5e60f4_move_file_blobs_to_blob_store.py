@@ -0,0 +1,105 @@
+"""Move application file and logo blobs out of the database into the blob store
+
+Revision ID: 8a9f6e5e60f4
+Revises: a2325a269629
+Create Date: 2025-08-10 09:12:37.514208
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a9f6e5e60f4'
+down_revision = 'a2325a269629'
+branch_labels = None
+depends_on = None
+
+# Number of rows whose blobs are loaded into memory at once
+BATCH_SIZE = 50
+
+# (table, primary key, blob column, filename column)
+BLOB_TABLES = [
+    ('application_files', 'app_file_id', 'file', 'file_name'),
+    ('logos', 'logo_id', 'logo', None),
+]
+
+
+def _add_metadata_columns(table):
+    with op.batch_alter_table(table, schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(64), nullable=True))
+        batch_op.add_column(sa.Column('file_size', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('mimetype', sa.String(100), nullable=True))
+        batch_op.add_column(sa.Column('storage_key', sa.String(255), nullable=True))
+
+
+def _drop_metadata_columns(table):
+    with op.batch_alter_table(table, schema=None) as batch_op:
+        batch_op.drop_column('storage_key')
+        batch_op.drop_column('mimetype')
+        batch_op.drop_column('file_size')
+        batch_op.drop_column('content_hash')
+
+
+def upgrade():
+    from app.blob_storage import save_blob
+
+    conn = op.get_bind()
+
+    for table, pk, blob_column, name_column in BLOB_TABLES:
+        _add_metadata_columns(table)
+
+        name_select = f", {name_column}" if name_column else ""
+        select_batch = sa.text(
+            f"SELECT {pk}, {blob_column}{name_select} FROM {table} "
+            f"WHERE {blob_column} IS NOT NULL AND storage_key IS NULL "
+            f"ORDER BY {pk} LIMIT :limit"
+        )
+        update_row = sa.text(
+            f"UPDATE {table} SET content_hash = :content_hash, file_size = :file_size, "
+            f"mimetype = :mimetype, storage_key = :storage_key WHERE {pk} = :id"
+        )
+
+        # Move blobs in batches so the whole table is never held in memory
+        while True:
+            rows = conn.execute(select_batch, {'limit': BATCH_SIZE}).fetchall()
+            if not rows:
+                break
+
+            for row in rows:
+                filename = row[2] if name_column else None
+                blob = save_blob(bytes(row[1]), filename)
+                conn.execute(update_row, dict(blob, id=row[0]))
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column(blob_column)
+
+
+def downgrade():
+    from app.blob_storage import read_blob
+
+    conn = op.get_bind()
+
+    for table, pk, blob_column, name_column in BLOB_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(blob_column, sa.LargeBinary(length=(2**32) - 1), nullable=True))
+
+        select_batch = sa.text(
+            f"SELECT {pk}, storage_key FROM {table} "
+            f"WHERE storage_key IS NOT NULL AND {pk} > :last_id "
+            f"ORDER BY {pk} LIMIT :limit"
+        )
+        update_row = sa.text(f"UPDATE {table} SET {blob_column} = :data WHERE {pk} = :id")
+
+        # Copy blobs back into the rows in batches
+        last_id = 0
+        while True:
+            rows = conn.execute(select_batch, {'last_id': last_id, 'limit': BATCH_SIZE}).fetchall()
+            if not rows:
+                break
+
+            for row in rows:
+                conn.execute(update_row, {'data': read_blob(row[1]), 'id': row[0]})
+                last_id = row[0]
+
+        _drop_metadata_columns(table)
@@ -0,0 +1,50 @@
+"""Add email_outbox table for background email delivery
+
+Revision ID: a6d4e9b3c128
+Revises: f5c8a3e2d917
+Create Date: 2025-08-19 14:05:51.772340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d4e9b3c128'
+down_revision = 'f5c8a3e2d917'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(table):
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_index(table, name):
+    return name in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if not _has_table('email_outbox'):
+        op.create_table(
+            'email_outbox',
+            sa.Column('message_id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('recipient', sa.String(255), nullable=False),
+            sa.Column('sender', sa.String(255)),
+            sa.Column('subject', sa.String(255), nullable=False),
+            sa.Column('html_body', sa.Text()),
+            sa.Column('text_body', sa.Text()),
+            sa.Column('status', sa.String(20), nullable=False, server_default='Pending'),
+            sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('last_error', sa.Text()),
+            sa.Column('next_attempt_at', sa.DateTime()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('sent_at', sa.DateTime()),
+        )
+    if not _has_index('email_outbox', 'idx_email_outbox_status_next_attempt'):
+        op.create_index('idx_email_outbox_status_next_attempt', 'email_outbox', ['status', 'next_attempt_at'])
+
+
+def downgrade():
+    op.drop_index('idx_email_outbox_status_next_attempt', table_name='email_outbox')
+    op.drop_table('email_outbox')
@@ -0,0 +1,51 @@
+"""Record when users were created and the audience size of each announcement
+
+Revision ID: a9c3e5f1d284
+Revises: f4a7c2d9e815
+Create Date: 2025-08-23 14:02:37.915466
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c3e5f1d284'
+down_revision = 'f4a7c2d9e815'
+branch_labels = None
+depends_on = None
+
+
+def _has_column(table, column):
+    return column in {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    # Existing users keep seeing every broadcast, their creation time is unknown
+    if not _has_column('users', 'created_at'):
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('created_at', sa.DateTime()))
+
+    if not _has_column('announcements', 'recipient_count'):
+        with op.batch_alter_table('announcements', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('recipient_count', sa.Integer()))
+
+    # The audience size at send time is unknown for existing announcements, use the current one
+    op.execute(
+        "UPDATE announcements SET recipient_count = CASE audience "
+        "WHEN 'all' THEN (SELECT COUNT(*) FROM users WHERE role_id IN (2, 3)) "
+        "WHEN 'organizations' THEN (SELECT COUNT(DISTINCT u.user_id) FROM announcement_organizations ao "
+        "JOIN organizations o ON o.organization_id = ao.organization_id "
+        "JOIN users u ON u.user_id = o.user_id AND u.role_id IN (2, 3) "
+        "WHERE ao.announcement_id = announcements.announcement_id) "
+        "ELSE (SELECT COUNT(*) FROM announcement_recipients r WHERE r.announcement_id = announcements.announcement_id) "
+        "END WHERE recipient_count IS NULL"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('announcements', schema=None) as batch_op:
+        batch_op.drop_column('recipient_count')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('created_at')
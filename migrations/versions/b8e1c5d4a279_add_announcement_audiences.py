@@ -0,0 +1,99 @@
+"""Add announcement audiences and sparse read state
+
+Revision ID: b8e1c5d4a279
+Revises: a6d4e9b3c128
+Create Date: 2025-08-20 10:12:37.604518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e1c5d4a279'
+down_revision = 'a6d4e9b3c128'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(table):
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_index(table, name):
+    return name in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # Existing announcements keep their recipient rows and are addressed to those users
+    with op.batch_alter_table('announcements', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('audience', sa.String(20), nullable=False, server_default='users'))
+    if not _has_index('announcements', 'idx_announcement_audience_date'):
+        op.create_index('idx_announcement_audience_date', 'announcements', ['audience', 'date_sent'])
+
+    if not _has_table('announcement_organizations'):
+        op.create_table(
+            'announcement_organizations',
+            sa.Column('announcement_id', sa.Integer(), sa.ForeignKey('announcements.announcement_id'), primary_key=True),
+            sa.Column('organization_id', sa.Integer(), sa.ForeignKey('organizations.organization_id'), primary_key=True),
+        )
+    if not _has_index('announcement_organizations', 'idx_announcement_organization_org'):
+        op.create_index('idx_announcement_organization_org', 'announcement_organizations', ['organization_id'])
+
+    if not _has_table('announcement_reads'):
+        op.create_table(
+            'announcement_reads',
+            sa.Column('announcement_id', sa.Integer(), sa.ForeignKey('announcements.announcement_id'), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.user_id'), primary_key=True),
+            sa.Column('read_at', sa.DateTime()),
+        )
+    if not _has_index('announcement_reads', 'idx_announcement_read_user'):
+        op.create_index('idx_announcement_read_user', 'announcement_reads', ['user_id'])
+
+    # Only the announcements that were read get a read row
+    op.execute(
+        "INSERT INTO announcement_reads (announcement_id, user_id, read_at) "
+        "SELECT announcement_id, user_id, CURRENT_TIMESTAMP FROM announcement_recipients WHERE is_read = TRUE"
+    )
+
+    # Create the new user index first, the user_id foreign key needs one
+    if not _has_index('announcement_recipients', 'idx_announcement_recipient_user'):
+        op.create_index('idx_announcement_recipient_user', 'announcement_recipients', ['user_id'])
+    op.drop_index('idx_announcement_recipient_user_read', table_name='announcement_recipients')
+    with op.batch_alter_table('announcement_recipients', schema=None) as batch_op:
+        batch_op.drop_column('is_read')
+
+
+def downgrade():
+    with op.batch_alter_table('announcement_recipients', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_read', sa.Boolean(), server_default=sa.false()))
+
+    # Write one recipient row per user again for broadcasts and organization announcements
+    op.execute(
+        "INSERT INTO announcement_recipients (announcement_id, user_id, is_read) "
+        "SELECT a.announcement_id, u.user_id, FALSE FROM announcements a "
+        "JOIN users u ON u.role_id IN (2, 3) WHERE a.audience = 'all'"
+    )
+    op.execute(
+        "INSERT INTO announcement_recipients (announcement_id, user_id, is_read) "
+        "SELECT DISTINCT ao.announcement_id, o.user_id, FALSE FROM announcement_organizations ao "
+        "JOIN organizations o ON o.organization_id = ao.organization_id "
+        "JOIN users u ON u.user_id = o.user_id AND u.role_id IN (2, 3)"
+    )
+    op.execute(
+        "UPDATE announcement_recipients SET is_read = TRUE WHERE EXISTS ("
+        "SELECT 1 FROM announcement_reads r WHERE r.announcement_id = announcement_recipients.announcement_id "
+        "AND r.user_id = announcement_recipients.user_id)"
+    )
+
+    op.create_index('idx_announcement_recipient_user_read', 'announcement_recipients', ['user_id', 'is_read'])
+    op.drop_index('idx_announcement_recipient_user', table_name='announcement_recipients')
+
+    op.drop_index('idx_announcement_read_user', table_name='announcement_reads')
+    op.drop_table('announcement_reads')
+    op.drop_index('idx_announcement_organization_org', table_name='announcement_organizations')
+    op.drop_table('announcement_organizations')
+
+    op.drop_index('idx_announcement_audience_date', table_name='announcements')
+    with op.batch_alter_table('announcements', schema=None) as batch_op:
+        batch_op.drop_column('audience')
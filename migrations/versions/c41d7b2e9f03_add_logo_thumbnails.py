@@ -0,0 +1,75 @@
+"""Add pre-rendered logo thumbnails
+
+Revision ID: c41d7b2e9f03
+Revises: 8a9f6e5e60f4
+Create Date: 2025-08-12 14:03:51.208734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7b2e9f03'
+down_revision = '8a9f6e5e60f4'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(table):
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_index(table, name):
+    return name in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if not _has_table('logo_thumbnails'):
+        op.create_table(
+            'logo_thumbnails',
+            sa.Column('thumbnail_id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('logo_id', sa.Integer(), sa.ForeignKey('logos.logo_id', ondelete='CASCADE'), nullable=False),
+            sa.Column('size', sa.Integer(), nullable=False),
+            sa.Column('content_hash', sa.String(64), nullable=True),
+            sa.Column('file_size', sa.Integer(), nullable=True),
+            sa.Column('mimetype', sa.String(100), nullable=True),
+            sa.Column('storage_key', sa.String(255), nullable=True),
+        )
+    if not _has_index('logo_thumbnails', 'idx_logo_thumbnail_logo'):
+        op.create_index('idx_logo_thumbnail_logo', 'logo_thumbnails', ['logo_id'])
+
+    # Render thumbnails for the existing logos, logos are served as-is without Pillow
+    try:
+        import PIL
+    except ImportError:
+        print("Pillow is not installed, skipping thumbnails for existing logos")
+        return
+
+    from app.blob_storage import read_blob
+    from app.logo_thumbnails import render_thumbnails
+
+    conn = op.get_bind()
+    logos = conn.execute(sa.text(
+        "SELECT logo_id, storage_key FROM logos WHERE storage_key IS NOT NULL "
+        "AND logo_id NOT IN (SELECT logo_id FROM logo_thumbnails)"
+    )).fetchall()
+    insert_thumbnail = sa.text(
+        "INSERT INTO logo_thumbnails (logo_id, size, content_hash, file_size, mimetype, storage_key) "
+        "VALUES (:logo_id, :size, :content_hash, :file_size, :mimetype, :storage_key)"
+    )
+
+    for logo_id, storage_key in logos:
+        try:
+            rendered = render_thumbnails(read_blob(storage_key))
+        except Exception as e:
+            print(f"Error generating thumbnails for logo {logo_id}: {str(e)}")
+            continue
+
+        for size, blob in rendered:
+            conn.execute(insert_thumbnail, dict(blob, logo_id=logo_id, size=size))
+
+
+def downgrade():
+    op.drop_index('idx_logo_thumbnail_logo', table_name='logo_thumbnails')
+    op.drop_table('logo_thumbnails')
@@ -0,0 +1,42 @@
+"""Add rate_limit_buckets table for server-side rate limiting
+
+Revision ID: c9f2d7a6e314
+Revises: b8e1c5d4a279
+Create Date: 2025-08-21 09:31:18.442067
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9f2d7a6e314'
+down_revision = 'b8e1c5d4a279'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(table):
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_index(table, name):
+    return name in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if not _has_table('rate_limit_buckets'):
+        op.create_table(
+            'rate_limit_buckets',
+            sa.Column('bucket_key', sa.String(255), primary_key=True),
+            sa.Column('tokens', sa.Double(), nullable=False),
+            sa.Column('updated_at', sa.Double(), nullable=False),
+            sa.Column('expires_at', sa.Double(), nullable=False),
+        )
+    if not _has_index('rate_limit_buckets', 'idx_rate_limit_bucket_expires'):
+        op.create_index('idx_rate_limit_bucket_expires', 'rate_limit_buckets', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('idx_rate_limit_bucket_expires', table_name='rate_limit_buckets')
+    op.drop_table('rate_limit_buckets')
@@ -0,0 +1,41 @@
+"""Add user_sessions table for server-side sessions
+
+Revision ID: d3a8f1c9b472
+Revises: c9f2d7a6e314
+Create Date: 2025-08-21 15:47:03.118925
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a8f1c9b472'
+down_revision = 'c9f2d7a6e314'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(table):
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_index(table, name):
+    return name in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if not _has_table('user_sessions'):
+        op.create_table(
+            'user_sessions',
+            sa.Column('session_id', sa.String(64), primary_key=True),
+            sa.Column('data', sa.Text(), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+        )
+    if not _has_index('user_sessions', 'idx_user_session_expires'):
+        op.create_index('idx_user_session_expires', 'user_sessions', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('idx_user_session_expires', table_name='user_sessions')
+    op.drop_table('user_sessions')
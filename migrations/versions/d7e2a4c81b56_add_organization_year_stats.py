@@ -0,0 +1,41 @@
+"""Add organization_year_stats summary table
+
+Revision ID: d7e2a4c81b56
+Revises: c41d7b2e9f03
+Create Date: 2025-08-14 10:27:44.916203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e2a4c81b56'
+down_revision = 'c41d7b2e9f03'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(table):
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def upgrade():
+    if not _has_table('organization_year_stats'):
+        op.create_table(
+            'organization_year_stats',
+            sa.Column('organization_id', sa.Integer(), sa.ForeignKey('organizations.organization_id'), primary_key=True),
+            sa.Column('academic_year', sa.String(20), primary_key=True),
+            sa.Column('officer_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('member_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('volunteer_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('accomplished_activities', sa.Integer(), nullable=False, server_default='0'),
+        )
+
+    # Fill the summary from the existing affiliations and plans
+    from app.organization_stats import rebuild_organization_year_stats
+    rebuild_organization_year_stats(op.get_bind())
+
+
+def downgrade():
+    op.drop_table('organization_year_stats')
@@ -0,0 +1,40 @@
+"""Add composite indexes for the most common filters
+
+Revision ID: e3b9f1d6a742
+Revises: d7e2a4c81b56
+Create Date: 2025-08-15 16:45:09.381627
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b9f1d6a742'
+down_revision = 'd7e2a4c81b56'
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns)
+INDEXES = [
+    ('idx_affiliation_org_position_year', 'affiliations', ['organization_id', 'position', 'academic_year']),
+    ('idx_application_org_type_year', 'applications', ['organization_id', 'type', 'academic_year']),
+    ('idx_application_status_type', 'applications', ['status', 'type']),
+    ('idx_application_file_app_status', 'application_files', ['application_id', 'status']),
+    ('idx_announcement_recipient_user_read', 'announcement_recipients', ['user_id', 'is_read']),
+]
+
+
+def _has_index(table, name):
+    return name in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if not _has_index(table, name):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
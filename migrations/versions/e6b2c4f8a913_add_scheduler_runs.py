@@ -0,0 +1,48 @@
+"""Add scheduler_runs table for the history of background jobs
+
+Revision ID: e6b2c4f8a913
+Revises: d3a8f1c9b472
+Create Date: 2025-08-22 08:54:26.390714
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b2c4f8a913'
+down_revision = 'd3a8f1c9b472'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(table):
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_index(table, name):
+    return name in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if not _has_table('scheduler_runs'):
+        op.create_table(
+            'scheduler_runs',
+            sa.Column('run_id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('job_name', sa.String(100), nullable=False),
+            sa.Column('trigger', sa.String(20), nullable=False),
+            sa.Column('status', sa.String(20), nullable=False),
+            sa.Column('started_at', sa.DateTime(), nullable=False),
+            sa.Column('finished_at', sa.DateTime()),
+            sa.Column('duration_ms', sa.Integer()),
+            sa.Column('rows_affected', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('affected_ids', sa.Text()),
+            sa.Column('error', sa.Text()),
+        )
+    if not _has_index('scheduler_runs', 'idx_scheduler_run_job_started'):
+        op.create_index('idx_scheduler_run_job_started', 'scheduler_runs', ['job_name', 'started_at'])
+
+
+def downgrade():
+    op.drop_index('idx_scheduler_run_job_started', table_name='scheduler_runs')
+    op.drop_table('scheduler_runs')
@@ -0,0 +1,31 @@
+"""Add claimed_at to email_outbox so only abandoned Sending messages are queued again
+
+Revision ID: f4a7c2d9e815
+Revises: e6b2c4f8a913
+Create Date: 2025-08-23 10:14:52.618903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a7c2d9e815'
+down_revision = 'e6b2c4f8a913'
+branch_labels = None
+depends_on = None
+
+
+def _has_column(table, column):
+    return column in {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    if not _has_column('email_outbox', 'claimed_at'):
+        with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('claimed_at', sa.DateTime()))
+
+
+def downgrade():
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.drop_column('claimed_at')
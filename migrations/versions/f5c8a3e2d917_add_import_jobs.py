@@ -0,0 +1,56 @@
+"""Add import_jobs table for background Excel imports
+
+Revision ID: f5c8a3e2d917
+Revises: e3b9f1d6a742
+Create Date: 2025-08-18 09:12:36.504118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5c8a3e2d917'
+down_revision = 'e3b9f1d6a742'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(table):
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_index(table, name):
+    return name in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if not _has_table('import_jobs'):
+        op.create_table(
+            'import_jobs',
+            sa.Column('job_id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('organization_id', sa.Integer(), sa.ForeignKey('organizations.organization_id'), nullable=False),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.user_id'), nullable=False),
+            sa.Column('upload_type', sa.String(20), nullable=False),
+            sa.Column('filename', sa.String(255)),
+            sa.Column('status', sa.String(20), nullable=False, server_default='Queued'),
+            sa.Column('total_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('processed_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('failed_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('skipped_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('message', sa.Text()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('started_at', sa.DateTime()),
+            sa.Column('finished_at', sa.DateTime()),
+            sa.Column('content_hash', sa.String(64)),
+            sa.Column('file_size', sa.Integer()),
+            sa.Column('mimetype', sa.String(100)),
+            sa.Column('storage_key', sa.String(255)),
+        )
+    if not _has_index('import_jobs', 'idx_import_job_status'):
+        op.create_index('idx_import_job_status', 'import_jobs', ['status'])
+
+
+def downgrade():
+    op.drop_index('idx_import_job_status', table_name='import_jobs')
+    op.drop_table('import_jobs')
@@ -21,6 +21,7 @@ CREATE TABLE users (
     last_name VARCHAR(100) NOT NULL,
     email VARCHAR(255) UNIQUE NOT NULL,
     is_active BOOLEAN DEFAULT TRUE,
+    created_at DATETIME, -- UTC like announcements.date_sent, set by the application
     FOREIGN KEY (role_id) REFERENCES roles(role_id)
 );
 
@@ -49,8 +50,23 @@ CREATE TABLE addresses (
 -- 6. logos table
 CREATE TABLE logos (
     logo_id INT PRIMARY KEY AUTO_INCREMENT,
-    logo LONGBLOB,
-    description TEXT
+    description TEXT,
+    content_hash VARCHAR(64), -- SHA-256 of the logo stored in the blob store
+    file_size INT,
+    mimetype VARCHAR(100),
+    storage_key VARCHAR(255)
+);
+
+-- 6a. logo_thumbnails table (pre-rendered logo sizes)
+CREATE TABLE logo_thumbnails (
+    thumbnail_id INT PRIMARY KEY AUTO_INCREMENT,
+    logo_id INT NOT NULL,
+    size INT NOT NULL, -- width and height limit in pixels
+    content_hash VARCHAR(64),
+    file_size INT,
+    mimetype VARCHAR(100),
+    storage_key VARCHAR(255),
+    FOREIGN KEY (logo_id) REFERENCES logos(logo_id) ON DELETE CASCADE
 );
 
 -- 7. organizations table (updated with academic year tracking)
@@ -94,6 +110,42 @@ CREATE TABLE affiliations (
     FOREIGN KEY (organization_id) REFERENCES organizations(organization_id)
 );
 
+-- 9a. organization_year_stats table (summary maintained by the application, rebuilt with `flask stats rebuild`)
+CREATE TABLE organization_year_stats (
+    organization_id INT NOT NULL,
+    academic_year VARCHAR(20) NOT NULL,
+    officer_count INT NOT NULL DEFAULT 0,
+    member_count INT NOT NULL DEFAULT 0, -- members only, officers are counted separately
+    volunteer_count INT NOT NULL DEFAULT 0,
+    accomplished_activities INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (organization_id, academic_year),
+    FOREIGN KEY (organization_id) REFERENCES organizations(organization_id)
+);
+
+-- 9b. import_jobs table (Excel uploads imported in the background, the file lives in the blob store)
+CREATE TABLE import_jobs (
+    job_id INT PRIMARY KEY AUTO_INCREMENT,
+    organization_id INT NOT NULL,
+    user_id INT NOT NULL,
+    upload_type VARCHAR(20) NOT NULL, -- officers, members, volunteers, plans
+    filename VARCHAR(255),
+    status VARCHAR(20) NOT NULL DEFAULT 'Queued', -- Queued, Running, Completed, Failed
+    total_count INT NOT NULL DEFAULT 0,
+    processed_count INT NOT NULL DEFAULT 0,
+    failed_count INT NOT NULL DEFAULT 0,
+    skipped_count INT NOT NULL DEFAULT 0,
+    message TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME,
+    finished_at DATETIME,
+    content_hash VARCHAR(64),
+    file_size INT,
+    mimetype VARCHAR(100),
+    storage_key VARCHAR(255),
+    FOREIGN KEY (organization_id) REFERENCES organizations(organization_id),
+    FOREIGN KEY (user_id) REFERENCES users(user_id)
+);
+
 -- 10. social_media table
 CREATE TABLE social_media (
     social_media_id INT PRIMARY KEY AUTO_INCREMENT,
@@ -136,9 +188,12 @@ CREATE TABLE application_files (
     app_file_id INT PRIMARY KEY AUTO_INCREMENT,
     application_id INT NOT NULL,
     file_name VARCHAR(255) NOT NULL,
-    file LONGBLOB,
     status VARCHAR(50), -- 'pending', 'approved', 'rejected'
     submission_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+    content_hash VARCHAR(64), -- SHA-256 of the file stored in the blob store
+    file_size INT,
+    mimetype VARCHAR(100),
+    storage_key VARCHAR(255),
     FOREIGN KEY (application_id) REFERENCES applications(application_id)
 );
 
@@ -177,19 +232,85 @@ CREATE TABLE announcements (
     announcement_id INT PRIMARY KEY AUTO_INCREMENT,
     subject VARCHAR(255) NOT NULL,
     message TEXT NOT NULL,
-    date_sent DATETIME DEFAULT CURRENT_TIMESTAMP
+    date_sent DATETIME DEFAULT CURRENT_TIMESTAMP,
+    audience VARCHAR(20) NOT NULL DEFAULT 'users', -- all, organizations, users
+    recipient_count INT -- Size of the audience when the announcement was sent
 );
 
--- 18. announcement_recipients table
+-- 18. announcement_recipients table (users of announcements with the 'users' audience)
 CREATE TABLE announcement_recipients (
     announcement_id INT NOT NULL,
     user_id INT NOT NULL,
-    is_read BOOLEAN DEFAULT FALSE,
     PRIMARY KEY (announcement_id, user_id),
     FOREIGN KEY (announcement_id) REFERENCES announcements(announcement_id),
     FOREIGN KEY (user_id) REFERENCES users(user_id)
 );
 
+-- 18b. announcement_organizations table (organizations of announcements with the 'organizations' audience)
+CREATE TABLE announcement_organizations (
+    announcement_id INT NOT NULL,
+    organization_id INT NOT NULL,
+    PRIMARY KEY (announcement_id, organization_id),
+    FOREIGN KEY (announcement_id) REFERENCES announcements(announcement_id),
+    FOREIGN KEY (organization_id) REFERENCES organizations(organization_id)
+);
+
+-- 18c. announcement_reads table (a row only exists once the user has read the announcement)
+CREATE TABLE announcement_reads (
+    announcement_id INT NOT NULL,
+    user_id INT NOT NULL,
+    read_at DATETIME,
+    PRIMARY KEY (announcement_id, user_id),
+    FOREIGN KEY (announcement_id) REFERENCES announcements(announcement_id),
+    FOREIGN KEY (user_id) REFERENCES users(user_id)
+);
+
+-- 19. email_outbox table (emails waiting for or done with background delivery)
+CREATE TABLE email_outbox (
+    message_id INT PRIMARY KEY AUTO_INCREMENT,
+    recipient VARCHAR(255) NOT NULL,
+    sender VARCHAR(255),
+    subject VARCHAR(255) NOT NULL,
+    html_body TEXT,
+    text_body TEXT,
+    status VARCHAR(20) NOT NULL DEFAULT 'Pending', -- Pending, Sending, Sent, Failed
+    attempts INT NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    claimed_at DATETIME, -- When a sender set the message to Sending
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    sent_at DATETIME
+);
+
+-- 20. rate_limit_buckets table (token buckets of the 'database' rate limit backend)
+CREATE TABLE rate_limit_buckets (
+    bucket_key VARCHAR(255) PRIMARY KEY, -- e.g. login:ip:203.0.113.5
+    tokens DOUBLE NOT NULL,
+    updated_at DOUBLE NOT NULL, -- Unix time of the last update
+    expires_at DOUBLE NOT NULL -- Unix time at which the bucket is full again
+);
+
+-- 21. user_sessions table (session data kept on the server, the cookie only carries session_id)
+CREATE TABLE user_sessions (
+    session_id VARCHAR(64) PRIMARY KEY,
+    data TEXT NOT NULL, -- Session serialized with Flask's tagged JSON
+    expires_at DATETIME NOT NULL
+);
+
+-- 22. scheduler_runs table (history of the background jobs, e.g. the organization expiry check)
+CREATE TABLE scheduler_runs (
+    run_id INT PRIMARY KEY AUTO_INCREMENT,
+    job_name VARCHAR(100) NOT NULL,
+    `trigger` VARCHAR(20) NOT NULL, -- scheduler, manual
+    status VARCHAR(20) NOT NULL, -- Success, Failed
+    started_at DATETIME NOT NULL,
+    finished_at DATETIME,
+    duration_ms INT,
+    rows_affected INT NOT NULL DEFAULT 0,
+    affected_ids TEXT, -- Comma separated ids of the changed rows
+    error TEXT
+);
+
 -- Create indexes for better performance
 CREATE INDEX idx_student_number ON students(student_number);
 CREATE INDEX idx_student_program ON students(program_id);
@@ -204,4 +325,20 @@ CREATE INDEX idx_announcement_date ON announcements(date_sent);
 CREATE INDEX idx_organization_status ON organizations(status);
 CREATE INDEX idx_organization_current_year ON organizations(current_academic_year);
 CREATE INDEX idx_plan_application ON plans(application_id);
-CREATE INDEX idx_plan_accomplished ON plans(accomplished_date);
\ No newline at end of file
+CREATE INDEX idx_plan_accomplished ON plans(accomplished_date);
+CREATE INDEX idx_logo_thumbnail_logo ON logo_thumbnails(logo_id);
+CREATE INDEX idx_import_job_status ON import_jobs(status);
+CREATE INDEX idx_email_outbox_status_next_attempt ON email_outbox(status, next_attempt_at);
+
+-- Composite indexes matching the filters used by the service layer
+CREATE INDEX idx_affiliation_org_position_year ON affiliations(organization_id, position, academic_year);
+CREATE INDEX idx_application_org_type_year ON applications(organization_id, type, academic_year);
+CREATE INDEX idx_application_status_type ON applications(status, type);
+CREATE INDEX idx_application_file_app_status ON application_files(application_id, status);
+CREATE INDEX idx_announcement_recipient_user ON announcement_recipients(user_id);
+CREATE INDEX idx_announcement_organization_org ON announcement_organizations(organization_id);
+CREATE INDEX idx_announcement_read_user ON announcement_reads(user_id);
+CREATE INDEX idx_announcement_audience_date ON announcements(audience, date_sent);
+CREATE INDEX idx_rate_limit_bucket_expires ON rate_limit_buckets(expires_at);
+CREATE INDEX idx_user_session_expires ON user_sessions(expires_at);
+CREATE INDEX idx_scheduler_run_job_started ON scheduler_runs(job_name, started_at);
\ No newline at end of file
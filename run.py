@@ -1,6 +1,10 @@
+import os
 from app import create_app
 
-app = create_app()
+# The debug reloader serves requests from a child process, its parent only watches the files
+reloader_parent = __name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+
+app = create_app(background_workers=False if reloader_parent else None)
 
 if __name__ == '__main__':
     print("Running in development mode with Flask server")
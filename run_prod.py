@@ -1,3 +1,4 @@
+import os
 from app import create_app
 from waitress import serve
 
@@ -5,4 +6,8 @@ app = create_app()
 
 if __name__ == '__main__':
     print("Running in production mode with Waitress")
-    serve(app, host='0.0.0.0', port=5000, threads=8, backlog=100)
\ No newline at end of file
+    # Every open event stream holds a thread for up to EVENT_STREAM_TIMEOUT seconds, so each of the
+    # EVENT_STREAM_MAX_CONNECTIONS stream slots gets a thread on top of the WAITRESS_THREADS serving
+    # requests. Open streams can then never take the threads of ordinary requests.
+    threads = int(os.getenv("WAITRESS_THREADS", 8)) + app.config['EVENT_STREAM_MAX_CONNECTIONS']
+    serve(app, host='0.0.0.0', port=5000, threads=threads, backlog=100)
\ No newline at end of file
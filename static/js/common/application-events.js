@@ -0,0 +1,77 @@
+/**
+ * Application Events Module
+ * Receives application status changes and new feedback pushed by the server over Server-Sent Events
+ */
+
+window.ApplicationEvents = window.ApplicationEvents || (function() {
+  const STREAM_URL = '/organization/events';
+  const EVENT_NAMES = ['application_status', 'file_status'];
+  
+  // Delay before opening a stream the server refused again, doubled after every refusal
+  const MIN_RETRY_DELAY_MS = 3000;
+  const MAX_RETRY_DELAY_MS = 120000;
+  
+  let source = null;
+  let retryDelay = MIN_RETRY_DELAY_MS;
+  let retryTimer = null;
+  const handlers = {};
+  
+  // Open the stream once. The browser reconnects on its own when the server ends it,
+  // but gives up after an error response (503 when every stream slot is taken).
+  function connect() {
+    if (source || retryTimer || typeof EventSource === 'undefined') {
+      return;
+    }
+    
+    const stream = new EventSource(STREAM_URL);
+    source = stream;
+    stream.addEventListener('open', function() {
+      retryDelay = MIN_RETRY_DELAY_MS;
+    });
+    stream.addEventListener('error', function() {
+      if (stream.readyState === EventSource.CLOSED) {
+        scheduleReconnect();
+      }
+    });
+    EVENT_NAMES.forEach(eventName => {
+      stream.addEventListener(eventName, function(event) {
+        const data = JSON.parse(event.data);
+        (handlers[eventName] || []).forEach(handler => handler(data));
+      });
+    });
+  }
+  
+  // Try again with a growing, randomized delay so refused browsers do not all come back at once
+  function scheduleReconnect() {
+    source = null;
+    const delay = retryDelay / 2 + Math.random() * retryDelay / 2;
+    retryDelay = Math.min(retryDelay * 2, MAX_RETRY_DELAY_MS);
+    retryTimer = setTimeout(function() {
+      retryTimer = null;
+      connect();
+    }, delay);
+  }
+  
+  /**
+   * Register a handler for an event and start listening
+   * @param {string} eventName - 'application_status' or 'file_status'
+   * @param {Function} handler - Called with the event data
+   */
+  function on(eventName, handler) {
+    (handlers[eventName] = handlers[eventName] || []).push(handler);
+    connect();
+  }
+  
+  /**
+   * Check if changes are currently pushed by the server
+   * @returns {boolean} True when the stream is open
+   */
+  function isConnected() {
+    return source !== null && source.readyState === EventSource.OPEN;
+  }
+  
+  return {
+    on: on,
+    isConnected: isConnected
+  };
+})();
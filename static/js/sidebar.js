@@ -134,4 +134,30 @@ $(document).ready(function() {
   if (typeof bootstrap !== 'undefined' && bootstrap.Tooltip) {
     $('[data-bs-toggle="tooltip"]').tooltip();
   }
+  
+  // Keep the unread notification badge up to date (user sidebar only)
+  const notificationBadge = document.getElementById('notification-badge');
+  if (notificationBadge) {
+    function updateNotificationBadge() {
+      // Skip polling while the tab is in the background
+      if (document.hidden) {
+        return;
+      }
+      
+      fetch(notificationBadge.dataset.url)
+        .then(response => response.json())
+        .then(data => {
+          if (data.success) {
+            const total = data.unread.total;
+            notificationBadge.textContent = total > 99 ? '99+' : total;
+            notificationBadge.hidden = total === 0;
+          }
+        })
+        .catch(error => console.error('Error loading unread notifications:', error));
+    }
+    
+    updateNotificationBadge();
+    setInterval(updateNotificationBadge, 60000);
+    document.addEventListener('visibilitychange', updateNotificationBadge);
+  }
 });
\ No newline at end of file
@@ -41,6 +41,20 @@
     // Load existing application files
     loadApplicationFiles();
     
+    // Update the page as soon as the application or its files change
+    if (window.ApplicationEvents) {
+      ApplicationEvents.on('application_status', function(data) {
+        if (data.application_type === 'New') {
+          updateApplicationStatusUI(data.status);
+        }
+      });
+      ApplicationEvents.on('file_status', function(data) {
+        if (data.application_type === 'New') {
+          loadApplicationFiles();
+        }
+      });
+    }
+    
     // Set up form submissions
     setupFormSubmissions();
   });
@@ -1089,6 +1103,11 @@
     
     // If all files are uploaded, check the application status
     if (allFilesUploaded && uploadedFileCount === REQUIRED_FILES.length) {
+      // The new status is pushed over the event stream when it is open
+      if (window.ApplicationEvents && ApplicationEvents.isConnected()) {
+        return;
+      }
+      
       console.log('All required files are uploaded, checking application status...');
       // Get the current application status
       // Get CSRF token from meta tag
@@ -535,7 +535,28 @@ function uploadExcelFile(tabType) {
         return;
     }
     
-    // Send the file to the server
+    // Show an error message in the error container of the tab
+    const showUploadError = (message) => {
+        // Create a more detailed error message
+        const errorMessage = document.createElement('div');
+        errorMessage.className = 'alert alert-danger mb-3';
+        errorMessage.innerHTML = `<i class="fas fa-exclamation-triangle"></i> <strong>Error:</strong> ${message || 'Unknown error'}`;
+        
+        // Add the error message to the specific tab's error container
+        const errorContainer = document.getElementById(`${tabType}-error-container`);
+        if (errorContainer) {
+            // Remove any previous error messages from this tab
+            errorContainer.innerHTML = '';
+            
+            // Add the new error message
+            errorContainer.appendChild(errorMessage);
+        } else {
+            // Fallback if error container not found
+            alert('Error: ' + (message || 'Unknown error'));
+        }
+    };
+    
+    // Send the file to the server, the import itself runs in the background
     fetch('/organization/import-excel', {
         method: 'POST',
         body: formData,
@@ -552,34 +573,26 @@ function uploadExcelFile(tabType) {
         return response.json();
     })
     .then(data => {
-        if (data.success) {
-            // Hide the modal first
-            hideExcelUploadModal();
-            
-            // Refresh the page first, then show toast after a brief delay
-            window.location.reload();
-            
-            // Store the message in sessionStorage to show after reload
-            sessionStorage.setItem('excelUploadSuccess', data.message || 'Excel file uploaded successfully!');
-        } else {
-            // Create a more detailed error message
-            const errorMessage = document.createElement('div');
-            errorMessage.className = 'alert alert-danger mb-3';
-            errorMessage.innerHTML = `<i class="fas fa-exclamation-triangle"></i> <strong>Error:</strong> ${data.message || 'Unknown error'}`;
-            
-            // Add the error message to the specific tab's error container
-            const errorContainer = document.getElementById(`${tabType}-error-container`);
-            if (errorContainer) {
-                // Remove any previous error messages from this tab
-                errorContainer.innerHTML = '';
+        if (!data.success) {
+            showUploadError(data.message);
+            return;
+        }
+        
+        // Follow the import job until it is finished
+        return waitForImportJob(data.status_url, tabType).then(job => {
+            if (job.status === 'Completed') {
+                // Hide the modal first
+                hideExcelUploadModal();
+                
+                // Store the message in sessionStorage to show after reload
+                sessionStorage.setItem('excelUploadSuccess', job.message || 'Excel file uploaded successfully!');
                 
-                // Add the new error message
-                errorContainer.appendChild(errorMessage);
+                // Refresh the page to show the imported records
+                window.location.reload();
             } else {
-                // Fallback if error container not found
-                alert('Error: ' + (data.message || 'Unknown error'));
+                showUploadError(job.message);
             }
-        }
+        });
     })
     .catch(error => {
         console.error('Error:', error);
@@ -601,6 +614,45 @@ function uploadExcelFile(tabType) {
     });
 }
 
+// Poll an import job until it is completed or failed, showing its progress on the action button
+function waitForImportJob(statusUrl, tabType) {
+    const pollInterval = 1000;
+    
+    return new Promise((resolve, reject) => {
+        const poll = () => {
+            fetch(statusUrl, {
+                headers: { 'X-Requested-With': 'XMLHttpRequest' },
+                credentials: 'same-origin'
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    resolve({ status: 'Failed', message: data.message });
+                    return;
+                }
+                
+                const job = data.job;
+                if (job.status === 'Completed' || job.status === 'Failed') {
+                    resolve(job);
+                    return;
+                }
+                
+                const actionButton = document.getElementById(`${tabType}-action-button`);
+                if (actionButton) {
+                    const progress = job.total_count ? ` ${job.processed_count + job.failed_count} of ${job.total_count}` : '';
+                    const label = job.status === 'Queued' ? 'Queued...' : `Importing${progress}...`;
+                    actionButton.innerHTML = `<i class="fas fa-spinner fa-spin"></i> ${label}`;
+                }
+                
+                setTimeout(poll, pollInterval);
+            })
+            .catch(reject);
+        };
+        
+        poll();
+    });
+}
+
 // Close the modal when clicking outside of it
 window.addEventListener('click', function(event) {
     if (event.target === excelUploadModal) {
@@ -27,6 +27,18 @@
     loadRenewalFiles();
     // Load feedback
     loadRenewalFeedback();
+    
+    // Reload the files and feedback as soon as the renewal application changes
+    if (window.ApplicationEvents) {
+      const reloadRenewal = function(data) {
+        if (data.application_type === 'Renewal') {
+          loadRenewalFiles();
+          loadRenewalFeedback();
+        }
+      };
+      ApplicationEvents.on('application_status', reloadRenewal);
+      ApplicationEvents.on('file_status', reloadRenewal);
+    }
   });
 
   // Function to initialize UI elements
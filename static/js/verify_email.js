@@ -54,8 +54,34 @@ document.addEventListener("DOMContentLoaded", function () {
         }
     }
 
+    // Poll the delivery of the verification email, it is sent in the background
+    function pollDeliveryStatus(attempt = 0) {
+        fetch("/verification_email_status", {
+            headers: { 'X-Requested-With': 'XMLHttpRequest' }
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.status !== "success") return;
+            
+            if (data.delivery_status === "Failed") {
+                // Let the user request a new code right away
+                showNotification(data.message, "error-message");
+                clearInterval(countdownInterval);
+                remainingTime = 0;
+                updateCountdownDisplay();
+                resendButton.disabled = false;
+            } else if (data.delivery_status !== "Sent" && attempt < 60) {
+                setTimeout(() => pollDeliveryStatus(attempt + 1), 2000);
+            }
+        })
+        .catch(error => {
+            console.error("Error checking verification email status:", error);
+        });
+    }
+
     // Start countdown when page loads
     startCountdown();
+    pollDeliveryStatus();
 
     // Handle resend verification code
     resendButton.addEventListener("click", function() {
@@ -78,6 +104,7 @@ document.addEventListener("DOMContentLoaded", function () {
             if (data.status === "success") {
                 showNotification(data.message, "success-message");
                 startCountdown();
+                pollDeliveryStatus();
             } else {
                 showNotification(data.message, "error-message");
                 if (data.remaining_time) {